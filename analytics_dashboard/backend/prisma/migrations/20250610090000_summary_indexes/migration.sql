@@ -0,0 +1,8 @@
+-- CreateIndex
+CREATE INDEX `ParkingEvent_entryTime_idx` ON `ParkingEvent`(`entryTime`);
+
+-- CreateIndex
+CREATE INDEX `ParkingEvent_status_exitTime_idx` ON `ParkingEvent`(`status`, `exitTime`);
+
+-- CreateIndex
+CREATE INDEX `Alert_timestamp_idx` ON `Alert`(`timestamp`);
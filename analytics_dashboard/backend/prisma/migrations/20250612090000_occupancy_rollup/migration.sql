@@ -0,0 +1,16 @@
+-- CreateTable
+CREATE TABLE `OccupancyRollup` (
+    `id` INTEGER NOT NULL AUTO_INCREMENT,
+    `source` VARCHAR(191) NOT NULL,
+    `granularity` VARCHAR(191) NOT NULL,
+    `bucketStart` DATETIME(3) NOT NULL,
+    `entries` INTEGER NOT NULL DEFAULT 0,
+    `exits` INTEGER NOT NULL DEFAULT 0,
+    `dwellSeconds` INTEGER NOT NULL DEFAULT 0,
+    `dwellCount` INTEGER NOT NULL DEFAULT 0,
+    `revenue` INTEGER NOT NULL DEFAULT 0,
+    `updatedAt` DATETIME(3) NOT NULL,
+
+    UNIQUE INDEX `OccupancyRollup_source_granularity_bucketStart_key`(`source`, `granularity`, `bucketStart`),
+    PRIMARY KEY (`id`)
+) DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
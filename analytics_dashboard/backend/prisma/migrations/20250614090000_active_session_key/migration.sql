@@ -0,0 +1,19 @@
+-- AlterTable
+ALTER TABLE `ParkingEvent` ADD COLUMN `activeKey` VARCHAR(191) NULL;
+
+-- Backfill: only the newest open session per plate takes the key; older duplicate open rows
+-- (possible before this constraint) keep exitTime NULL but no longer block new entries.
+UPDATE `ParkingEvent` p
+JOIN (
+    SELECT `id`, ROW_NUMBER() OVER (PARTITION BY `plateNumber` ORDER BY `entryTime` DESC, `id` DESC) AS `rn`
+    FROM `ParkingEvent`
+    WHERE `exitTime` IS NULL
+) ranked ON ranked.`id` = p.`id`
+SET p.`activeKey` = p.`plateNumber`
+WHERE ranked.`rn` = 1;
+
+-- CreateIndex
+CREATE UNIQUE INDEX `ParkingEvent_activeKey_key` ON `ParkingEvent`(`activeKey`);
+
+-- CreateIndex
+CREATE INDEX `ParkingEvent_plateNumber_exitTime_idx` ON `ParkingEvent`(`plateNumber`, `exitTime`);
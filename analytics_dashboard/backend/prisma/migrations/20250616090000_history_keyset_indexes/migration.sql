@@ -0,0 +1,14 @@
+-- CreateIndex
+CREATE INDEX `ParkingEvent_createdAt_id_idx` ON `ParkingEvent`(`createdAt`, `id`);
+
+-- CreateIndex
+CREATE INDEX `ParkingEvent_plateNumber_createdAt_id_idx` ON `ParkingEvent`(`plateNumber`, `createdAt`, `id`);
+
+-- CreateIndex
+CREATE INDEX `ParkingEvent_status_createdAt_id_idx` ON `ParkingEvent`(`status`, `createdAt`, `id`);
+
+-- CreateIndex
+CREATE INDEX `Alert_plateNumber_timestamp_id_idx` ON `Alert`(`plateNumber`, `timestamp`, `id`);
+
+-- CreateIndex
+CREATE INDEX `Alert_type_timestamp_id_idx` ON `Alert`(`type`, `timestamp`, `id`);
@@ -0,0 +1,12 @@
+-- AlterTable
+ALTER TABLE `ParkingEvent` ADD COLUMN `traceId` VARCHAR(191) NULL,
+    ADD COLUMN `exitTraceId` VARCHAR(191) NULL;
+
+-- AlterTable
+ALTER TABLE `Alert` ADD COLUMN `traceId` VARCHAR(191) NULL;
+
+-- CreateIndex
+CREATE INDEX `ParkingEvent_traceId_idx` ON `ParkingEvent`(`traceId`);
+
+-- CreateIndex
+CREATE INDEX `Alert_traceId_idx` ON `Alert`(`traceId`);
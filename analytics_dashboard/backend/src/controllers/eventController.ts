@@ -1,51 +1,95 @@
 // src/controllers/eventController.ts
 import { Request, Response, NextFunction } from 'express'; // Add NextFunction
+import { randomUUID } from 'crypto';
+import { ParkingEvent, Prisma } from '@prisma/client';
 import prisma from '../prismaClient';
 import { broadcast } from '../services/webSocketService';
+import { recordEntryInSummary, recordPaidExitInSummary, recordAlertInSummary } from '../services/summaryService';
+import { RollupCounts, trackRollups, trackRollupsBatch } from '../services/rollupService';
+import { traced } from '../services/traceService';
 
 // Define a more specific type for your request body if you want, e.g.
 interface EntryRequestBody {
   car_plate: string;
+  trace_id?: string; // Batch items only; single calls use the X-Trace-Id header
 }
 interface ExitRequestBody {
   car_plate: string;
   payment_status: 'PAID' | 'UNPAID_ATTEMPT';
+  trace_id?: string;
 }
 interface AlertRequestBody {
     plate_number?: string;
     message: string;
     type: string;
 }
+// A batch item is an exit when it carries payment_status, an entry otherwise.
+type BatchEvent = EntryRequestBody & Partial<Pick<ExitRequestBody, 'payment_status'>> & {
+  timestamp?: string; // When the gate recorded it (ISO 8601); defaults to the time of the request
+};
+interface BatchRequestBody {
+  events: BatchEvent[]; // In the order the gate recorded them
+}
+
+// activeKey holds the plate while a session is open and NULL afterwards; its unique index is the
+// one-open-session-per-plate guarantee (MySQL has no partial indexes, but allows many NULLs).
+const isUniqueViolation = (error: unknown) =>
+  error instanceof Prisma.PrismaClientKnownRequestError && error.code === 'P2002';
+const isNotFound = (error: unknown) =>
+  error instanceof Prisma.PrismaClientKnownRequestError && error.code === 'P2025';
+
+const closedEventCounts = (event: { entryTime: Date; exitTime: Date | null }): [Date, RollupCounts] => {
+  const exitTime = event.exitTime ?? new Date();
+  return [exitTime, { exits: 1, dwellSeconds: (exitTime.getTime() - event.entryTime.getTime()) / 1000, dwellCount: 1 }];
+};
+const closedEventRollups = (event: { entryTime: Date; exitTime: Date | null }) => trackRollups('BACKEND', ...closedEventCounts(event));
+
+const createUnauthorizedExitAlert = async (car_plate: string, message: string, traceId?: string) => {
+  const alert = await traced(traceId, 'prisma.alert.create', () =>
+    prisma.alert.create({
+      data: { plateNumber: car_plate, message, type: 'UNAUTHORIZED_EXIT', traceId },
+    }),
+  );
+  recordAlertInSummary(alert.timestamp);
+  broadcast({ type: 'NEW_ALERT', payload: alert, traceId });
+  return alert;
+};
 
 
 export const recordEntry = async (req: Request<{}, {}, EntryRequestBody>, res: Response, next: NextFunction): Promise<void> => {
   try {
     const { car_plate } = req.body;
+    const traceId: string | undefined = res.locals.traceId;
     if (!car_plate) {
       res.status(400).json({ error: 'car_plate is required' });
       return; // Ensure function exits after sending response
     }
 
-    const existingUnpaid = await prisma.parkingEvent.findFirst({
-      where: {
-        plateNumber: car_plate,
-        exitTime: null,
-      },
-    });
-
-    if (existingUnpaid) {
+    // Single INSERT; the activeKey unique index rejects a second open session even when two lanes race
+    let event;
+    try {
+      event = await traced(traceId, 'prisma.parkingEvent.create', () =>
+        prisma.parkingEvent.create({
+          data: {
+            plateNumber: car_plate,
+            status: 'ENTERED',
+            activeKey: car_plate,
+            traceId,
+          },
+        }),
+      );
+    } catch (error) {
+      if (!isUniqueViolation(error)) throw error;
       console.log(`Plate ${car_plate} already has an active entry. Ignoring duplicate entry attempt.`);
+      const existingUnpaid = await traced(traceId, 'prisma.parkingEvent.findUnique', () =>
+        prisma.parkingEvent.findUnique({ where: { activeKey: car_plate } }),
+      );
       res.status(200).json({ message: 'Plate already has an active entry', event: existingUnpaid });
       return;
     }
-
-    const event = await prisma.parkingEvent.create({
-      data: {
-        plateNumber: car_plate,
-        status: 'ENTERED',
-      },
-    });
-    broadcast({ type: 'NEW_ENTRY', payload: event });
+    recordEntryInSummary();
+    trackRollups('BACKEND', event.entryTime, { entries: 1 });
+    broadcast({ type: 'NEW_ENTRY', payload: event, traceId });
     res.status(201).json(event);
   } catch (error: any) {
     console.error('Error recording entry:', error);
@@ -58,6 +102,7 @@ export const recordEntry = async (req: Request<{}, {}, EntryRequestBody>, res: R
 export const recordExit = async (req: Request<{}, {}, ExitRequestBody>, res: Response, next: NextFunction): Promise<void> => {
   try {
     const { car_plate, payment_status } = req.body;
+    const traceId: string | undefined = res.locals.traceId;
     if (!car_plate || !payment_status) {
       res.status(400).json({ error: 'car_plate and payment_status are required' });
       return;
@@ -68,55 +113,46 @@ export const recordExit = async (req: Request<{}, {}, ExitRequestBody>, res: Res
     }
 
 
-    const event = await prisma.parkingEvent.findFirst({
-      where: {
-        plateNumber: car_plate,
-        exitTime: null,
-      },
-      orderBy: {
-        entryTime: 'desc',
-      }
-    });
-
-    if (!event) {
-      const alert = await prisma.alert.create({
-        data: {
-          plateNumber: car_plate,
-          message: `Exit attempt for plate ${car_plate} with no recorded entry.`,
-          type: 'UNAUTHORIZED_EXIT',
-        },
-      });
-      broadcast({ type: 'NEW_ALERT', payload: alert });
-      res.status(404).json({ error: 'No active entry found for this car plate to exit.' });
-      return;
-    }
-
-    let updatedEvent;
     if (payment_status === 'PAID') {
-      updatedEvent = await prisma.parkingEvent.update({
-        where: { id: event.id },
-        data: {
-          exitTime: new Date(),
-          status: 'EXITED_PAID',
-        },
-      });
-      broadcast({ type: 'NEW_EXIT', payload: updatedEvent });
+      // Conditional update on the open session: closes it and frees the plate in one statement
+      let updatedEvent;
+      try {
+        updatedEvent = await traced(traceId, 'prisma.parkingEvent.update', () =>
+          prisma.parkingEvent.update({
+            where: { activeKey: car_plate },
+            data: {
+              exitTime: new Date(),
+              status: 'EXITED_PAID',
+              activeKey: null,
+              exitTraceId: traceId,
+            },
+          }),
+        );
+      } catch (error) {
+        if (!isNotFound(error)) throw error;
+        await createUnauthorizedExitAlert(car_plate, `Exit attempt for plate ${car_plate} with no recorded entry.`, traceId);
+        res.status(404).json({ error: 'No active entry found for this car plate to exit.' });
+        return;
+      }
+      recordPaidExitInSummary();
+      closedEventRollups(updatedEvent);
+      broadcast({ type: 'NEW_EXIT', payload: updatedEvent, traceId });
       res.status(200).json(updatedEvent);
     } else if (payment_status === 'UNPAID_ATTEMPT') {
-       // For unpaid attempt, we just log an alert. The event itself isn't 'closed' or 'exited'.
-       // The status 'EXITED_UNPAID_ATTEMPT' might be misleading if the car doesn't actually pass.
-       // Let's reconsider this: an unpaid *attempt* is an alert. The ParkingEvent status shouldn't change
-       // unless the car *actually* exits unpaid (which would be a different kind of alert/event status).
-
-      const alert = await prisma.alert.create({
-        data: {
-          plateNumber: car_plate,
-          message: `Unauthorized exit attempt for plate ${car_plate}. Payment pending.`,
-          type: 'UNAUTHORIZED_EXIT',
-        },
-      });
-      broadcast({ type: 'NEW_ALERT', payload: alert });
-      // Send a specific response for this case
+      // An unpaid *attempt* is only an alert; the ParkingEvent stays open until the car actually pays.
+      const event = await traced(traceId, 'prisma.parkingEvent.findUnique', () =>
+        prisma.parkingEvent.findUnique({ where: { activeKey: car_plate }, select: { id: true } }),
+      );
+      if (!event) {
+        await createUnauthorizedExitAlert(car_plate, `Exit attempt for plate ${car_plate} with no recorded entry.`, traceId);
+        res.status(404).json({ error: 'No active entry found for this car plate to exit.' });
+        return;
+      }
+      const alert = await createUnauthorizedExitAlert(
+        car_plate,
+        `Unauthorized exit attempt for plate ${car_plate}. Payment pending.`,
+        traceId,
+      );
       res.status(403).json({ message: "Unauthorized exit attempt: Payment pending. Alert logged.", alert });
     }
     // The else for invalid payment_status is handled above.
@@ -129,21 +165,159 @@ export const recordExit = async (req: Request<{}, {}, ExitRequestBody>, res: Res
 export const recordAlert = async (req: Request<{}, {}, AlertRequestBody>, res: Response, next: NextFunction): Promise<void> => {
     try {
         const { plate_number, message, type } = req.body;
+        const traceId: string | undefined = res.locals.traceId;
         if (!message || !type) {
             res.status(400).json({ error: 'message and type are required for an alert' });
             return;
         }
-        const alert = await prisma.alert.create({
-            data: {
-                plateNumber: plate_number || null, // Ensure it's null if undefined
-                message,
-                type,
-            },
-        });
-        broadcast({ type: 'NEW_ALERT', payload: alert });
+        const alert = await traced(traceId, 'prisma.alert.create', () =>
+            prisma.alert.create({
+                data: {
+                    plateNumber: plate_number || null, // Ensure it's null if undefined
+                    message,
+                    type,
+                    traceId,
+                },
+            }),
+        );
+        recordAlertInSummary(alert.timestamp);
+        broadcast({ type: 'NEW_ALERT', payload: alert, traceId });
         res.status(201).json(alert);
     } catch (error: any) {
         console.error('Error recording alert:', error);
         res.status(500).json({ error: 'Failed to record alert', details: error.message });
     }
-};
\ No newline at end of file
+};
+
+type TimedBatchEvent = BatchEvent & { at: Date };
+interface BatchMessage { type: 'NEW_ENTRY' | 'NEW_EXIT' | 'NEW_ALERT'; payload: any; traceId?: string }
+
+// Splits the batch into rounds holding at most one item per plate: round k is every plate's k-th item.
+// Items of different plates are independent, so each round can be applied with set-based statements
+// while an exit followed by a re-entry of the same plate still lands in that order.
+const plateRounds = <T extends { car_plate: string }>(items: T[]) => {
+  const rounds: T[][] = [];
+  const seen = new Map<string, number>();
+  for (const item of items) {
+    const round = seen.get(item.car_plate) ?? 0;
+    seen.set(item.car_plate, round + 1);
+    (rounds[round] ??= []).push(item);
+  }
+  return rounds;
+};
+
+// One round in at most five statements, whatever its size: insert entries + read back the rows that were inserted,
+// lock + close the open sessions of paid exits, insert alerts.
+const applyBatchRound = async (tx: Prisma.TransactionClient, round: TimedBatchEvent[], traceId?: string) => {
+  const messages: BatchMessage[] = [];
+  const unmatchedExits: string[] = [];
+  const entries = round.filter((item) => item.payment_status === undefined).map((item) => ({ id: randomUUID(), item }));
+  if (entries.length) {
+    await tx.parkingEvent.createMany({
+      data: entries.map(({ id, item }) => ({
+        id,
+        plateNumber: item.car_plate,
+        status: 'ENTERED',
+        entryTime: item.at,
+        activeKey: item.car_plate,
+        traceId: item.trace_id ?? traceId,
+      })),
+      skipDuplicates: true, // INSERT IGNORE on the activeKey index: plates with an open session are skipped
+    });
+    // The ids were assigned here, so they name exactly the rows this round inserted
+    const created = await tx.parkingEvent.findMany({ where: { id: { in: entries.map(({ id }) => id) } } });
+    for (const event of created) messages.push({ type: 'NEW_ENTRY', payload: event, traceId: event.traceId ?? undefined });
+  }
+  const paid = round.filter((item) => item.payment_status === 'PAID');
+  if (paid.length) {
+    // FOR UPDATE: a concurrent request cannot close these sessions between this read and the UPDATE
+    const open = await tx.$queryRaw<ParkingEvent[]>`
+      SELECT * FROM \`ParkingEvent\` WHERE \`activeKey\` IN (${Prisma.join(paid.map((item) => item.car_plate))}) FOR UPDATE`;
+    const openByPlate = new Map(open.map((event) => [event.plateNumber, event]));
+    const closing = paid.flatMap((item) => {
+      const event = openByPlate.get(item.car_plate);
+      if (!event) unmatchedExits.push(item.car_plate);
+      return event ? [{ event, item, exitTraceId: item.trace_id ?? traceId ?? null }] : [];
+    });
+    if (closing.length) {
+      await tx.$executeRaw`
+        UPDATE \`ParkingEvent\` SET
+          \`exitTime\` = CASE \`id\` ${Prisma.join(closing.map(({ event, item }) => Prisma.sql`WHEN ${event.id} THEN ${item.at}`), ' ')} END,
+          \`exitTraceId\` = CASE \`id\` ${Prisma.join(closing.map(({ event, exitTraceId }) => Prisma.sql`WHEN ${event.id} THEN ${exitTraceId}`), ' ')} END,
+          \`status\` = 'EXITED_PAID', \`activeKey\` = NULL, \`updatedAt\` = NOW(3)
+        WHERE \`id\` IN (${Prisma.join(closing.map(({ event }) => event.id))})`;
+    }
+    for (const { event, item, exitTraceId } of closing) {
+      messages.push({
+        type: 'NEW_EXIT',
+        payload: { ...event, exitTime: item.at, status: 'EXITED_PAID', activeKey: null, exitTraceId, updatedAt: new Date() },
+        traceId: exitTraceId ?? undefined,
+      });
+    }
+  }
+  const alerts = round.filter((item) => item.payment_status === 'UNPAID_ATTEMPT').map((item) => ({
+    id: randomUUID(),
+    plateNumber: item.car_plate,
+    message: `Unauthorized exit attempt for plate ${item.car_plate}. Payment pending.`,
+    type: 'UNAUTHORIZED_EXIT',
+    timestamp: item.at,
+    traceId: item.trace_id ?? traceId ?? null,
+  }));
+  if (alerts.length) {
+    await tx.alert.createMany({ data: alerts });
+    for (const alert of alerts) messages.push({ type: 'NEW_ALERT', payload: alert, traceId: alert.traceId ?? undefined });
+  }
+  return { messages, duplicateEntries: entries.length - messages.filter((message) => message.type === 'NEW_ENTRY').length, unmatchedExits };
+};
+
+// Gate backlog ingestion: the whole body is applied in one transaction, in rounds of set-based statements
+// (see plateRounds), so a backlog where every plate appears once costs a handful of statements. Every item
+// keeps its own gate timestamp and trace; the request's time and trace are the fallbacks. Entries for a plate
+// that is already open are skipped; paid exits close the plate's open session; unpaid attempts become alerts.
+export const recordBatch = async (req: Request<{}, {}, BatchRequestBody>, res: Response, next: NextFunction): Promise<void> => {
+  try {
+    const events = req.body.events;
+    if (!Array.isArray(events) || events.some((item) => !item?.car_plate)) {
+      res.status(400).json({ error: 'events must be an array of objects with car_plate' });
+      return;
+    }
+    if (events.some((item) => item.payment_status !== undefined && item.payment_status !== 'PAID' && item.payment_status !== 'UNPAID_ATTEMPT')) {
+      res.status(400).json({ error: "Invalid payment_status. Must be 'PAID' or 'UNPAID_ATTEMPT'." });
+      return;
+    }
+    const now = new Date();
+    const timed: TimedBatchEvent[] = events.map((item) => ({ ...item, at: item.timestamp ? new Date(item.timestamp) : now }));
+    if (timed.some((item) => Number.isNaN(item.at.getTime()))) {
+      res.status(400).json({ error: 'timestamp must be an ISO 8601 date' });
+      return;
+    }
+
+    const traceId: string | undefined = res.locals.traceId;
+    const rounds = await traced(traceId, 'prisma.batchTransaction', () => prisma.$transaction(async (tx) => {
+      const results: Awaited<ReturnType<typeof applyBatchRound>>[] = [];
+      for (const round of plateRounds(timed)) results.push(await applyBatchRound(tx, round, traceId));
+      return results;
+    }));
+
+    const applied = rounds.flatMap((round) => round.messages);
+    const rollups: [Date, RollupCounts][] = [];
+    for (const { type, payload, traceId: itemTraceId } of applied) {
+      if (type === 'NEW_ENTRY') { recordEntryInSummary(); rollups.push([payload.entryTime, { entries: 1 }]); }
+      else if (type === 'NEW_EXIT') { recordPaidExitInSummary(); rollups.push(closedEventCounts(payload)); }
+      else recordAlertInSummary(payload.timestamp);
+      broadcast({ type, payload, traceId: itemTraceId });
+    }
+    trackRollupsBatch('BACKEND', rollups);
+    const count = (type: BatchMessage['type']) => applied.filter((message) => message.type === type).length;
+    res.status(201).json({
+      entered: count('NEW_ENTRY'),
+      duplicateEntries: rounds.reduce((sum, round) => sum + round.duplicateEntries, 0),
+      exited: count('NEW_EXIT'),
+      unmatchedExits: rounds.flatMap((round) => round.unmatchedExits),
+      alerts: count('NEW_ALERT'),
+    });
+  } catch (error: any) {
+    console.error('Error recording event batch:', error);
+    res.status(500).json({ error: 'Failed to record event batch', details: error.message });
+  }
+};
@@ -0,0 +1,111 @@
+import { Request, Response } from 'express';
+import { Prisma } from '@prisma/client';
+import prisma from '../prismaClient';
+
+interface HistoryQuery {
+  plate?: string;
+  status?: string;
+  type?: string;
+  from?: string;
+  to?: string;
+  cursor?: string;
+  limit?: string;
+}
+
+const DEFAULT_LIMIT = 50;
+const MAX_LIMIT = 200;
+
+// Opaque keyset cursor: the (time, id) of the last row of the previous page. Rows are ordered by
+// time DESC, id DESC, so the next page is everything strictly "before" that pair; each page is a
+// bounded index range scan no matter how deep the operator pages.
+const encodeCursor = (time: Date, id: string) => Buffer.from(`${time.toISOString()}|${id}`).toString('base64url');
+
+const decodeCursor = (cursor: string) => {
+  const [time, id] = Buffer.from(cursor, 'base64url').toString().split('|');
+  const at = new Date(time);
+  return id && !isNaN(at.getTime()) ? { at, id } : null;
+};
+
+const parseHistoryQuery = (query: HistoryQuery) => {
+  const from = query.from ? new Date(query.from) : null;
+  const to = query.to ? new Date(query.to) : null;
+  if ((from && isNaN(from.getTime())) || (to && isNaN(to.getTime()))) return { error: 'from/to must be valid dates' };
+  const limit = query.limit ? parseInt(query.limit, 10) : DEFAULT_LIMIT;
+  if (isNaN(limit) || limit < 1) return { error: 'limit must be a positive integer' };
+  const cursor = query.cursor ? decodeCursor(query.cursor) : null;
+  if (query.cursor && !cursor) return { error: 'invalid cursor' };
+  return {
+    plate: query.plate?.trim().toUpperCase() || null,
+    from,
+    to,
+    cursor,
+    limit: Math.min(limit, MAX_LIMIT),
+  };
+};
+
+const timeRange = (from: Date | null, to: Date | null) =>
+  from || to ? { ...(from ? { gte: from } : {}), ...(to ? { lt: to } : {}) } : undefined;
+
+// Fetches one extra row to learn whether another page exists without a COUNT(*)
+const toPage = <T extends { id: string }>(rows: T[], limit: number, timeOf: (row: T) => Date) => {
+  const items = rows.slice(0, limit);
+  const last = items[items.length - 1];
+  return { items, nextCursor: rows.length > limit && last ? encodeCursor(timeOf(last), last.id) : null };
+};
+
+// GET /analytics/events/history?plate=RAB&status=ENTERED&from=...&to=...&cursor=...&limit=50
+// Served by the (plateNumber|status, createdAt, id) and (createdAt, id) indexes.
+export const getEventHistory = async (req: Request<{}, {}, {}, HistoryQuery>, res: Response) => {
+  try {
+    const query = parseHistoryQuery(req.query);
+    if ('error' in query) {
+      res.status(400).json({ error: query.error });
+      return;
+    }
+    const where: Prisma.ParkingEventWhereInput = {
+      ...(query.plate ? { plateNumber: { startsWith: query.plate } } : {}),
+      ...(req.query.status ? { status: req.query.status } : {}),
+      ...(timeRange(query.from, query.to) ? { createdAt: timeRange(query.from, query.to) } : {}),
+      ...(query.cursor
+        ? { OR: [{ createdAt: { lt: query.cursor.at } }, { createdAt: query.cursor.at, id: { lt: query.cursor.id } }] }
+        : {}),
+    };
+    const rows = await prisma.parkingEvent.findMany({
+      where,
+      orderBy: [{ createdAt: 'desc' }, { id: 'desc' }],
+      take: query.limit + 1,
+    });
+    res.json(toPage(rows, query.limit, (row) => row.createdAt));
+  } catch (error: any) {
+    console.error('Error fetching event history:', error);
+    res.status(500).json({ error: 'Failed to fetch event history', details: error.message });
+  }
+};
+
+// GET /analytics/alerts/history?plate=RAB&type=UNAUTHORIZED_EXIT&from=...&to=...&cursor=...&limit=50
+export const getAlertHistory = async (req: Request<{}, {}, {}, HistoryQuery>, res: Response) => {
+  try {
+    const query = parseHistoryQuery(req.query);
+    if ('error' in query) {
+      res.status(400).json({ error: query.error });
+      return;
+    }
+    const where: Prisma.AlertWhereInput = {
+      ...(query.plate ? { plateNumber: { startsWith: query.plate } } : {}),
+      ...(req.query.type ? { type: req.query.type } : {}),
+      ...(timeRange(query.from, query.to) ? { timestamp: timeRange(query.from, query.to) } : {}),
+      ...(query.cursor
+        ? { OR: [{ timestamp: { lt: query.cursor.at } }, { timestamp: query.cursor.at, id: { lt: query.cursor.id } }] }
+        : {}),
+    };
+    const rows = await prisma.alert.findMany({
+      where,
+      orderBy: [{ timestamp: 'desc' }, { id: 'desc' }],
+      take: query.limit + 1,
+    });
+    res.json(toPage(rows, query.limit, (row) => row.timestamp));
+  } catch (error: any) {
+    console.error('Error fetching alert history:', error);
+    res.status(500).json({ error: 'Failed to fetch alert history', details: error.message });
+  }
+};
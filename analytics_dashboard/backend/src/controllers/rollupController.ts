@@ -0,0 +1,122 @@
+import { Request, Response } from 'express';
+import { subDays } from 'date-fns';
+import { findRollups, replaceRollups, RollupBucket, RollupGranularity, RollupSource } from '../services/rollupService';
+
+interface RangeQuery {
+  from?: string;
+  to?: string;
+  granularity?: string;
+  source?: string;
+}
+
+interface ImportRequestBody {
+  source?: string;
+  buckets: (Omit<RollupBucket, 'bucketStart'> & { bucketStart: string })[];
+}
+
+const parseRange = (query: RangeQuery, defaultSource: RollupSource) => {
+  const to = query.to ? new Date(query.to) : new Date();
+  const from = query.from ? new Date(query.from) : subDays(to, 7);
+  const granularity = (query.granularity || 'HOUR').toUpperCase();
+  const source = (query.source || defaultSource).toUpperCase();
+  if (isNaN(from.getTime()) || isNaN(to.getTime()) || from >= to) return { error: 'from/to must be valid dates with from < to' };
+  if (granularity !== 'HOUR' && granularity !== 'DAY') return { error: "granularity must be 'HOUR' or 'DAY'" };
+  if (source !== 'BACKEND' && source !== 'GATE') return { error: "source must be 'BACKEND' or 'GATE'" };
+  return { from, to, granularity: granularity as RollupGranularity, source: source as RollupSource };
+};
+
+export const getOccupancy = async (req: Request<{}, {}, {}, RangeQuery>, res: Response) => {
+  try {
+    const range = parseRange(req.query, 'BACKEND');
+    if ('error' in range) {
+      res.status(400).json({ error: range.error });
+      return;
+    }
+    const rollups = await findRollups(range.source, range.granularity, range.from, range.to);
+    let netOccupancy = 0; // Relative to the start of the range
+    const buckets = rollups.map((bucket) => {
+      netOccupancy += bucket.entries - bucket.exits;
+      return {
+        bucketStart: bucket.bucketStart,
+        entries: bucket.entries,
+        exits: bucket.exits,
+        netOccupancy,
+        avgDwellMinutes: bucket.dwellCount ? bucket.dwellSeconds / bucket.dwellCount / 60 : null,
+      };
+    });
+    const dwellSeconds = rollups.reduce((sum, bucket) => sum + bucket.dwellSeconds, 0);
+    const dwellCount = rollups.reduce((sum, bucket) => sum + bucket.dwellCount, 0);
+    res.json({ ...range, avgDwellMinutes: dwellCount ? dwellSeconds / dwellCount / 60 : null, buckets });
+  } catch (error: any) {
+    console.error('Error fetching occupancy:', error);
+    res.status(500).json({ error: 'Failed to fetch occupancy', details: error.message });
+  }
+};
+
+export const getRevenue = async (req: Request<{}, {}, {}, RangeQuery>, res: Response) => {
+  try {
+    const range = parseRange(req.query, 'GATE'); // Amounts only exist in the gate's parking_log
+    if ('error' in range) {
+      res.status(400).json({ error: range.error });
+      return;
+    }
+    const rollups = await findRollups(range.source, range.granularity, range.from, range.to);
+    res.json({
+      ...range,
+      totalRevenue: rollups.reduce((sum, bucket) => sum + bucket.revenue, 0),
+      buckets: rollups.map((bucket) => ({ bucketStart: bucket.bucketStart, revenue: bucket.revenue, paidExits: bucket.exits })),
+    });
+  } catch (error: any) {
+    console.error('Error fetching revenue:', error);
+    res.status(500).json({ error: 'Failed to fetch revenue', details: error.message });
+  }
+};
+
+export const getPeakHeatmap = async (req: Request<{}, {}, {}, RangeQuery>, res: Response) => {
+  try {
+    const range = parseRange({ ...req.query, granularity: 'HOUR' }, 'BACKEND');
+    if ('error' in range) {
+      res.status(400).json({ error: range.error });
+      return;
+    }
+    const rollups = await findRollups(range.source, 'HOUR', range.from, range.to);
+    // entries[dayOfWeek][hour], dayOfWeek 0 = Sunday, in the server's local time
+    const entries = Array.from({ length: 7 }, () => new Array<number>(24).fill(0));
+    for (const bucket of rollups) {
+      entries[bucket.bucketStart.getDay()][bucket.bucketStart.getHours()] += bucket.entries;
+    }
+    let peak = { dayOfWeek: 0, hour: 0, entries: 0 };
+    entries.forEach((hours, dayOfWeek) => hours.forEach((count, hour) => {
+      if (count > peak.entries) peak = { dayOfWeek, hour, entries: count };
+    }));
+    res.json({ from: range.from, to: range.to, source: range.source, entries, peak });
+  } catch (error: any) {
+    console.error('Error fetching heatmap:', error);
+    res.status(500).json({ error: 'Failed to fetch heatmap', details: error.message });
+  }
+};
+
+export const importRollups = async (req: Request<{}, {}, ImportRequestBody>, res: Response) => {
+  try {
+    const { source = 'GATE', buckets } = req.body;
+    if (!Array.isArray(buckets)) {
+      res.status(400).json({ error: 'buckets array is required' });
+      return;
+    }
+    if (source !== 'GATE') {
+      // BACKEND buckets are maintained by trackRollups/rebuildBackendRollups; an import must never overwrite them
+      res.status(400).json({ error: "Only 'GATE' rollups can be imported" });
+      return;
+    }
+    const parsed = buckets.map((bucket) => ({ ...bucket, bucketStart: new Date(bucket.bucketStart) }));
+    if (parsed.some((bucket) => isNaN(bucket.bucketStart.getTime()) || (bucket.granularity !== 'HOUR' && bucket.granularity !== 'DAY'))) {
+      res.status(400).json({ error: 'Each bucket needs a valid bucketStart and granularity' });
+      return;
+    }
+    await replaceRollups('GATE', parsed);
+    res.status(200).json({ imported: parsed.length });
+  } catch (error: any) {
+    console.error('Error importing rollups:', error);
+    res.status(500).json({ error: 'Failed to import rollups', details: error.message });
+  }
+};
@@ -7,16 +7,22 @@ dotenv.config();
 import eventRoutes from './routes/eventRoutes';
 import analyticsRoutes from './routes/analyticsRoutes';
 import { initWebSocketServer } from './services/webSocketService';
+import { traceMiddleware } from './services/traceService';
 import prisma from './prismaClient';
+import { reconcileSummary, startSummaryReconciliation } from './services/summaryService';
+import { startRollupReconciliation } from './services/rollupService';
 
 
 const app = express();
 const PORT = process.env.PORT || 3001;
+const SUMMARY_RECONCILE_MS = Number(process.env.SUMMARY_RECONCILE_MS) || 60000;
+const ROLLUP_RECONCILE_MS = Number(process.env.ROLLUP_RECONCILE_MS) || 300000;
+const ROLLUP_LOOKBACK_HOURS = Number(process.env.ROLLUP_LOOKBACK_HOURS) || 2;
 
 app.use(cors()); // Allow requests from frontend
 app.use(express.json()); // Parse JSON bodies
 
-app.use('/api/events', eventRoutes);
+app.use('/api/events', traceMiddleware, eventRoutes); // Gate calls carry X-Trace-Id
 app.use('/api/analytics', analyticsRoutes);
 
 app.get('/', (req, res) => {
@@ -31,6 +37,9 @@ server.listen(PORT, async () => {
   try {
     await prisma.$connect();
     console.log('Successfully connected to the database.');
+    await reconcileSummary();
+    startSummaryReconciliation(SUMMARY_RECONCILE_MS);
+    startRollupReconciliation(ROLLUP_RECONCILE_MS, ROLLUP_LOOKBACK_HOURS);
   } catch (error) {
     console.error('Failed to connect to the database:', error);
     process.exit(1);
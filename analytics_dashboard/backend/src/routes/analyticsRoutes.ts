@@ -1,10 +1,18 @@
 import { Router } from 'express';
 import { getSummary, getRecentEvents, getRecentAlerts } from '../controllers/analyticsController';
+import { getEventHistory, getAlertHistory } from '../controllers/historyController';
+import { getOccupancy, getRevenue, getPeakHeatmap, importRollups } from '../controllers/rollupController';
 
 const router = Router();
 
 router.get('/summary', getSummary);
 router.get('/events', getRecentEvents);
 router.get('/alerts', getRecentAlerts);
+router.get('/events/history', getEventHistory);
+router.get('/alerts/history', getAlertHistory);
+router.get('/occupancy', getOccupancy);
+router.get('/revenue', getRevenue);
+router.get('/heatmap', getPeakHeatmap);
+router.post('/rollups', importRollups);
 
 export default router;
\ No newline at end of file
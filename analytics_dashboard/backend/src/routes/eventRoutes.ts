@@ -1,10 +1,11 @@
 import { Router } from 'express';
-import { recordAlert, recordEntry, recordExit } from '../controllers/eventController';
+import { recordAlert, recordBatch, recordEntry, recordExit } from '../controllers/eventController';
 
 const router = Router();
 
 router.post('/entry', recordEntry);
 router.post('/exit', recordExit);
 router.post('/alert', recordAlert);
+router.post('/batch', recordBatch);
 
 export default router;
\ No newline at end of file
@@ -0,0 +1,115 @@
+import { Prisma } from '@prisma/client';
+import { startOfHour, startOfDay, subHours } from 'date-fns';
+import prisma from '../prismaClient';
+
+export type RollupSource = 'BACKEND' | 'GATE';
+export type RollupGranularity = 'HOUR' | 'DAY';
+
+export interface RollupCounts {
+  entries?: number;
+  exits?: number;
+  dwellSeconds?: number;
+  dwellCount?: number;
+  revenue?: number;
+}
+
+export interface RollupBucket extends RollupCounts {
+  granularity: RollupGranularity;
+  bucketStart: Date;
+}
+
+const bucketRow = (source: RollupSource, bucket: RollupBucket) => Prisma.sql`(
+  ${source}, ${bucket.granularity}, ${bucket.bucketStart}, ${bucket.entries ?? 0}, ${bucket.exits ?? 0},
+  ${Math.round(bucket.dwellSeconds ?? 0)}, ${bucket.dwellCount ?? 0}, ${bucket.revenue ?? 0}, NOW(3))`;
+
+// Adds counts to the hourly and daily bucket containing `at` in a single statement.
+export const incrementRollups = async (source: RollupSource, at: Date, counts: RollupCounts) => {
+  const rows = [
+    bucketRow(source, { granularity: 'HOUR', bucketStart: startOfHour(at), ...counts }),
+    bucketRow(source, { granularity: 'DAY', bucketStart: startOfDay(at), ...counts }),
+  ];
+  await prisma.$executeRaw`
+    INSERT INTO \`OccupancyRollup\` (\`source\`, \`granularity\`, \`bucketStart\`, \`entries\`, \`exits\`, \`dwellSeconds\`, \`dwellCount\`, \`revenue\`, \`updatedAt\`)
+    VALUES ${Prisma.join(rows)}
+    ON DUPLICATE KEY UPDATE
+      \`entries\` = \`entries\` + VALUES(\`entries\`), \`exits\` = \`exits\` + VALUES(\`exits\`),
+      \`dwellSeconds\` = \`dwellSeconds\` + VALUES(\`dwellSeconds\`), \`dwellCount\` = \`dwellCount\` + VALUES(\`dwellCount\`),
+      \`revenue\` = \`revenue\` + VALUES(\`revenue\`), \`updatedAt\` = VALUES(\`updatedAt\`)`;
+};
+
+// Ingest must not wait on (or fail because of) analytics bookkeeping; a lost increment is repaired
+// by the next rebuildBackendRollups pass.
+export const trackRollups = (source: RollupSource, at: Date, counts: RollupCounts) => {
+  incrementRollups(source, at, counts).catch((error) => console.error('Rollup update failed:', error));
+};
+
+// Many events at once (batch ingest): counts are summed per hour first, so the cost is one statement per hour touched.
+export const trackRollupsBatch = (source: RollupSource, events: [Date, RollupCounts][]) => {
+  const hours = new Map<number, Required<RollupCounts>>();
+  for (const [at, counts] of events) {
+    const key = startOfHour(at).getTime();
+    const sum = hours.get(key) ?? { entries: 0, exits: 0, dwellSeconds: 0, dwellCount: 0, revenue: 0 };
+    sum.entries += counts.entries ?? 0;
+    sum.exits += counts.exits ?? 0;
+    sum.dwellSeconds += counts.dwellSeconds ?? 0;
+    sum.dwellCount += counts.dwellCount ?? 0;
+    sum.revenue += counts.revenue ?? 0;
+    hours.set(key, sum);
+  }
+  for (const [hour, counts] of hours) trackRollups(source, new Date(hour), counts);
+};
+
+// Replaces whole buckets; used by the gate export job, which sends absolute totals so retries are idempotent.
+export const replaceRollups = async (source: RollupSource, buckets: RollupBucket[]) => {
+  if (buckets.length === 0) return 0;
+  return prisma.$executeRaw`
+    INSERT INTO \`OccupancyRollup\` (\`source\`, \`granularity\`, \`bucketStart\`, \`entries\`, \`exits\`, \`dwellSeconds\`, \`dwellCount\`, \`revenue\`, \`updatedAt\`)
+    VALUES ${Prisma.join(buckets.map((bucket) => bucketRow(source, bucket)))}
+    ON DUPLICATE KEY UPDATE
+      \`entries\` = VALUES(\`entries\`), \`exits\` = VALUES(\`exits\`), \`dwellSeconds\` = VALUES(\`dwellSeconds\`),
+      \`dwellCount\` = VALUES(\`dwellCount\`), \`revenue\` = VALUES(\`revenue\`), \`updatedAt\` = VALUES(\`updatedAt\`)`;
+};
+
+export const findRollups = (source: RollupSource, granularity: RollupGranularity, from: Date, to: Date) =>
+  prisma.occupancyRollup.findMany({
+    where: { source, granularity, bucketStart: { gte: from, lt: to } },
+    orderBy: { bucketStart: 'asc' },
+  });
+
+// Re-derives BACKEND buckets from ParkingEvent since the start of the day `lookbackHours` ago (so DAY buckets
+// are rebuilt whole), overwriting whatever the fire-and-forget increments left behind.
+export const rebuildBackendRollups = async (lookbackHours: number) => {
+  const from = startOfDay(subHours(new Date(), lookbackHours));
+  const events = await prisma.parkingEvent.findMany({
+    where: { OR: [{ entryTime: { gte: from } }, { status: 'EXITED_PAID', exitTime: { gte: from } }] },
+    select: { entryTime: true, exitTime: true, status: true },
+  });
+  const buckets = new Map<string, Required<RollupBucket>>();
+  const add = (at: Date, counts: RollupCounts) => {
+    for (const [granularity, bucketStart] of [['HOUR', startOfHour(at)], ['DAY', startOfDay(at)]] as [RollupGranularity, Date][]) {
+      const key = `${granularity}:${bucketStart.getTime()}`;
+      const bucket = buckets.get(key) ?? { granularity, bucketStart, entries: 0, exits: 0, dwellSeconds: 0, dwellCount: 0, revenue: 0 };
+      bucket.entries += counts.entries ?? 0;
+      bucket.exits += counts.exits ?? 0;
+      bucket.dwellSeconds += counts.dwellSeconds ?? 0;
+      bucket.dwellCount += counts.dwellCount ?? 0;
+      buckets.set(key, bucket);
+    }
+  };
+  for (const event of events) {
+    if (event.entryTime >= from) add(event.entryTime, { entries: 1 });
+    if (event.status === 'EXITED_PAID' && event.exitTime && event.exitTime >= from) {
+      add(event.exitTime, { exits: 1, dwellSeconds: (event.exitTime.getTime() - event.entryTime.getTime()) / 1000, dwellCount: 1 });
+    }
+  }
+  await replaceRollups('BACKEND', [...buckets.values()]);
+  return buckets.size;
+};
+
+export const startRollupReconciliation = (intervalMs: number, lookbackHours: number) => {
+  const timer = setInterval(() => {
+    rebuildBackendRollups(lookbackHours).catch((error) => console.error('Rollup reconciliation failed:', error));
+  }, intervalMs);
+  timer.unref();
+  return timer;
+};
@@ -0,0 +1,104 @@
+import prisma from '../prismaClient';
+import { subDays, startOfDay, endOfDay, format } from 'date-fns';
+
+export interface SummaryData {
+  totalEntriesToday: number;
+  totalExitsToday: number;
+  vehiclesCurrentlyIn: number;
+  recentAlertsCount: number;
+}
+
+// Alerts are kept in 5-minute buckets so the rolling 24h count can be maintained without a query.
+const ALERT_BUCKET_MS = 5 * 60 * 1000;
+const ALERT_WINDOW_MS = 24 * 60 * 60 * 1000;
+
+let currentDay = '';
+let totalEntriesToday = 0;
+let totalExitsToday = 0;
+let vehiclesCurrentlyIn = 0;
+let alertBuckets = new Map<number, number>();
+let initialized = false;
+let reconciling: Promise<void> | null = null;
+
+const dayKey = (date: Date) => format(date, 'yyyy-MM-dd');
+const alertBucket = (date: Date) => Math.floor(date.getTime() / ALERT_BUCKET_MS);
+
+const rollDay = () => {
+  const today = dayKey(new Date());
+  if (today !== currentDay) {
+    currentDay = today;
+    totalEntriesToday = 0;
+    totalExitsToday = 0;
+    if (initialized) void reconcileSummary(); // Counts carried over midnight are re-read, not guessed
+  }
+};
+
+const countRecentAlerts = () => {
+  const oldest = alertBucket(new Date(Date.now() - ALERT_WINDOW_MS));
+  let count = 0;
+  for (const [bucket, bucketCount] of alertBuckets) {
+    if (bucket < oldest) alertBuckets.delete(bucket);
+    else count += bucketCount;
+  }
+  return count;
+};
+
+// Runs the four indexed counts once and replaces the in-memory counters. Updates that land while the
+// queries are in flight may be counted twice or not at all; the next reconciliation corrects them.
+export const reconcileSummary = (): Promise<void> => {
+  if (reconciling) return reconciling;
+  reconciling = (async () => {
+    const now = new Date();
+    // Bucket offsets are computed relative to a bucket-aligned start so the MySQL session time zone does not matter.
+    const firstBucket = alertBucket(subDays(now, 1));
+    const since = new Date(firstBucket * ALERT_BUCKET_MS);
+    const [entries, exits, currentlyIn, alertRows] = await Promise.all([
+      prisma.parkingEvent.count({ where: { entryTime: { gte: startOfDay(now), lte: endOfDay(now) } } }),
+      prisma.parkingEvent.count({ where: { status: 'EXITED_PAID', exitTime: { gte: startOfDay(now), lte: endOfDay(now) } } }),
+      prisma.parkingEvent.count({ where: { status: 'ENTERED', exitTime: null } }),
+      prisma.$queryRaw<{ bucket: bigint | number; count: bigint | number }[]>`
+        SELECT FLOOR(TIMESTAMPDIFF(SECOND, ${since}, \`timestamp\`) / ${ALERT_BUCKET_MS / 1000}) AS bucket, COUNT(*) AS count
+        FROM \`Alert\` WHERE \`timestamp\` >= ${since} GROUP BY bucket`,
+    ]);
+    currentDay = dayKey(now);
+    totalEntriesToday = entries;
+    totalExitsToday = exits;
+    vehiclesCurrentlyIn = currentlyIn;
+    alertBuckets = new Map(alertRows.map((row) => [firstBucket + Number(row.bucket), Number(row.count)]));
+    initialized = true;
+  })().finally(() => {
+    reconciling = null;
+  });
+  return reconciling;
+};
+
+export const getSummarySnapshot = async (): Promise<SummaryData> => {
+  if (!initialized) await reconcileSummary();
+  rollDay();
+  return { totalEntriesToday, totalExitsToday, vehiclesCurrentlyIn, recentAlertsCount: countRecentAlerts() };
+};
+
+export const recordEntryInSummary = () => {
+  rollDay();
+  totalEntriesToday += 1;
+  vehiclesCurrentlyIn += 1;
+};
+
+export const recordPaidExitInSummary = () => {
+  rollDay();
+  totalExitsToday += 1;
+  vehiclesCurrentlyIn = Math.max(0, vehiclesCurrentlyIn - 1);
+};
+
+export const recordAlertInSummary = (timestamp: Date = new Date()) => {
+  const bucket = alertBucket(timestamp);
+  alertBuckets.set(bucket, (alertBuckets.get(bucket) ?? 0) + 1);
+};
+
+export const startSummaryReconciliation = (intervalMs: number) => {
+  const timer = setInterval(() => {
+    reconcileSummary().catch((error) => console.error('Summary reconciliation failed:', error));
+  }, intervalMs);
+  timer.unref();
+  return timer;
+};
@@ -0,0 +1,71 @@
+import fs from 'fs';
+import path from 'path';
+import { randomUUID } from 'crypto';
+import { performance } from 'perf_hooks';
+import { Request, Response, NextFunction } from 'express';
+
+// Spans go to a JSON-lines file in the same shape as the gate's trace_utils.py, so
+// core_module/hardware/trace_report.py can join both into one per-vehicle waterfall.
+const TRACE_FILE = process.env.TRACE_FILE || 'logs/traces.jsonl';
+export const TRACE_HEADER = 'X-Trace-Id';
+const TRACE_ID_PATTERN = /^[A-Za-z0-9-]{8,64}$/;
+
+let output: fs.WriteStream | null = null;
+
+const stream = () => {
+  if (!output) {
+    fs.mkdirSync(path.dirname(TRACE_FILE), { recursive: true });
+    output = fs.createWriteStream(TRACE_FILE, { flags: 'a' });
+    output.on('error', (error) => console.error('Trace export failed:', error));
+  }
+  return output;
+};
+
+export const newTraceId = () => randomUUID().replace(/-/g, '');
+
+// start is epoch milliseconds (Date.now()); written as epoch seconds like the Python spans.
+export const recordSpan = (
+  traceId: string | undefined,
+  name: string,
+  start: number,
+  durationMs: number,
+  attrs: Record<string, unknown> = {},
+) => {
+  if (!traceId) return;
+  stream().write(
+    JSON.stringify({
+      trace_id: traceId,
+      service: 'backend',
+      name,
+      start: start / 1000,
+      duration_ms: Math.round(durationMs * 1000) / 1000,
+      ...attrs,
+    }) + '\n',
+  );
+};
+
+// Times one awaited call (a Prisma query, a transaction) as a span of the request's trace.
+export const traced = async <T>(traceId: string | undefined, name: string, fn: () => Promise<T>): Promise<T> => {
+  const start = Date.now();
+  const t0 = performance.now();
+  try {
+    return await fn();
+  } finally {
+    recordSpan(traceId, name, start, performance.now() - t0);
+  }
+};
+
+// Adopts the gate's X-Trace-Id (or starts a trace for callers without one), echoes it on the
+// response and records the whole request as a span once the response is sent.
+export const traceMiddleware = (req: Request, res: Response, next: NextFunction) => {
+  const incoming = req.header(TRACE_HEADER);
+  const traceId = incoming && TRACE_ID_PATTERN.test(incoming) ? incoming : newTraceId();
+  res.locals.traceId = traceId;
+  res.setHeader(TRACE_HEADER, traceId);
+  const start = Date.now();
+  const t0 = performance.now();
+  res.on('finish', () =>
+    recordSpan(traceId, `${req.method} ${req.baseUrl}${req.path}`, start, performance.now() - t0, { status: res.statusCode }),
+  );
+  next();
+};
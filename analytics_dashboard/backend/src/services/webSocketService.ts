@@ -1,35 +1,115 @@
 import WebSocket, { WebSocketServer } from 'ws';
+import { getSummarySnapshot, SummaryData } from './summaryService';
+import { recordSpan } from './traceService';
+
+// Events broadcast within one window go out as a single BATCH frame, serialized once for all clients.
+const COALESCE_WINDOW_MS = Number(process.env.WS_COALESCE_MS) || 100;
+const SUMMARY_INTERVAL_MS = Number(process.env.WS_SUMMARY_MS) || 5000;
+// A client whose socket buffer is above this is skipped for the window and resynced with a snapshot later.
+const MAX_BUFFERED_BYTES = 1024 * 1024;
 
 let wssInstance: WebSocketServer | null = null;
+let pending: { message: any; queuedAt: number }[] = [];
+let flushTimer: NodeJS.Timeout | null = null;
+let lastSummary: SummaryData | null = null;
+const staleClients = new WeakSet<WebSocket>();
+
+// New clients get the summary the last delta was computed against, so later deltas apply cleanly.
+const sendSummarySnapshot = async (client: WebSocket) => {
+  try {
+    const summary = lastSummary ?? await getSummarySnapshot();
+    if (client.readyState === WebSocket.OPEN) client.send(JSON.stringify({ type: 'SUMMARY_SNAPSHOT', payload: summary }));
+  } catch (error) {
+    console.error('Failed to send summary snapshot:', error);
+  }
+};
+
+const flush = () => {
+  flushTimer = null;
+  if (!wssInstance || pending.length === 0) return;
+  const batch = pending;
+  pending = [];
+  const jsonData = JSON.stringify({ type: 'BATCH', payload: batch.map((entry) => entry.message) });
+  let dropped = 0;
+  let sent = 0;
+  wssInstance.clients.forEach((client) => {
+    if (client.readyState !== WebSocket.OPEN) return;
+    if (client.bufferedAmount > MAX_BUFFERED_BYTES) {
+      staleClients.add(client);
+      dropped += 1;
+      return;
+    }
+    client.send(jsonData);
+    sent += 1;
+  });
+  if (dropped > 0) console.warn(`Skipped broadcast to ${dropped} slow WebSocket client(s)`);
+  // Queue wait + serialization + handing the frame to every socket, per traced message
+  const now = Date.now();
+  batch.forEach(({ message, queuedAt }) =>
+    recordSpan(message.traceId, `ws.${message.type}`, queuedAt, now - queuedAt, { clients: sent, dropped, batch: batch.length }),
+  );
+};
+
+const diffSummary = (previous: SummaryData | null, current: SummaryData) => {
+  const delta: Partial<SummaryData> = {};
+  (Object.keys(current) as (keyof SummaryData)[]).forEach((key) => {
+    if (!previous || previous[key] !== current[key]) delta[key] = current[key];
+  });
+  return delta;
+};
+
+const broadcastSummaryDelta = async () => {
+  if (!wssInstance || wssInstance.clients.size === 0) return;
+  const summary = await getSummarySnapshot();
+  const delta = diffSummary(lastSummary, summary);
+  lastSummary = summary;
+  const jsonData = Object.keys(delta).length > 0 ? JSON.stringify({ type: 'SUMMARY_DELTA', payload: delta }) : null;
+  wssInstance.clients.forEach((client) => {
+    if (client.readyState !== WebSocket.OPEN || client.bufferedAmount > MAX_BUFFERED_BYTES) return;
+    if (staleClients.has(client)) {
+      staleClients.delete(client); // Missed batches or deltas: start it over from a full snapshot
+      client.send(JSON.stringify({ type: 'SUMMARY_SNAPSHOT', payload: summary, resync: true }));
+    } else if (jsonData) {
+      client.send(jsonData);
+    }
+  });
+};
 
 export const initWebSocketServer = (server: any): WebSocketServer => {
-  const wss = new WebSocketServer({ server });
+  const wss = new WebSocketServer({
+    server,
+    perMessageDeflate: {
+      zlibDeflateOptions: { level: 3 },
+      threshold: 512, // Small deltas are cheaper to send uncompressed
+      concurrencyLimit: 4,
+    },
+  });
   console.log('WebSocket server initialized');
 
   wss.on('connection', (ws) => {
     console.log('Client connected to WebSocket');
-    ws.on('message', (message) => {
-      console.log('Received WebSocket message:', message.toString());
-    });
     ws.on('close', () => {
       console.log('Client disconnected from WebSocket');
     });
     ws.send(JSON.stringify({ type: 'CONNECTION_ACK', message: 'Successfully connected to WebSocket server!' }));
+    void sendSummarySnapshot(ws);
   });
+  const summaryTimer = setInterval(() => {
+    broadcastSummaryDelta().catch((error) => console.error('Failed to broadcast summary delta:', error));
+  }, SUMMARY_INTERVAL_MS);
+  summaryTimer.unref();
+  wss.on('close', () => clearInterval(summaryTimer));
   wssInstance = wss;
   return wss;
 };
 
+// Queues the message and returns immediately; delivery happens on the next coalescing flush.
+// A traceId on the message is delivered to clients and times the delivery as a span.
 export const broadcast = (data: any) => {
   if (!wssInstance) {
     console.error('WebSocket server not initialized. Cannot broadcast.');
     return;
   }
-  const jsonData = JSON.stringify(data);
-  wssInstance.clients.forEach((client) => {
-    if (client.readyState === WebSocket.OPEN) {
-      client.send(jsonData);
-    }
-  });
-  console.log('Broadcasted message:', jsonData);
-};
\ No newline at end of file
+  pending.push({ message: data, queuedAt: Date.now() });
+  if (!flushTimer) flushTimer = setTimeout(flush, COALESCE_WINDOW_MS);
+};
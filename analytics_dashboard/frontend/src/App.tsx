@@ -7,6 +7,7 @@ import AlertLog from './components/AlertLog';
 // Access environment variables using import.meta.env
 const BACKEND_HTTP_URL = import.meta.env.VITE_BACKEND_HTTP_URL;
 const BACKEND_WS_URL = import.meta.env.VITE_BACKEND_WS_URL;
+const MAX_LIVE_ROWS = 100; // Pushed rows kept in memory; older ones are paged in by the logs on demand
 
 // ... (rest of the SummaryData, ParkingEvent, Alert interfaces remain the same) ...
 interface SummaryData {
@@ -23,6 +24,8 @@ interface ParkingEvent {
   exitTime?: string | null;
   status: string;
   createdAt: string;
+  traceId?: string | null; // Gate trace of the entry pass (trace_report.py --trace)
+  exitTraceId?: string | null;
 }
 
 interface Alert {
@@ -31,6 +34,7 @@ interface Alert {
   message: string;
   type: string;
   timestamp: string;
+  traceId?: string | null;
 }
 
 
@@ -39,6 +43,7 @@ function App() {
   const [events, setEvents] = useState<ParkingEvent[]>([]);
   const [alerts, setAlerts] = useState<Alert[]>([]);
   const [isConnected, setIsConnected] = useState(false);
+  const [refreshKey, setRefreshKey] = useState(0); // Bumped to make the logs reload their first page
   const ws = useRef<WebSocket | null>(null);
 
   const fetchData = async () => {
@@ -47,30 +52,51 @@ function App() {
         console.error("Backend HTTP URL is not defined. Check your .env file and VITE_ prefix.");
         return;
       }
-      const [summaryRes, eventsRes, alertsRes] = await Promise.all([
-        fetch(`${BACKEND_HTTP_URL}/analytics/summary`),
-        fetch(`${BACKEND_HTTP_URL}/analytics/events`),
-        fetch(`${BACKEND_HTTP_URL}/analytics/alerts`),
-      ]);
-
-      if (!summaryRes.ok || !eventsRes.ok || !alertsRes.ok) {
-        console.error("Failed to fetch data from backend", {
-            summaryStatus: summaryRes.status,
-            eventsStatus: eventsRes.status,
-            alertsStatus: alertsRes.status,
-        });
+      // Event and alert history is paged in by EventLog/AlertLog themselves
+      const summaryRes = await fetch(`${BACKEND_HTTP_URL}/analytics/summary`);
+
+      if (!summaryRes.ok) {
+        console.error("Failed to fetch data from backend", { summaryStatus: summaryRes.status });
         // Optionally set some error state to display in UI
         return;
       }
 
       setSummary(await summaryRes.json());
-      setEvents(await eventsRes.json());
-      setAlerts(await alertsRes.json());
     } catch (error) {
       console.error('Failed to fetch initial data:', error);
     }
   };
   
+  // Summary counters arrive as SUMMARY_SNAPSHOT / SUMMARY_DELTA pushes, so events no longer trigger a refetch.
+  const handleServerMessage = (data: any) => {
+    if (data.type === 'NEW_ENTRY') {
+      setEvents(prev => [data.payload, ...prev.slice(0, MAX_LIVE_ROWS - 1)]);
+    } else if (data.type === 'NEW_EXIT') {
+      setEvents(prev => {
+        const existingIndex = prev.findIndex(e => e.id === data.payload.id);
+        if (existingIndex > -1) {
+          const updatedEvents = [...prev];
+          updatedEvents[existingIndex] = data.payload;
+          return updatedEvents;
+        }
+        return [data.payload, ...prev.slice(0, MAX_LIVE_ROWS - 1)];
+      });
+    } else if (data.type === 'NEW_ALERT') {
+      setAlerts(prev => [data.payload, ...prev.slice(0, MAX_LIVE_ROWS - 1)]);
+    } else if (data.type === 'SUMMARY_SNAPSHOT') {
+      setSummary(data.payload);
+      if (data.resync) { // Batches were dropped while this tab was too slow to keep up
+        setEvents([]);
+        setAlerts([]);
+        setRefreshKey(key => key + 1);
+      }
+    } else if (data.type === 'SUMMARY_DELTA') {
+      setSummary(prev => (prev ? { ...prev, ...data.payload } : prev));
+    } else if (data.type === 'CONNECTION_ACK') {
+      console.log('Connection Acknowledged by server:', data.message);
+    }
+  };
+
   const connectWebSocket = () => {
     if (!BACKEND_WS_URL) {
         console.error("Backend WebSocket URL is not defined. Check your .env file and VITE_ prefix.");
@@ -87,29 +113,12 @@ function App() {
     ws.current.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data as string);
-        console.log('Received WebSocket data:', data);
-
-        if (data.type === 'NEW_ENTRY') {
-          setEvents(prev => [data.payload, ...prev.slice(0, 19)]);
-          fetchData(); 
-        } else if (data.type === 'NEW_EXIT') {
-           setEvents(prev => {
-              const existingIndex = prev.findIndex(e => e.id === data.payload.id);
-              if (existingIndex > -1) {
-                  const updatedEvents = [...prev];
-                  updatedEvents[existingIndex] = data.payload;
-                  return updatedEvents;
-              }
-              return [data.payload, ...prev.slice(0,19)];
-           });
-          fetchData(); 
-        } else if (data.type === 'NEW_ALERT') {
-          setAlerts(prev => [data.payload, ...prev.slice(0, 19)]);
-          fetchData();
-        } else if (data.type === 'CONNECTION_ACK') {
-            console.log('Connection Acknowledged by server:', data.message);
+        // The server coalesces events into BATCH frames; React batches the resulting state updates.
+        if (data.type === 'BATCH') {
+          data.payload.forEach(handleServerMessage);
+        } else {
+          handleServerMessage(data);
         }
-
       } catch (error) {
         console.error('Error processing WebSocket message:', error);
       }
@@ -155,8 +164,8 @@ function App() {
       <SummaryStats summary={summary} />
 
       <div className="dashboard-layout">
-        <EventLog events={events} />
-        <AlertLog alerts={alerts} />
+        <EventLog liveEvents={events} refreshKey={refreshKey} />
+        <AlertLog liveAlerts={alerts} refreshKey={refreshKey} />
       </div>
     </div>
   );
@@ -1,5 +1,7 @@
-import React from 'react';
+import React, { useMemo, useState } from 'react';
 import { format } from 'date-fns'; // Make sure you have date-fns installed
+import VirtualList from './VirtualList';
+import { matchesHistoryFilters, mergeNewest, toIsoOrEmpty, useDebouncedValue, useKeysetHistory } from '../hooks/useKeysetHistory';
 
 interface Alert {
   id: string;
@@ -7,21 +9,56 @@ interface Alert {
   message: string;
   type: string;
   timestamp: string; // Assuming this is an ISO string date from backend
+  traceId?: string | null;
 }
 
 interface Props {
-  alerts: Alert[];
+  liveAlerts: Alert[]; // Bounded WebSocket pushes from App
+  refreshKey: number;
 }
 
-const AlertLog: React.FC<Props> = ({ alerts }) => {
+const ROW_HEIGHT = 150;
+
+const AlertLog: React.FC<Props> = ({ liveAlerts, refreshKey }) => {
+  const [plate, setPlate] = useState('');
+  const [type, setType] = useState('');
+  const [from, setFrom] = useState('');
+  const [to, setTo] = useState('');
+  const debouncedPlate = useDebouncedValue(plate.trim().toUpperCase());
+  const debouncedType = useDebouncedValue(type.trim().toUpperCase());
+  const filters = useMemo(
+    () => ({ plate: debouncedPlate, type: debouncedType, from: toIsoOrEmpty(from), to: toIsoOrEmpty(to) }),
+    [debouncedPlate, debouncedType, from, to],
+  );
+  const { items, loading, truncated, loadMore } = useKeysetHistory<Alert>('/analytics/alerts/history', filters, refreshKey);
+  const rows = useMemo(
+    () => mergeNewest(
+      liveAlerts.filter((alert) => matchesHistoryFilters(alert.plateNumber, alert.timestamp, filters) && (!filters.type || alert.type === filters.type)),
+      items,
+      (alert) => alert.timestamp,
+    ),
+    [liveAlerts, items, filters],
+  );
+
   return (
     <div className="card"> {/* Ensure .card class is styled */}
-      <h2>Recent Alerts</h2>
-      {alerts.length === 0 && <p>No recent alerts.</p>}
-      <ul>
-        {alerts.map((alert) => (
-          <li 
-            key={alert.id} 
+      <h2>Alerts</h2>
+      <div className="log-filters">
+        <input placeholder="Plate" value={plate} onChange={(e) => setPlate(e.target.value)} />
+        <input placeholder="Type (e.g. UNAUTHORIZED_EXIT)" value={type} onChange={(e) => setType(e.target.value)} />
+        <input type="datetime-local" value={from} onChange={(e) => setFrom(e.target.value)} title="From" />
+        <input type="datetime-local" value={to} onChange={(e) => setTo(e.target.value)} title="To" />
+      </div>
+      {rows.length === 0 && <p>{loading ? 'Loading alerts...' : 'No matching alerts.'}</p>}
+      <VirtualList
+        items={rows}
+        rowHeight={ROW_HEIGHT}
+        getKey={(alert) => alert.id}
+        onEndReached={loadMore}
+        renderItem={(alert, style) => (
+          <li
+            style={style}
+            title={alert.traceId ? `Trace ${alert.traceId}` : undefined}
             className={`alert-item ${alert.type.toLowerCase().includes('unauthorized') || alert.type.toLowerCase().includes('error') ? 'unauthorized' : ''}`}
             // Ensure .alert-item and .alert-item.unauthorized classes are styled
           >
@@ -30,10 +67,11 @@ const AlertLog: React.FC<Props> = ({ alerts }) => {
             <strong>Message:</strong> {alert.message} <br />
             <strong>Time:</strong> {format(new Date(alert.timestamp), 'MMM d, yyyy, h:mm:ss a')}
           </li>
-        ))}
-      </ul>
+        )}
+      />
+      {truncated && <p>Showing the newest {rows.length} alerts; narrow the filters to see older ones.</p>}
     </div>
   );
 };
 
-export default AlertLog;
\ No newline at end of file
+export default AlertLog;
@@ -1,5 +1,7 @@
-import React from 'react';
+import React, { useMemo, useState } from 'react';
 import { format } from 'date-fns'; // Make sure you have date-fns installed: npm install date-fns
+import VirtualList from './VirtualList';
+import { matchesHistoryFilters, mergeNewest, toIsoOrEmpty, useDebouncedValue, useKeysetHistory } from '../hooks/useKeysetHistory';
 
 interface ParkingEvent {
   id: string;
@@ -8,20 +10,58 @@ interface ParkingEvent {
   exitTime?: string | null;
   status: string;
   createdAt: string;
+  traceId?: string | null; // Gate trace of the entry pass (trace_report.py --trace)
+  exitTraceId?: string | null;
 }
 
 interface Props {
-  events: ParkingEvent[];
+  liveEvents: ParkingEvent[]; // Bounded WebSocket pushes from App
+  refreshKey: number;
 }
 
-const EventLog: React.FC<Props> = ({ events }) => {
+const EVENT_STATUSES = ['ENTERED', 'EXITED_PAID'];
+const ROW_HEIGHT = 150;
+
+const EventLog: React.FC<Props> = ({ liveEvents, refreshKey }) => {
+  const [plate, setPlate] = useState('');
+  const [status, setStatus] = useState('');
+  const [from, setFrom] = useState('');
+  const [to, setTo] = useState('');
+  const debouncedPlate = useDebouncedValue(plate.trim().toUpperCase());
+  const filters = useMemo(
+    () => ({ plate: debouncedPlate, status, from: toIsoOrEmpty(from), to: toIsoOrEmpty(to) }),
+    [debouncedPlate, status, from, to],
+  );
+  const { items, loading, truncated, loadMore } = useKeysetHistory<ParkingEvent>('/analytics/events/history', filters, refreshKey);
+  const rows = useMemo(
+    () => mergeNewest(
+      liveEvents.filter((event) => matchesHistoryFilters(event.plateNumber, event.createdAt, filters) && (!status || event.status === status)),
+      items,
+      (event) => event.createdAt,
+    ),
+    [liveEvents, items, filters, status],
+  );
+
   return (
     <div className="card"> {/* Ensure .card class is styled */}
-      <h2>Recent Parking Events</h2>
-      {events.length === 0 && <p>No recent events.</p>}
-      <ul>
-        {events.map((event) => (
-          <li key={event.id}>
+      <h2>Parking Events</h2>
+      <div className="log-filters">
+        <input placeholder="Plate" value={plate} onChange={(e) => setPlate(e.target.value)} />
+        <select value={status} onChange={(e) => setStatus(e.target.value)}>
+          <option value="">All statuses</option>
+          {EVENT_STATUSES.map((s) => <option key={s} value={s}>{s}</option>)}
+        </select>
+        <input type="datetime-local" value={from} onChange={(e) => setFrom(e.target.value)} title="From" />
+        <input type="datetime-local" value={to} onChange={(e) => setTo(e.target.value)} title="To" />
+      </div>
+      {rows.length === 0 && <p>{loading ? 'Loading events...' : 'No matching events.'}</p>}
+      <VirtualList
+        items={rows}
+        rowHeight={ROW_HEIGHT}
+        getKey={(event) => event.id}
+        onEndReached={loadMore}
+        renderItem={(event, style) => (
+          <li style={style} title={event.traceId ? `Trace ${event.traceId}` : undefined}>
             <strong>Plate:</strong> {event.plateNumber} <br />
             <strong>Status:</strong> {event.status} <br />
             <strong>Entry:</strong> {format(new Date(event.entryTime), 'MMM d, yyyy, h:mm:ss a')}
@@ -31,10 +71,11 @@ const EventLog: React.FC<Props> = ({ events }) => {
             <br />
             <small>Logged: {format(new Date(event.createdAt), 'MMM d, yyyy, h:mm:ss a')}</small>
           </li>
-        ))}
-      </ul>
+        )}
+      />
+      {truncated && <p>Showing the newest {rows.length} events; narrow the filters to see older ones.</p>}
     </div>
   );
 };
 
-export default EventLog;
\ No newline at end of file
+export default EventLog;
@@ -0,0 +1,38 @@
+import React, { useEffect, useState } from 'react';
+
+interface Props<T> {
+  items: T[];
+  rowHeight: number; // Row pitch in px, including the gap below each row
+  height?: number;
+  overscan?: number;
+  getKey: (item: T) => string;
+  renderItem: (item: T, style: React.CSSProperties) => React.ReactNode; // Must render an <li> with the given style
+  onEndReached?: () => void;
+}
+
+const ROW_GAP = 10; // Matches the li margin-bottom in App.css
+
+// Renders only the rows inside the scroll viewport (plus overscan); two spacer rows stand in for the rest,
+// so DOM size stays constant however many rows have been loaded or pushed.
+function VirtualList<T>({ items, rowHeight, height = 400, overscan = 4, getKey, renderItem, onEndReached }: Props<T>) {
+  const [scrollTop, setScrollTop] = useState(0);
+  const first = Math.max(0, Math.floor(scrollTop / rowHeight) - overscan);
+  const last = Math.min(items.length, Math.ceil((scrollTop + height) / rowHeight) + overscan);
+
+  useEffect(() => {
+    if (onEndReached && items.length > 0 && last >= items.length) onEndReached();
+  }, [last, items.length, onEndReached]);
+
+  const rowStyle: React.CSSProperties = { height: rowHeight - ROW_GAP, boxSizing: 'border-box', overflow: 'hidden' };
+  return (
+    <ul className="virtual-list" style={{ height }} onScroll={(e) => setScrollTop(e.currentTarget.scrollTop)}>
+      <li className="virtual-spacer" aria-hidden style={{ height: first * rowHeight }} />
+      {items.slice(first, last).map((item) => (
+        <React.Fragment key={getKey(item)}>{renderItem(item, rowStyle)}</React.Fragment>
+      ))}
+      <li className="virtual-spacer" aria-hidden style={{ height: (items.length - last) * rowHeight }} />
+    </ul>
+  );
+}
+
+export default VirtualList;
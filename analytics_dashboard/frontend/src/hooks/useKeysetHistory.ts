@@ -0,0 +1,97 @@
+import { useCallback, useEffect, useRef, useState } from 'react';
+
+const BACKEND_HTTP_URL = import.meta.env.VITE_BACKEND_HTTP_URL;
+export const MAX_HISTORY_ROWS = 1000; // Older pages stop loading here; narrow the filters to go further back
+
+export interface HistoryFilters {
+  plate: string;
+  from: string; // ISO strings, '' when unset
+  to: string;
+  [key: string]: string;
+}
+
+interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+// Pages through a keyset history endpoint; changing the filters (or refreshKey) restarts from the newest row.
+export function useKeysetHistory<T extends { id: string }>(path: string, filters: HistoryFilters, refreshKey: number) {
+  const query = new URLSearchParams(Object.entries(filters).filter(([, value]) => value)).toString();
+  const [items, setItems] = useState<T[]>([]);
+  const [loading, setLoading] = useState(false);
+  const [truncated, setTruncated] = useState(false);
+  const cursor = useRef<string | null>(null);
+  const hasMore = useRef(true);
+  const loaded = useRef(0);
+  const inFlight = useRef(false);
+  const generation = useRef(0);
+
+  const loadMore = useCallback(async () => {
+    if (inFlight.current || !hasMore.current || !BACKEND_HTTP_URL) return;
+    const current = generation.current;
+    inFlight.current = true;
+    setLoading(true);
+    try {
+      const params = new URLSearchParams(query);
+      if (cursor.current) params.set('cursor', cursor.current);
+      const res = await fetch(`${BACKEND_HTTP_URL}${path}?${params}`);
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const page: Page<T> = await res.json();
+      if (current !== generation.current) return; // Filters changed while this page was in flight
+      const room = MAX_HISTORY_ROWS - loaded.current;
+      loaded.current += Math.min(room, page.items.length);
+      cursor.current = page.nextCursor;
+      hasMore.current = page.nextCursor !== null && loaded.current < MAX_HISTORY_ROWS;
+      setTruncated(page.nextCursor !== null && loaded.current >= MAX_HISTORY_ROWS);
+      setItems((prev) => [...prev, ...page.items.slice(0, room)]);
+    } catch (error) {
+      console.error(`Failed to fetch ${path}:`, error);
+      hasMore.current = false;
+    } finally {
+      if (current === generation.current) {
+        inFlight.current = false;
+        setLoading(false);
+      }
+    }
+  }, [path, query]);
+
+  useEffect(() => {
+    generation.current += 1;
+    cursor.current = null;
+    hasMore.current = true;
+    loaded.current = 0;
+    inFlight.current = false;
+    setItems([]);
+    setTruncated(false);
+    loadMore();
+  }, [loadMore, refreshKey]);
+
+  return { items, loading, truncated, loadMore };
+}
+
+export function useDebouncedValue<T>(value: T, delayMs = 300) {
+  const [debounced, setDebounced] = useState(value);
+  useEffect(() => {
+    const timer = setTimeout(() => setDebounced(value), delayMs);
+    return () => clearTimeout(timer);
+  }, [value, delayMs]);
+  return debounced;
+}
+
+// datetime-local input (local time) -> ISO string for the API
+export const toIsoOrEmpty = (value: string) => (value ? new Date(value).toISOString() : '');
+
+// Client-side mirror of the server filters, applied to rows pushed over the WebSocket
+export const matchesHistoryFilters = (plate: string | null | undefined, time: string, filters: HistoryFilters) =>
+  (!filters.plate || (plate ?? '').toUpperCase().startsWith(filters.plate)) &&
+  (!filters.from || time >= filters.from) &&
+  (!filters.to || time < filters.to);
+
+// Live rows win over fetched copies of the same id (e.g. an exit updating an entry); newest first
+export function mergeNewest<T extends { id: string }>(live: T[], history: T[], timeOf: (item: T) => string) {
+  const byId = new Map<string, T>();
+  for (const item of history) byId.set(item.id, item);
+  for (const item of live) byId.set(item.id, item);
+  return [...byId.values()].sort((a, b) => (timeOf(a) === timeOf(b) ? (a.id < b.id ? 1 : -1) : timeOf(a) < timeOf(b) ? 1 : -1));
+}
@@ -0,0 +1,59 @@
+import platform
+import cv2
+
+def open_capture(device, width=None, height=None, fourcc='MJPG', buffer_size=1):
+    """Opens a camera, preferring V4L2 on Linux, and applies configure_capture."""
+    if platform.system() == 'Linux' and isinstance(device, int): cap = cv2.VideoCapture(device, cv2.CAP_V4L2)
+    else: cap = cv2.VideoCapture(device)
+    if not cap.isOpened(): return cap, {}
+    return cap, configure_capture(cap, width, height, fourcc, buffer_size)
+
+def configure_capture(cap, width=None, height=None, fourcc='MJPG', buffer_size=1):
+    """Best-effort camera setup; returns the values the driver actually accepted.
+
+    MJPEG lets UVC cameras deliver 720p+ at full frame rate over USB 2, and a
+    one-frame buffer keeps us processing the newest frame instead of a stale
+    queue. Drivers that do not support a property simply ignore it.
+    """
+    if fourcc: cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc)) # Must precede the size on V4L2
+    if width and height:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width); cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if buffer_size: cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+    code = int(cap.get(cv2.CAP_PROP_FOURCC))
+    return {'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fourcc': ''.join(chr((code >> 8 * i) & 0xFF) for i in range(4)) if code else None,
+            'buffer_size': int(cap.get(cv2.CAP_PROP_BUFFERSIZE)), 'fps': cap.get(cv2.CAP_PROP_FPS)}
+
+def downscale(frame, detect_width):
+    """Returns (image for detection, scale from detection to full-resolution coordinates)."""
+    height, width = frame.shape[:2]
+    if not detect_width or width <= detect_width: return frame, 1.0
+    detect_height = max(1, round(height * detect_width / width))
+    return cv2.resize(frame, (detect_width, detect_height), interpolation=cv2.INTER_AREA), width / detect_width
+
+def detect_plates(model, frame, detect_width=None, pad=0.04, **predict_kwargs):
+    """Detects on a downscaled frame and maps boxes back onto the full-resolution frame.
+
+    Returns (results, boxes) where results are the raw detector results on the
+    small frame (for plotting) and boxes is a list of (x1, y1, x2, y2, conf)
+    in full-resolution pixels, padded slightly when downscaled so the plate
+    border survives the rounding of the upscale. Crops cut from these boxes
+    keep full OCR detail.
+
+    YOLO letterboxes every input to imgsz (640 unless told otherwise), so
+    downscaling alone barely changes inference time; the saving comes from
+    passing imgsz = detect_width, which only pays off below 640.
+    """
+    small, scale = downscale(frame, detect_width)
+    if scale == 1.0: pad = 0
+    if detect_width: predict_kwargs.setdefault('imgsz', max(32, detect_width // 32 * 32)) # Inference runs at detect_width instead of YOLO's default 640
+    results = model(small, verbose=False, **predict_kwargs)
+    height, width = frame.shape[:2]; boxes = []
+    for result in results:
+        for box in result.boxes:
+            x1, y1, x2, y2 = (float(v) * scale for v in box.xyxy[0])
+            pad_x = (x2 - x1) * pad; pad_y = (y2 - y1) * pad
+            x1 = max(0, int(x1 - pad_x)); y1 = max(0, int(y1 - pad_y))
+            x2 = min(width, int(round(x2 + pad_x))); y2 = min(height, int(round(y2 + pad_y)))
+            if x2 > x1 and y2 > y1: boxes.append((x1, y1, x2, y2, float(box.conf[0]) if box.conf is not None else 1.0))
+    return results, boxes
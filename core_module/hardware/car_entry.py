@@ -1,4 +1,5 @@
 import platform
+import argparse
 import cv2
 from ultralytics import YOLO
 import pytesseract
@@ -6,11 +7,18 @@ import os
 import time
 import serial
 import serial.tools.list_ports
-from collections import Counter
 import requests
 import sqlite3
 from datetime import datetime
 import db_utils # Utility for database operations
+import log_utils
+import plate_utils
+import match_utils
+import trace_utils
+import capture_utils
+from multicam_utils import CameraWorker, LaneConsensus, mosaic, parse_camera
+from presence_utils import PresenceDebouncer
+from preview_utils import PreviewServer
 
 # Tesseract OCR Path
 pytesseract.pytesseract.tesseract_cmd = r"C:\Users\fadhi\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
@@ -24,14 +32,31 @@ CAPTURE_THRESHOLD = 3
 GATE_OPEN_TIME = 15
 BACKEND_API_URL = "http://localhost:3001/api"
 SAVE_DIR = 'plates' # For saving plate images
+LOG_FILE = 'logs/car_entry.log'
+
+log = log_utils.setup_logging(LOG_FILE, 'CarEntry', lane='entry')
+tracer = trace_utils.Tracer('gate')
+
+parser = argparse.ArgumentParser(description='Car entry gate')
+parser.add_argument('--headless', action='store_true', help='No GUI windows; frames are only annotated for the preview server')
+parser.add_argument('--preview-port', type=int, default=0, help='Serve an MJPEG preview on this local port (0 = off)')
+parser.add_argument('--preview-fps', type=float, default=5)
+parser.add_argument('--camera', type=str, nargs='+', default=['0'], help='Camera index, file or URL; several sources watch one lane together')
+parser.add_argument('--detect-width', type=int, default=480, help='Run detection on frames downscaled to this width, at this inference size (0 = full resolution)')
+parser.add_argument('--conf', type=float, default=0.25, help='Detector confidence threshold (pick with eval_sweep.py)')
+parser.add_argument('--camera-fourcc', type=str, default='MJPG', help="Capture pixel format, '' to keep the driver default")
+parser.add_argument('--camera-buffer', type=int, default=1, help='Driver frame buffer size (0 = driver default)')
+args = parser.parse_args()
+preview = PreviewServer(args.preview_port, args.preview_fps).start() if args.preview_port else None
 
 os.makedirs(SAVE_DIR, exist_ok=True)
 db_utils.init_db() # Initialize database using utility
+plate_index = match_utils.PlateIndex(logger=log)
 
 try:
     model = YOLO(YOLO_MODEL_PATH)
 except Exception as e:
-    print(f"[ERROR] Could not load YOLO model: {e}"); exit(1)
+    log.error(f"[ERROR] Could not load YOLO model: {e}"); exit(1)
 
 def detect_arduino_port():
     ports = serial.tools.list_ports.comports()
@@ -49,105 +74,182 @@ def read_distance(arduino_serial):
     try: return float(arduino_serial.readline().decode('utf-8').strip())
     except: return None
 
-def has_unpaid_record_local(plate):
-    conn = db_utils.get_db_connection()
-    cursor = conn.cursor()
-    record = None
+def send_alert_to_backend(plate, msg, alert_type, trace=None):
     try:
-        cursor.execute("SELECT 1 FROM parking_log WHERE car_plate = ? AND payment_status = 0 LIMIT 1", (plate,))
-        record = cursor.fetchone()
-    except sqlite3.Error as e: print(f"[DB_ERROR] Checking unpaid: {e}")
-    finally:
-        if conn: conn.close()
-    return record is not None
+        resp = requests.post(f"{BACKEND_API_URL}/events/alert", json={"plate_number": plate, "message": msg, "type": alert_type},
+                             headers=trace_utils.trace_headers(trace), timeout=5)
+        log.info(f"[BACKEND_ALERT] Sent '{alert_type}' for {plate}. Status: {resp.status_code}", extra={'plate': plate, 'stage': 'backend_post'})
+    except requests.exceptions.RequestException as e: log.error(f"[BACKEND_ALERT_ERROR] {e}", extra={'plate': plate, 'stage': 'backend_post'})
+
+def check_watchlist(plate, trace=None):
+    for distance, listed in plate_index.match_watchlist(plate):
+        log.warning(f"[WATCHLIST] {plate} matches {listed} (distance {distance}).", extra={'plate': plate, 'stage': 'watchlist', 'trace_id': trace_utils.trace_id(trace)})
+        send_alert_to_backend(plate, f"Entry plate {plate} matches watchlisted {listed} (distance {distance}).", "WATCHLIST_MATCH", trace)
+
+def has_unpaid_record_local(plate):
+    try: return db_utils.has_unpaid_record(plate)
+    except sqlite3.Error as e: log.error(f"[DB_ERROR] Checking unpaid: {e}"); return False
 
 arduino_port = detect_arduino_port()
 arduino = None
 if arduino_port:
     try:
         arduino = serial.Serial(arduino_port, 9600, timeout=1); time.sleep(2)
-        print(f"[CONNECTED] Arduino on {arduino_port}")
-    except serial.SerialException as e: print(f"[ERROR] Arduino connect: {e}")
-else: print("[WARNING] Arduino not detected.")
-
-cap = cv2.VideoCapture(0)
-if not cap.isOpened(): print("[ERROR] Cannot open camera."); exit(1)
-cv2.namedWindow('Webcam Feed', cv2.WINDOW_NORMAL); cv2.namedWindow('Plate', cv2.WINDOW_NORMAL)
-cv2.namedWindow('Processed', cv2.WINDOW_NORMAL); cv2.resizeWindow('Webcam Feed', 800, 600)
-
-plate_buffer = []
-last_saved_plate = None
-last_entry_time = 0
-print("[SYSTEM] Car Entry System Ready. Press 'q' to exit.")
+        log.info(f"[CONNECTED] Arduino on {arduino_port}")
+    except serial.SerialException as e: log.error(f"[ERROR] Arduino connect: {e}")
+else: log.warning("[WARNING] Arduino not detected.")
+
+def preprocess_plate(plate_img):
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (5,5), 0)
+    return cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+def read_plates(crops, trace=None):
+    """CameraWorker's read_plates: OCR + grammar per crop, [(plate, char confidences)] for the valid reads."""
+    reads = []
+    for crop in crops:
+        start_ts = time.time(); start = time.perf_counter()
+        text, confidence = plate_utils.read_plate_text(preprocess_plate(crop))
+        if trace: trace.add('ocr', start_ts, (time.perf_counter() - start) * 1000)
+        plate, char_confidences = plate_utils.normalize_plate(text, confidence)
+        if plate: reads.append((plate, char_confidences))
+    return reads
+
+def handle_decision(decision, trace):
+    """Acts on a consensus decision (plate, accepted, posterior); always ends the trace with the outcome."""
+    global last_saved_plate, last_entry_time
+    common_plate, accepted, posterior = decision; trace.plate = common_plate; trace_id = trace.trace_id
+    if not accepted:
+        log.warning(f"[SKIPPED] Weak consensus for {common_plate} ({posterior:.2f}).", extra={'plate': common_plate, 'stage': 'consensus', 'trace_id': trace_id})
+        trace.end('weak_consensus', posterior=round(posterior, 3)); return
+    current_time_ts = time.time(); current_datetime_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with trace.span('watchlist'): check_watchlist(common_plate, trace)
+    with trace.span('db_check') as span: span['unpaid'] = has_unpaid_record_local(common_plate)
+    if span['unpaid']:
+        log.info(f"[SKIPPED] DB: Unpaid record for {common_plate}.", extra={'plate': common_plate, 'stage': 'decision', 'trace_id': trace_id})
+        trace.end('unpaid_record'); return
+    if common_plate == last_saved_plate and (current_time_ts - last_entry_time) <= ENTRY_COOLDOWN:
+        log.info(f"[SKIPPED] Cooldown/Same plate {common_plate}.", extra={'plate': common_plate, 'stage': 'decision', 'trace_id': trace_id})
+        trace.end('cooldown'); return
+    try:
+        db_start = time.perf_counter()
+        with trace.span('db_insert') as span: span['row_id'] = db_utils.insert_entry(common_plate, current_datetime_str, trace_id)
+        log.info(f"[DB_LOG] Logged entry for {common_plate}", extra={'plate': common_plate, 'stage': 'db_insert', 'trace_id': trace_id, 'duration_ms': round((time.perf_counter() - db_start) * 1000, 2)})
+    except sqlite3.Error as e_sql: log.error(f"[ERROR] DB write: {e_sql}", extra={'plate': common_plate, 'stage': 'db_insert', 'trace_id': trace_id})
 
-try:
+    try:
+        payload = {"car_plate": common_plate}; post_start = time.perf_counter()
+        with trace.span('backend_post') as span:
+            response = requests.post(f"{BACKEND_API_URL}/events/entry", json=payload, headers=trace.headers(), timeout=5); span['status'] = response.status_code
+        log.info(f"[BACKEND] Entry {common_plate} Status: {response.status_code}", extra={'plate': common_plate, 'stage': 'backend_post', 'trace_id': trace_id, 'duration_ms': round((time.perf_counter() - post_start) * 1000, 2)})
+    except requests.exceptions.RequestException as e_req: log.error(f"[BACKEND_ERROR] Entry: {e_req}", extra={'plate': common_plate, 'stage': 'backend_post', 'trace_id': trace_id})
+
+    with trace.span('gate'): # Includes the GATE_OPEN_TIME hold: the loop is blocked until the gate closes
+        if arduino and arduino.is_open:
+            try: arduino.write(b'1'); time.sleep(GATE_OPEN_TIME); arduino.write(b'0'); log.info("[GATE] Operated.")
+            except serial.SerialException as e_s: log.error(f"[ERROR] Arduino gate: {e_s}")
+        else: log.info("[GATE_SIM] Simulated.")
+    last_saved_plate = common_plate
+    last_entry_time = current_time_ts
+    trace.end('entered', posterior=round(posterior, 3))
+
+def run_camera():
+    """One camera: detection and OCR run inline on this thread, frame by frame."""
+    global trace
     while True:
+        capture_ts = time.time(); capture_start = time.perf_counter()
         ret, frame = cap.read()
-        if not ret: print("[ERROR] Frame capture failed."); time.sleep(0.1); continue
+        capture_ms = (time.perf_counter() - capture_start) * 1000
+        if not ret: log.error("[ERROR] Frame capture failed.", extra={'stage': 'capture'}); time.sleep(0.1); continue
 
-        current_time_ts = time.time()
-        current_datetime_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         distance = read_distance(arduino)
-        effective_distance = distance if distance is not None else (MAX_DISTANCE + 1)
-        annotated_frame = frame.copy()
-
-        if MIN_DISTANCE <= effective_distance <= MAX_DISTANCE:
-            results = model(frame, verbose=False)[0]
-            if results.boxes:
-                annotated_frame = results.plot()
-                for box in results.boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    plate_img = frame[y1:y2, x1:x2]
+        if presence.update(distance) == 'left' and trace: trace.end('left'); trace = None
+        render = not args.headless or (preview is not None and preview.wants_frame())
+        annotated_frame = frame
+
+        if presence.present:
+            if trace is None: trace = tracer.start('entry', capture_ts); trace.add('capture', capture_ts, capture_ms)
+            with trace.span('detect') as span: results, boxes = capture_utils.detect_plates(model, frame, args.detect_width, conf=args.conf); span['boxes'] = len(boxes)
+            if boxes:
+                if render: annotated_frame = results[0].plot()
+                for x1, y1, x2, y2, _ in sorted(boxes, key=lambda b: b[4], reverse=True):
+                    plate_img = frame[y1:y2, x1:x2] # Cut from the full-resolution frame
                     if plate_img.size == 0: continue
 
-                    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-                    blur = cv2.GaussianBlur(gray, (5,5), 0)
-                    thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-                    custom_config = r'--oem 3 --psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                    text = pytesseract.image_to_string(thresh, config=custom_config).strip().replace(' ', '')
-
-                    if len(text) == 7 and text.startswith('RA') and \
-                       text[2].isalpha() and text[3:6].isdigit() and text[6].isalpha():
-                        plate_buffer.append(text)
-
-                    if len(plate_buffer) >= CAPTURE_THRESHOLD:
-                        common_plate = Counter(plate_buffer).most_common(1)[0][0]
-                        if not has_unpaid_record_local(common_plate):
-                            if common_plate != last_saved_plate or (current_time_ts - last_entry_time) > ENTRY_COOLDOWN:
-                                conn_log = db_utils.get_db_connection()
-                                cursor_log = conn_log.cursor()
-                                try:
-                                    cursor_log.execute("INSERT INTO parking_log (entry_time, car_plate, payment_status) VALUES (?, ?, 0)",
-                                        (current_datetime_str, common_plate))
-                                    conn_log.commit()
-                                    print(f"[DB_LOG] Logged entry for {common_plate}")
-                                except sqlite3.Error as e_sql: print(f"[ERROR] DB write: {e_sql}")
-                                finally:
-                                    if conn_log: conn_log.close()
-
-                                try:
-                                    payload = {"car_plate": common_plate}
-                                    response = requests.post(f"{BACKEND_API_URL}/events/entry", json=payload, timeout=5)
-                                    print(f"[BACKEND] Entry {common_plate} Status: {response.status_code}")
-                                except requests.exceptions.RequestException as e_req: print(f"[BACKEND_ERROR] Entry: {e_req}")
-
-                                if arduino and arduino.is_open:
-                                    try: arduino.write(b'1'); time.sleep(GATE_OPEN_TIME); arduino.write(b'0'); print("[GATE] Operated.")
-                                    except serial.SerialException as e_s: print(f"[ERROR] Arduino gate: {e_s}")
-                                else: print("[GATE_SIM] Simulated.")
-                                last_saved_plate = common_plate
-                                last_entry_time = current_time_ts
-                            else: print(f"[SKIPPED] Cooldown/Same plate {common_plate}.")
-                        else: print(f"[SKIPPED] DB: Unpaid record for {common_plate}.")
-                        plate_buffer.clear()
-                    cv2.imshow('Plate', plate_img); cv2.imshow('Processed', thresh)
+                    with trace.span('ocr'):
+                        thresh = preprocess_plate(plate_img)
+                        text, confidence = plate_utils.read_plate_text(thresh)
+                    plate, char_confidences = plate_utils.normalize_plate(text, confidence)
+                    decision = consensus.add(plate, char_confidences) if plate else None
+                    if decision: handle_decision(decision, trace)
+                    if not args.headless: cv2.imshow('Plate', plate_img); cv2.imshow('Processed', thresh)
                     break
+            if trace.ended: trace = None
+        if preview and render and preview.wants_frame(): preview.publish(annotated_frame)
+        if args.headless: continue
         cv2.imshow('Webcam Feed', annotated_frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'): print("[SYSTEM] 'q' pressed, exiting."); break
+        if cv2.waitKey(1) & 0xFF == ord('q'): log.info("[SYSTEM] 'q' pressed, exiting."); return
+
+def run_lane():
+    """Several cameras on one lane: CameraWorkers detect and read on their own threads and vote into
+    one LaneConsensus; this thread feeds presence, acts on decisions and shows the mosaic."""
+    global trace
+    for worker in workers: worker.start()
+    while True:
+        if presence.update(read_distance(arduino)) == 'left' and trace: trace.end('left'); trace = None
+        if presence.present and trace is None and not lane.held: trace = tracer.start('entry')
+        lane.set_trace(trace); lane.vehicle_present(presence.present)
+        if lane.held and time.monotonic() - lane.decided_at > GATE_OPEN_TIME: lane.resume() # Same car still in range
+        decided = lane.next_decision(timeout=0.02)
+        if decided:
+            decision, camera = decided
+            log.info(f"[CONSENSUS] {decision[0]} ({decision[2]:.2f}) completed by camera {camera}", extra={'plate': decision[0], 'stage': 'consensus'})
+            handle_decision(decision, trace or tracer.start('entry')); trace = None
+        render = not args.headless or (preview is not None and preview.wants_frame())
+        for worker in workers: worker.render = render
+        frame = mosaic([worker.latest for worker in workers]) if render else None
+        if frame is None: continue
+        if preview and preview.wants_frame(): preview.publish(frame)
+        if args.headless: continue
+        cv2.imshow('Webcam Feed', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'): log.info("[SYSTEM] 'q' pressed, exiting."); return
+
+consensus = plate_utils.PlateConsensus(max_reads=CAPTURE_THRESHOLD)
+cameras = [parse_camera(camera) for camera in args.camera]
+capture = {'width': 1280, 'height': 720, 'fourcc': args.camera_fourcc, 'buffer_size': args.camera_buffer}
+cap = None; lane = None; workers = []
+if len(cameras) == 1:
+    cap, capture_settings = capture_utils.open_capture(cameras[0], **capture)
+    if not cap.isOpened(): log.error("[ERROR] Cannot open camera."); exit(1)
+    log.info(f"[CAMERA] {args.camera[0]} initialized {capture_settings}")
+else:
+    lane = LaneConsensus(consensus)
+    workers = [CameraWorker(str(index), device, lane, lambda index=index: model if index == 0 else YOLO(YOLO_MODEL_PATH), read_plates, log,
+                            args.detect_width, args.conf, capture_settings=capture, on_span=lambda trace, *a, **kw: trace and trace.add(*a, **kw))
+               for index, device in enumerate(cameras)] # Ultralytics models are not thread-safe; one per camera
+    log.info(f"[CAMERA] Lane cameras: {', '.join(f'{w.camera}={w.device}' for w in workers)}")
+if not args.headless:
+    cv2.namedWindow('Webcam Feed', cv2.WINDOW_NORMAL); cv2.namedWindow('Plate', cv2.WINDOW_NORMAL)
+    cv2.namedWindow('Processed', cv2.WINDOW_NORMAL); cv2.resizeWindow('Webcam Feed', 800, 600)
+
+last_saved_plate = None
+last_entry_time = 0
+trace = None # Current vehicle pass, from the first in-range frame to the gate decision
+presence = PresenceDebouncer(MAX_DISTANCE, MIN_DISTANCE) # Frames without a new serial reading don't end the pass
+log.info("[SYSTEM] Car Entry System Ready. Press 'q' to exit.")
+
+try:
+    if workers: run_lane()
+    else: run_camera()
 finally:
-    print("[SYSTEM] Cleaning up...")
+    log.info("[SYSTEM] Cleaning up...")
+    if trace: trace.end('shutdown')
+    for worker in workers: worker.stop()
+    for worker in workers: worker.join(timeout=2)
     if cap: cap.release()
+    if preview: preview.stop()
     if arduino and arduino.is_open:
-        try: arduino.write(b'0'); arduino.close(); print("[SYSTEM] Arduino closed.")
-        except serial.SerialException as e_s: print(f"[ERROR] Arduino close: {e_s}")
-    cv2.destroyAllWindows(); print("[SYSTEM] Exited.")
\ No newline at end of file
+        try: arduino.write(b'0'); arduino.close(); log.info("[SYSTEM] Arduino closed.")
+        except serial.SerialException as e_s: log.error(f"[ERROR] Arduino close: {e_s}")
+    if not args.headless: cv2.destroyAllWindows()
+    log.info("[SYSTEM] Exited.")
@@ -1,4 +1,5 @@
 import platform
+import argparse
 import cv2
 from ultralytics import YOLO
 import pytesseract
@@ -6,11 +7,18 @@ import os
 import time
 import serial
 import serial.tools.list_ports
-from collections import Counter
 from datetime import datetime, timedelta
 import requests
 import sqlite3
 import db_utils # Utility for database operations
+import log_utils
+import plate_utils
+import match_utils
+import trace_utils
+import capture_utils
+from multicam_utils import CameraWorker, LaneConsensus, mosaic, parse_camera
+from presence_utils import PresenceDebouncer
+from preview_utils import PreviewServer
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Users\fadhi\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
 
@@ -23,13 +31,31 @@ EXIT_GRACE_PERIOD_MINUTES = 1
 BACKEND_API_URL = "http://localhost:3001/api"
 PLATE_PROCESS_COOLDOWN = 10
 ALERT_MESSAGE_DURATION = 3
+LOG_FILE = 'logs/car_exit.log'
+FUZZY_MAX_DISTANCE = 1 # Misread characters tolerated when flagging a paid session for review or matching the watchlist
+
+log = log_utils.setup_logging(LOG_FILE, 'CarExit', lane='exit')
+tracer = trace_utils.Tracer('gate')
+
+parser = argparse.ArgumentParser(description='Car exit gate')
+parser.add_argument('--headless', action='store_true', help='No GUI windows; frames are only annotated for the preview server')
+parser.add_argument('--preview-port', type=int, default=0, help='Serve an MJPEG preview on this local port (0 = off)')
+parser.add_argument('--preview-fps', type=float, default=5)
+parser.add_argument('--camera', type=str, nargs='+', default=['0'], help='Camera index, file or URL; several sources watch one lane together')
+parser.add_argument('--detect-width', type=int, default=480, help='Run detection on frames downscaled to this width, at this inference size (0 = full resolution)')
+parser.add_argument('--conf', type=float, default=0.25, help='Detector confidence threshold (pick with eval_sweep.py)')
+parser.add_argument('--camera-fourcc', type=str, default='MJPG', help="Capture pixel format, '' to keep the driver default")
+parser.add_argument('--camera-buffer', type=int, default=1, help='Driver frame buffer size (0 = driver default)')
+args = parser.parse_args()
+preview = PreviewServer(args.preview_port, args.preview_fps).start() if args.preview_port else None
 
 db_utils.init_db() # Initialize database using utility
+plate_index = match_utils.PlateIndex(FUZZY_MAX_DISTANCE, EXIT_GRACE_PERIOD_MINUTES, logger=log)
 
 try:
     model = YOLO(YOLO_MODEL_PATH)
 except Exception as e:
-    print(f"[ERROR] Could not load YOLO model: {e}"); exit(1)
+    log.error(f"[ERROR] Could not load YOLO model: {e}"); exit(1)
 
 def detect_arduino_port(): # (Identical to car_entry.py)
     ports = serial.tools.list_ports.comports()
@@ -52,106 +78,210 @@ arduino = None
 if arduino_port:
     try:
         arduino = serial.Serial(arduino_port, 9600, timeout=1); time.sleep(2)
-        print(f"[CONNECTED] Arduino on {arduino_port}")
-    except serial.SerialException as e: print(f"[ERROR] Arduino connect: {e}")
-else: print("[WARNING] Arduino not detected.")
-
-def handle_exit_local_db(plate_number):
-    conn = db_utils.get_db_connection()
-    cursor = conn.cursor()
-    record_data = None
+        log.info(f"[CONNECTED] Arduino on {arduino_port}")
+    except serial.SerialException as e: log.error(f"[ERROR] Arduino connect: {e}")
+else: log.warning("[WARNING] Arduino not detected.")
+
+def send_alert_to_backend(plate, msg, alert_type, trace=None):
     try:
-        cursor.execute("SELECT exit_time FROM parking_log WHERE car_plate = ? AND payment_status = 1 AND exit_time IS NOT NULL ORDER BY exit_time DESC LIMIT 1", (plate_number,))
-        record_data = cursor.fetchone()
-    except sqlite3.Error as e: print(f"[DB_ERROR] Checking paid exit: {e}")
-    finally:
-        if conn: conn.close()
+        resp = requests.post(f"{BACKEND_API_URL}/events/alert", json={"plate_number": plate, "message": msg, "type": alert_type},
+                             headers=trace_utils.trace_headers(trace), timeout=5)
+        log.info(f"[BACKEND_ALERT] Sent '{alert_type}' for {plate}. Status: {resp.status_code}", extra={'plate': plate, 'stage': 'backend_post'})
+    except requests.exceptions.RequestException as e: log.error(f"[BACKEND_ALERT_ERROR] {e}", extra={'plate': plate, 'stage': 'backend_post'})
 
-    if record_data and record_data["exit_time"]: # Access by column name
+def check_watchlist(plate_number, trace=None):
+    """Alerts on watchlisted plates within FUZZY_MAX_DISTANCE; True for an exact hit (gate stays closed)."""
+    hits = plate_index.match_watchlist(plate_number)
+    for distance, listed in hits:
+        log.warning(f"[WATCHLIST] {plate_number} matches {listed} (distance {distance}).", extra={'plate': plate_number, 'stage': 'watchlist', 'trace_id': trace_utils.trace_id(trace)})
+        send_alert_to_backend(plate_number, f"Exit plate {plate_number} matches watchlisted {listed} (distance {distance}).", "WATCHLIST_MATCH", trace)
+    return plate_number in plate_index.watchlist
+
+def has_recent_paid_exit(plate_number):
+    exit_time = None
+    try: exit_time = db_utils.get_recent_paid_exit(plate_number)
+    except sqlite3.Error as e: log.error(f"[DB_ERROR] Checking paid exit: {e}")
+    if exit_time:
         try:
-            payment_time_dt = datetime.strptime(record_data["exit_time"], '%Y-%m-%d %H:%M:%S')
-            if timedelta(minutes=0) <= (datetime.now() - payment_time_dt) <= timedelta(minutes=EXIT_GRACE_PERIOD_MINUTES):
-                print(f"[DB_CHECK][ACCESS GRANTED] Plate {plate_number}: Valid paid record."); return True
-        except ValueError: print(f"[DB_CHECK][ERROR] Invalid date for {plate_number}")
-    print(f"[DB_CHECK][ACCESS DENIED] Plate {plate_number}: No recent paid record."); return False
-
-cap = cv2.VideoCapture(0)
-if not cap.isOpened(): print("[ERROR] Cannot open camera."); exit(1)
-cv2.namedWindow('Exit Webcam Feed', cv2.WINDOW_NORMAL); cv2.namedWindow('Plate Exit', cv2.WINDOW_NORMAL)
-cv2.namedWindow('Processed Exit', cv2.WINDOW_NORMAL); cv2.resizeWindow('Exit Webcam Feed', 800, 600)
-
-plate_buffer = []; last_processed_plate_time = 0; last_processed_plate_value = None
-is_alert_message_active = False; alert_message_start_time = 0; current_alert_message_text = ""
-print("[SYSTEM] Car Exit System Ready. Press 'q' to quit.")
+            payment_time_dt = datetime.strptime(exit_time, '%Y-%m-%d %H:%M:%S')
+            return timedelta(minutes=0) <= (datetime.now() - payment_time_dt) <= timedelta(minutes=EXIT_GRACE_PERIOD_MINUTES)
+        except ValueError: log.error(f"[DB_CHECK][ERROR] Invalid date for {plate_number}", extra={'plate': plate_number, 'stage': 'db_check'})
+    return False
 
-try:
+def handle_exit_local_db(plate_number, trace=None):
+    """Exact paid lookup; returns (granted, paid plate needing review). A read one character away from a paid plate
+    may be another car, so it never exits on that payment: the operator gets an EXIT_REVIEW_FUZZY_PAID alert instead."""
+    if has_recent_paid_exit(plate_number):
+        log.info(f"[DB_CHECK][ACCESS GRANTED] Plate {plate_number}: Valid paid record.", extra={'plate': plate_number, 'stage': 'db_check'}); return True, None
+    match = plate_index.match_paid(plate_number) # Exact payments were checked in the DB above; the index only feeds review
+    if match and has_recent_paid_exit(match[1]):
+        log.warning(f"[DB_CHECK][REVIEW] Plate {plate_number}: Close to paid {match[1]} (distance {match[0]}), not granted.", extra={'plate': plate_number, 'stage': 'db_check'})
+        send_alert_to_backend(plate_number, f"Exit plate {plate_number} is {match[0]} character(s) from paid {match[1]}; check and open manually.", "EXIT_REVIEW_FUZZY_PAID", trace)
+        return False, match[1]
+    log.warning(f"[DB_CHECK][ACCESS DENIED] Plate {plate_number}: No recent paid record.", extra={'plate': plate_number, 'stage': 'db_check'}); return False, None
+
+def preprocess_plate(plate_img):
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY); blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    return cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+def read_plates(crops, trace=None):
+    """CameraWorker's read_plates: OCR + grammar per crop, [(plate, char confidences)] for the valid reads."""
+    reads = []
+    for crop in crops:
+        start_ts = time.time(); start = time.perf_counter()
+        text, confidence = plate_utils.read_plate_text(preprocess_plate(crop))
+        if trace: trace.add('ocr', start_ts, (time.perf_counter() - start) * 1000)
+        plate, char_confidences = plate_utils.normalize_plate(text, confidence)
+        if plate: reads.append((plate, char_confidences))
+    return reads
+
+def handle_decision(decision, trace):
+    """Acts on a consensus decision (plate, accepted, posterior); always ends the trace with the outcome."""
+    global last_processed_plate_value, last_processed_plate_time, is_alert_message_active, alert_message_start_time, current_alert_message_text
+    most_common_plate, accepted, posterior = decision; trace.plate = most_common_plate; trace_id = trace.trace_id
+    if not accepted:
+        log.warning(f"[SKIPPED] Weak consensus for {most_common_plate} ({posterior:.2f}).", extra={'plate': most_common_plate, 'stage': 'consensus', 'trace_id': trace_id})
+        trace.end('weak_consensus', posterior=round(posterior, 3)); return
+    current_time = time.time()
+    if most_common_plate == last_processed_plate_value and (current_time - last_processed_plate_time) < PLATE_PROCESS_COOLDOWN: trace.end('cooldown'); return
+    log.info(f"[CONFIRMED_EXIT_PLATE] Plate: {most_common_plate}", extra={'plate': most_common_plate, 'trace_id': trace_id})
+    with trace.span('watchlist') as span: blocked = span['blocked'] = check_watchlist(most_common_plate, trace)
+    allow_physical_exit = False; review_plate = None # An exact watchlist hit keeps the gate closed without a DB check
+    if not blocked:
+        with trace.span('db_check') as span: allow_physical_exit, review_plate = handle_exit_local_db(most_common_plate, trace); span['paid'] = allow_physical_exit
+    if allow_physical_exit:
+        log.info(f"[GATE_ACTION] GRANTED for {most_common_plate}.", extra={'plate': most_common_plate, 'trace_id': trace_id})
+        with trace.span('gate'): # Includes the GATE_OPEN_TIME hold: the loop is blocked until the gate closes
+            if arduino and arduino.is_open:
+                try: arduino.write(b'1'); time.sleep(GATE_OPEN_TIME); arduino.write(b'0'); log.info("[GATE_HW] Operated.")
+                except serial.SerialException as e: log.error(f"[ERROR] Arduino gate: {e}")
+            else: log.info("[GATE_SIM] Simulated."); time.sleep(GATE_OPEN_TIME)
+        trace.end('exited')
+    else:
+        log.info(f"[GATE_ACTION] DENIED for {most_common_plate}.", extra={'plate': most_common_plate, 'trace_id': trace_id})
+        if review_plate: current_alert_message_text = f"REVIEW: {most_common_plate} ~ paid {review_plate}" # Alert already sent; not an unpaid attempt
+        else:
+            unpaid_payload = {"car_plate": most_common_plate, "payment_status": "UNPAID_ATTEMPT"}
+            try:
+                post_start = time.perf_counter()
+                with trace.span('backend_post') as span:
+                    resp = requests.post(f"{BACKEND_API_URL}/events/exit", json=unpaid_payload, headers=trace.headers(), timeout=5); span['status'] = resp.status_code
+                log.info(f"[BACKEND_EVENT] UNPAID {most_common_plate}. Status: {resp.status_code}", extra={'plate': most_common_plate, 'stage': 'backend_post', 'trace_id': trace_id, 'duration_ms': round((time.perf_counter() - post_start) * 1000, 2)})
+            except requests.exceptions.RequestException as e_req: log.error(f"[BACKEND_ERROR] UNPAID: {e_req}", extra={'plate': most_common_plate, 'stage': 'backend_post', 'trace_id': trace_id})
+            current_alert_message_text = f"ALERT: Unpaid Exit - {most_common_plate}"
+        is_alert_message_active = True; alert_message_start_time = current_time
+        if arduino and arduino.is_open:
+            try: arduino.write(b'2'); log.warning(f"[ALERT_HW] Buzzer/LED on.")
+            except serial.SerialException as e: log.error(f"[ERROR] Arduino alert: {e}")
+        else: log.warning("[ALERT_HW_SIM] Simulated.")
+        log.warning(f"[ALERT_VISUAL] On-screen: {current_alert_message_text}")
+        trace.end('review' if review_plate else 'denied')
+    last_processed_plate_value = most_common_plate; last_processed_plate_time = current_time
+
+def show_frame(frame, render):
+    """Alert overlay, preview and window for one displayed frame; False when 'q' was pressed."""
+    global is_alert_message_active, current_alert_message_text
+    if is_alert_message_active:
+        if (time.time() - alert_message_start_time) < ALERT_MESSAGE_DURATION:
+            if render and frame is not None:
+                cv2.putText(frame, current_alert_message_text, (10, frame.shape[0]-30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,0,255),3,cv2.LINE_AA)
+        else: is_alert_message_active = False; current_alert_message_text = ""
+    if frame is None: return True
+    if preview and render and preview.wants_frame(): preview.publish(frame)
+    if args.headless: return True
+    cv2.imshow("Exit Webcam Feed", frame)
+    if cv2.waitKey(1) & 0xFF == ord('q'): log.info("[SYSTEM] 'q' pressed, exiting."); return False
+    return True
+
+def run_camera():
+    """One camera: detection and OCR run inline on this thread, frame by frame."""
+    global trace
     while True:
+        capture_ts = time.time(); capture_start = time.perf_counter()
         ret, frame = cap.read()
-        if not ret: print("[ERROR] Frame capture failed."); time.sleep(0.1); continue
+        capture_ms = (time.perf_counter() - capture_start) * 1000
+        if not ret: log.error("[ERROR] Frame capture failed.", extra={'stage': 'capture'}); time.sleep(0.1); continue
 
-        current_time = time.time()
         distance = read_distance(arduino)
-        effective_distance = distance if distance is not None else (MAX_DISTANCE + 1)
-        annotated_frame = frame.copy(); yolo_results_plot = None
-
-        if MIN_DISTANCE <= effective_distance <= MAX_DISTANCE:
-            results = model(frame, verbose=False)
-            if results and results[0].boxes:
-                yolo_results_plot = results[0].plot()
-                for box in results[0].boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    plate_img = frame[y1:y2, x1:x2]
+        if presence.update(distance) == 'left' and trace: trace.end('left'); trace = None
+        render = not args.headless or (preview is not None and preview.wants_frame())
+        annotated_frame = frame.copy() if render else frame; yolo_results_plot = None
+
+        if presence.present:
+            if trace is None: trace = tracer.start('exit', capture_ts); trace.add('capture', capture_ts, capture_ms)
+            with trace.span('detect') as span: results, boxes = capture_utils.detect_plates(model, frame, args.detect_width, conf=args.conf); span['boxes'] = len(boxes)
+            if boxes:
+                if render: yolo_results_plot = results[0].plot()
+                for x1, y1, x2, y2, _ in sorted(boxes, key=lambda b: b[4], reverse=True):
+                    plate_img = frame[y1:y2, x1:x2] # Cut from the full-resolution frame
                     if plate_img.size == 0: continue
 
-                    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY); blur = cv2.GaussianBlur(gray, (5, 5), 0)
-                    thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-                    custom_config = r'--oem 3 --psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                    text = pytesseract.image_to_string(thresh, config=custom_config).strip().replace(" ", "")
-
-                    if len(text) == 7 and text.startswith('RA') and text[2].isalpha() and text[3:6].isdigit() and text[6].isalpha():
-                        plate_buffer.append(text)
-
-                    if len(plate_buffer) >= CAPTURE_THRESHOLD:
-                        most_common_plate = Counter(plate_buffer).most_common(1)[0][0]
-                        plate_buffer.clear()
-                        if not (most_common_plate == last_processed_plate_value and (current_time - last_processed_plate_time) < PLATE_PROCESS_COOLDOWN):
-                            print(f"\n[CONFIRMED_EXIT_PLATE] Plate: {most_common_plate}")
-                            allow_physical_exit = handle_exit_local_db(most_common_plate)
-                            if allow_physical_exit:
-                                print(f"[GATE_ACTION] GRANTED for {most_common_plate}.")
-                                if arduino and arduino.is_open:
-                                    try: arduino.write(b'1'); time.sleep(GATE_OPEN_TIME); arduino.write(b'0'); print("[GATE_HW] Operated.")
-                                    except serial.SerialException as e: print(f"[ERROR] Arduino gate: {e}")
-                                else: print("[GATE_SIM] Simulated."); time.sleep(GATE_OPEN_TIME)
-                            else:
-                                print(f"[GATE_ACTION] DENIED for {most_common_plate}.")
-                                unpaid_payload = {"car_plate": most_common_plate, "payment_status": "UNPAID_ATTEMPT"}
-                                try:
-                                    resp = requests.post(f"{BACKEND_API_URL}/events/exit", json=unpaid_payload, timeout=5)
-                                    print(f"[BACKEND_EVENT] UNPAID {most_common_plate}. Status: {resp.status_code}")
-                                except requests.exceptions.RequestException as e_req: print(f"[BACKEND_ERROR] UNPAID: {e_req}")
-                                is_alert_message_active = True; alert_message_start_time = current_time
-                                current_alert_message_text = f"ALERT: Unpaid Exit - {most_common_plate}"
-                                if arduino and arduino.is_open:
-                                    try: arduino.write(b'2'); print(f"[ALERT_HW] Buzzer/LED on.")
-                                    except serial.SerialException as e: print(f"[ERROR] Arduino alert: {e}")
-                                else: print("[ALERT_HW_SIM] Simulated.")
-                                print(f"[ALERT_VISUAL] On-screen: {current_alert_message_text}")
-                            last_processed_plate_value = most_common_plate; last_processed_plate_time = current_time
-                    cv2.imshow("Plate Exit", plate_img); cv2.imshow("Processed Exit", thresh)
+                    with trace.span('ocr'):
+                        thresh = preprocess_plate(plate_img)
+                        text, confidence = plate_utils.read_plate_text(thresh)
+                    plate, char_confidences = plate_utils.normalize_plate(text, confidence)
+                    decision = consensus.add(plate, char_confidences) if plate else None
+                    if decision: handle_decision(decision, trace)
+                    if not args.headless: cv2.imshow("Plate Exit", plate_img); cv2.imshow("Processed Exit", thresh)
                     break
-        frame_to_display_on = yolo_results_plot if yolo_results_plot is not None else annotated_frame
-        if is_alert_message_active:
-            if (current_time - alert_message_start_time) < ALERT_MESSAGE_DURATION:
-                if frame_to_display_on is not None:
-                    cv2.putText(frame_to_display_on, current_alert_message_text, (10, frame_to_display_on.shape[0]-30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,0,255),3,cv2.LINE_AA)
-            else: is_alert_message_active = False; current_alert_message_text = ""
-        cv2.imshow("Exit Webcam Feed", frame_to_display_on)
-        if cv2.waitKey(1) & 0xFF == ord('q'): print("[SYSTEM] 'q' pressed, exiting."); break
+            if trace.ended: trace = None
+        if not show_frame(yolo_results_plot if yolo_results_plot is not None else annotated_frame, render): return
+
+def run_lane():
+    """Several cameras on one lane: CameraWorkers detect and read on their own threads and vote into
+    one LaneConsensus; this thread feeds presence, acts on decisions and shows the mosaic."""
+    global trace
+    for worker in workers: worker.start()
+    while True:
+        if presence.update(read_distance(arduino)) == 'left' and trace: trace.end('left'); trace = None
+        if presence.present and trace is None and not lane.held: trace = tracer.start('exit')
+        lane.set_trace(trace); lane.vehicle_present(presence.present)
+        if lane.held and time.monotonic() - lane.decided_at > GATE_OPEN_TIME: lane.resume() # Same car still in range
+        decided = lane.next_decision(timeout=0.02)
+        if decided:
+            decision, camera = decided
+            log.info(f"[CONSENSUS] {decision[0]} ({decision[2]:.2f}) completed by camera {camera}", extra={'plate': decision[0], 'stage': 'consensus'})
+            handle_decision(decision, trace or tracer.start('exit')); trace = None
+        render = not args.headless or (preview is not None and preview.wants_frame())
+        for worker in workers: worker.render = render
+        if not show_frame(mosaic([worker.latest for worker in workers]) if render else None, render): return
+
+consensus = plate_utils.PlateConsensus(max_reads=CAPTURE_THRESHOLD)
+cameras = [parse_camera(camera) for camera in args.camera]
+capture = {'width': 1280, 'height': 720, 'fourcc': args.camera_fourcc, 'buffer_size': args.camera_buffer}
+cap = None; lane = None; workers = []
+if len(cameras) == 1:
+    cap, capture_settings = capture_utils.open_capture(cameras[0], **capture)
+    if not cap.isOpened(): log.error("[ERROR] Cannot open camera."); exit(1)
+    log.info(f"[CAMERA] {args.camera[0]} initialized {capture_settings}")
+else:
+    lane = LaneConsensus(consensus)
+    workers = [CameraWorker(str(index), device, lane, lambda index=index: model if index == 0 else YOLO(YOLO_MODEL_PATH), read_plates, log,
+                            args.detect_width, args.conf, capture_settings=capture, on_span=lambda trace, *a, **kw: trace and trace.add(*a, **kw))
+               for index, device in enumerate(cameras)] # Ultralytics models are not thread-safe; one per camera
+    log.info(f"[CAMERA] Lane cameras: {', '.join(f'{w.camera}={w.device}' for w in workers)}")
+if not args.headless:
+    cv2.namedWindow('Exit Webcam Feed', cv2.WINDOW_NORMAL); cv2.namedWindow('Plate Exit', cv2.WINDOW_NORMAL)
+    cv2.namedWindow('Processed Exit', cv2.WINDOW_NORMAL); cv2.resizeWindow('Exit Webcam Feed', 800, 600)
+
+last_processed_plate_time = 0; last_processed_plate_value = None
+is_alert_message_active = False; alert_message_start_time = 0; current_alert_message_text = ""
+trace = None # Current vehicle pass, from the first in-range frame to the gate decision
+presence = PresenceDebouncer(MAX_DISTANCE, MIN_DISTANCE) # Frames without a new serial reading don't end the pass
+log.info("[SYSTEM] Car Exit System Ready. Press 'q' to quit.")
+
+try:
+    if workers: run_lane()
+    else: run_camera()
 finally:
-    print("[SYSTEM] Cleaning up...")
+    log.info("[SYSTEM] Cleaning up...")
+    if trace: trace.end('shutdown')
+    for worker in workers: worker.stop()
+    for worker in workers: worker.join(timeout=2)
     if cap: cap.release()
+    if preview: preview.stop()
     if arduino and arduino.is_open:
-        try: arduino.write(b'0'); arduino.close(); print("[SYSTEM] Arduino closed.")
-        except serial.SerialException as e: print(f"[ERROR] Arduino close: {e}")
-    cv2.destroyAllWindows(); print("[SYSTEM] Exited.")
\ No newline at end of file
+        try: arduino.write(b'0'); arduino.close(); log.info("[SYSTEM] Arduino closed.")
+        except serial.SerialException as e: log.error(f"[ERROR] Arduino close: {e}")
+    if not args.headless: cv2.destroyAllWindows()
+    log.info("[SYSTEM] Exited.")
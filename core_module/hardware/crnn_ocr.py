@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+try:
+    import onnxruntime as ort
+except ImportError: # Only needed for --ocr crnn
+    ort = None
+
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+PLATE_LENGTH = 7
+INPUT_HEIGHT = 32
+INPUT_WIDTH = 112 # 28 feature columns after /4 pooling = 4 per plate position
+
+def prepare_input(img):
+    """Preprocessed plate image (gray or BGR, any size) -> 1xHxW float32 in [0, 1]."""
+    if img.ndim == 3: img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    img = cv2.resize(img, (INPUT_WIDTH, INPUT_HEIGHT), interpolation=cv2.INTER_AREA)
+    return (img.astype(np.float32) / 255.0)[None, :, :]
+
+def decode(probs):
+    """(7, len(ALPHABET)) probabilities -> (text, per-character probability list)."""
+    indices = probs.argmax(axis=1)
+    return ''.join(ALPHABET[i] for i in indices), [float(probs[pos, i]) for pos, i in enumerate(indices)]
+
+class CrnnRecognizer:
+    """ONNX Runtime wrapper for the plate CRNN trained by train_crnn.py.
+
+    The model reads a fixed 7-character plate, so each output position is a
+    softmax over ALPHABET and the per-character probabilities go straight into
+    plate_utils.PlateConsensus.
+    """
+
+    def __init__(self, model_path, threads=2):
+        if ort is None: raise ImportError("onnxruntime is required for the CRNN OCR backend (pip install onnxruntime)")
+        options = ort.SessionOptions(); options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def recognize_batch(self, imgs):
+        """Returns [(text, per-character probabilities)] for a list of preprocessed plate images."""
+        if not imgs: return []
+        batch = np.stack([prepare_input(img) for img in imgs])
+        probs = self.session.run(None, {self.input_name: batch})[0]
+        return [decode(p) for p in probs]
+
+    def extract_plate_text(self, processed_img):
+        """Same contract as PlateRecognitionSystem.extract_plate_text."""
+        if processed_img is None: return None, 0.0
+        return self.recognize_batch([processed_img])[0]
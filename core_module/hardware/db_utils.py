@@ -1,14 +1,220 @@
 import sqlite3
 import os
+import json
+import socket
+import threading
+import uuid
+from datetime import datetime
 
 DATABASE_NAME = 'parking_system.db'
+CONNECTION_FACTORY = sqlite3.Connection # load_generator.py swaps in a timing subclass
+LANE_STATE_ADDR = os.environ.get('LANE_STATE_ADDR') # host:port of lane_state_server.py; unset = open DATABASE_NAME directly
+WRITE_OPS = {'open_session', 'settle_payment', 'fold_rollups', 'clear_rollups'} # Lane-state ops that go through the server's writer
+RETRYABLE_WRITES = {'fold_rollups', 'clear_rollups'} # Replaying these changes nothing: watermarks / matching totals
+
+class LaneStateError(sqlite3.OperationalError):
+    """Lane-state RPC failure or server-side DB error; a sqlite3.Error so the scripts' existing handlers cover it."""
+
+class LaneStateClient:
+    """JSON-lines RPC to lane_state_server.py, one persistent connection per calling thread."""
+
+    def __init__(self, addr, timeout=5):
+        host, port = addr.rsplit(':', 1)
+        self.addr = addr; self.endpoint = (host, int(port)); self.timeout = timeout; self.local = threading.local()
+
+    def close(self):
+        stream = getattr(self.local, 'stream', None); self.local.stream = None
+        if stream:
+            try: stream.close(); self.local.sock.close()
+            except OSError: pass
+
+    def call(self, op, retry=True, **args):
+        """retry reconnects once (the server may have restarted since this thread's last call); off for non-idempotent writes."""
+        line = (json.dumps({'op': op, 'args': args}) + '\n').encode()
+        for attempt in (0, 1):
+            try:
+                if getattr(self.local, 'stream', None) is None:
+                    self.local.sock = socket.create_connection(self.endpoint, self.timeout); self.local.stream = self.local.sock.makefile('rwb')
+                self.local.stream.write(line); self.local.stream.flush()
+                reply = self.local.stream.readline()
+                if not reply: raise ConnectionError('connection closed by server')
+                break
+            except OSError as e:
+                self.close()
+                if attempt or not retry: raise LaneStateError(f"Lane state server {self.addr}: {e}") from e
+        reply = json.loads(reply)
+        if 'error' in reply: raise LaneStateError(reply['error'])
+        return reply['result']
+
+_client = None
+
+def rpc(op, **args):
+    global _client
+    if _client is None or _client.addr != LANE_STATE_ADDR: _client = LaneStateClient(LANE_STATE_ADDR)
+    return _client.call(op, retry=op not in WRITE_OPS or op in RETRYABLE_WRITES or args.get('request_id') is not None, **args) # A sent write is only replayed when the server can recognise it
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, factory=CONNECTION_FACTORY)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Gate access paths shared by the entry, exit and payment scripts; sqlite3.Error (LaneStateError included) propagates to the caller.
+# With LANE_STATE_ADDR set each one is a call to lane_state_server.py instead of a query on the local file.
+def has_unpaid_record(plate):
+    if LANE_STATE_ADDR: return rpc('has_unpaid', plate=plate)
+    conn = get_db_connection()
+    try: return conn.execute("SELECT 1 FROM parking_log WHERE car_plate = ? AND payment_status = 0 LIMIT 1", (plate,)).fetchone() is not None
+    finally: conn.close()
+
+def insert_entry(plate, entry_time=None, trace_id=None):
+    """Opens an unpaid session for plate; returns the new row id. trace_id ties the row to its trace_utils vehicle pass."""
+    entry_time = entry_time or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if LANE_STATE_ADDR: return rpc('open_session', plate=plate, entry_time=entry_time, trace_id=trace_id)
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("INSERT INTO parking_log (entry_time, car_plate, payment_status, trace_id) VALUES (?, ?, 0, ?)",
+                              (entry_time, plate, trace_id))
+        conn.commit(); return cursor.lastrowid
+    finally: conn.close()
+
+def get_recent_paid_exit(plate):
+    """exit_time of the latest paid session for plate, or None."""
+    if LANE_STATE_ADDR: return rpc('recent_paid_exit', plate=plate)
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT exit_time FROM parking_log WHERE car_plate = ? AND payment_status = 1 AND exit_time IS NOT NULL ORDER BY exit_time DESC LIMIT 1", (plate,)).fetchone()
+        return row["exit_time"] if row else None
+    finally: conn.close()
+
+def get_open_session(plate):
+    """Latest unpaid session for plate as {'id', 'entry_time'}, or None."""
+    if LANE_STATE_ADDR: return rpc('get_open_session', plate=plate)
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT id, entry_time FROM parking_log WHERE car_plate = ? AND payment_status = 0 ORDER BY entry_time DESC LIMIT 1", (plate,)).fetchone()
+        return dict(row) if row else None
+    finally: conn.close()
+
+# Set inside the settling write transaction: sqlite serializes writers, so sequence order is commit order and a
+# watermark on it (rollup_export.py, match_utils.PlateIndex) cannot skip a payment whose exit_time was taken earlier.
+SETTLE_SQL = ("UPDATE parking_log SET exit_time = ?, due_payment = COALESCE(?, due_payment), payment_status = 1, settle_request_id = ?, "
+              "settle_seq = (SELECT COALESCE(MAX(settle_seq), 0) + 1 FROM parking_log) WHERE id = ? AND payment_status = 0")
+
+def apply_settle(conn, session_id, exit_time, due_payment=None, request_id=None):
+    """SETTLE_SQL on conn (the caller commits). Idempotent per request_id: replaying a settle that already
+    committed returns True again instead of looking like a second terminal's payment."""
+    if conn.execute(SETTLE_SQL, (exit_time, due_payment, request_id, session_id)).rowcount == 1: return True
+    return request_id is not None and conn.execute("SELECT 1 FROM parking_log WHERE id = ? AND settle_request_id = ?", (session_id, request_id)).fetchone() is not None
+
+def settle_payment(session_id, exit_time, due_payment=None, request_id=None):
+    """Marks an open session paid; False when it was already settled by another request. due_payment None keeps
+    the stored amount. request_id (generated when omitted) makes the lane-state RPC safe to retry."""
+    request_id = request_id or uuid.uuid4().hex
+    if LANE_STATE_ADDR: return rpc('settle_payment', session_id=session_id, exit_time=exit_time, due_payment=due_payment, request_id=request_id)
+    conn = get_db_connection()
+    try:
+        settled = apply_settle(conn, session_id, exit_time, due_payment, request_id)
+        conn.commit(); return settled
+    finally: conn.close()
+
+def session_changes(last_id, last_seq, since=''):
+    """Rows match_utils.PlateIndex folds in: (id, plate, payment_status) after last_id (open sessions + the newest row when
+    last_id is 0), (id, plate, exit_time) for payments settled after last_seq (on the first call, last_seq None, those
+    with exit_time >= since) and the current max settle_seq as the next watermark."""
+    if LANE_STATE_ADDR:
+        changes = rpc('session_changes', last_id=last_id, last_seq=last_seq, since=since)
+        return [tuple(r) for r in changes['sessions']], [tuple(r) for r in changes['paid']], changes['max_seq']
+    conn = get_db_connection()
+    try: return query_session_changes(conn, last_id, last_seq, since)
+    finally: conn.close()
+
+def query_session_changes(conn, last_id, last_seq, since=''):
+    if last_id: sessions = conn.execute("SELECT id, car_plate, payment_status FROM parking_log WHERE id > ?", (last_id,)).fetchall()
+    else: sessions = conn.execute("SELECT id, car_plate, payment_status FROM parking_log WHERE payment_status = 0 OR id = (SELECT MAX(id) FROM parking_log)").fetchall()
+    max_seq = conn.execute("SELECT COALESCE(MAX(settle_seq), 0) FROM parking_log").fetchone()[0]
+    if last_seq is not None: paid = conn.execute("SELECT id, car_plate, exit_time FROM parking_log WHERE settle_seq > ? AND settle_seq <= ?", (last_seq, max_seq)).fetchall()
+    else: paid = conn.execute("SELECT id, car_plate, exit_time FROM parking_log WHERE payment_status = 1 AND exit_time >= ?", (since,)).fetchall()
+    return [tuple(r) for r in sessions], [tuple(r) for r in paid], max_seq
+
+ROLLUP_BUCKET_FORMATS = {'HOUR': '%Y-%m-%d %H:00:00', 'DAY': '%Y-%m-%d 00:00:00'}
+ROLLUP_COLUMNS = ('granularity', 'bucket_start', 'entries', 'exits', 'dwell_seconds', 'dwell_count', 'revenue')
+
+# Rollup export (rollup_export.py). With LANE_STATE_ADDR set the fold and the dirty-flag updates run in the
+# server's writer like any other write, so the exporter never opens the lane-state file from another host.
+def fold_rollups():
+    """Folds parking_log rows added/paid since the last fold into parking_rollup; returns (entry rows, exit rows)."""
+    if LANE_STATE_ADDR: return tuple(rpc('fold_rollups'))
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try: folded = apply_rollup_fold(conn); conn.commit(); return folded
+        except sqlite3.Error: conn.rollback(); raise
+    finally: conn.close()
+
+def dirty_rollups(limit):
+    """Up to limit buckets not yet pushed to the backend, oldest first, as dicts keyed by ROLLUP_COLUMNS."""
+    if LANE_STATE_ADDR: return rpc('dirty_rollups', limit=limit)
+    conn = get_db_connection()
+    try: return query_dirty_rollups(conn, limit)
+    finally: conn.close()
+
+def clear_rollups(buckets):
+    """Marks pushed buckets clean unless their totals moved since dirty_rollups() read them."""
+    if LANE_STATE_ADDR: return rpc('clear_rollups', buckets=buckets)
+    conn = get_db_connection()
+    try: apply_rollup_clear(conn, buckets); conn.commit()
+    finally: conn.close()
+
+def _rollup_state(conn, name):
+    row = conn.execute("SELECT value FROM rollup_state WHERE name = ?", (name,)).fetchone()
+    return int(row[0]) if row else 0
+
+def apply_rollup_fold(conn):
+    """fold_rollups() inside the caller's write transaction.
+
+    Entries are tracked by row id, paid exits by settle_seq (rows are updated in
+    place when paid). exit_time cannot be the watermark: process_payment takes
+    it before the card write and commits it seconds later, behind exits that
+    were already folded. Both ranges are read inside the write transaction, so
+    nothing at or below the new watermarks can still commit afterwards.
+    """
+    last_id = _rollup_state(conn, 'last_entry_id'); last_seq = _rollup_state(conn, 'last_settle_seq')
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM parking_log").fetchone()[0]
+    max_seq = conn.execute("SELECT COALESCE(MAX(settle_seq), 0) FROM parking_log").fetchone()[0]
+    for granularity, fmt in ROLLUP_BUCKET_FORMATS.items():
+        conn.execute(f"""
+            INSERT INTO parking_rollup (granularity, bucket_start, entries, dirty)
+            SELECT ?, strftime('{fmt}', entry_time) AS bucket, COUNT(*), 1 FROM parking_log
+            WHERE id > ? AND id <= ? AND bucket IS NOT NULL GROUP BY bucket
+            ON CONFLICT(granularity, bucket_start) DO UPDATE SET entries = entries + excluded.entries, dirty = 1
+        """, (granularity, last_id, max_id))
+        conn.execute(f"""
+            INSERT INTO parking_rollup (granularity, bucket_start, exits, dwell_seconds, dwell_count, revenue, dirty)
+            SELECT ?, strftime('{fmt}', exit_time) AS bucket, COUNT(*),
+                   COALESCE(SUM(CAST((julianday(exit_time) - julianday(entry_time)) * 86400 AS INTEGER)), 0),
+                   COUNT(julianday(entry_time)), COALESCE(SUM(due_payment), 0), 1
+            FROM parking_log
+            WHERE settle_seq > ? AND settle_seq <= ? AND bucket IS NOT NULL GROUP BY bucket
+            ON CONFLICT(granularity, bucket_start) DO UPDATE SET exits = exits + excluded.exits,
+                dwell_seconds = dwell_seconds + excluded.dwell_seconds, dwell_count = dwell_count + excluded.dwell_count,
+                revenue = revenue + excluded.revenue, dirty = 1
+        """, (granularity, last_seq, max_seq))
+    exit_rows = conn.execute("SELECT COUNT(*) FROM parking_log WHERE settle_seq > ? AND settle_seq <= ?", (last_seq, max_seq)).fetchone()[0]
+    conn.executemany("INSERT INTO rollup_state (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                     [('last_entry_id', str(max_id)), ('last_settle_seq', str(max_seq))])
+    return max_id - last_id, exit_rows
+
+def query_dirty_rollups(conn, limit):
+    rows = conn.execute(f"SELECT {', '.join(ROLLUP_COLUMNS)} FROM parking_rollup WHERE dirty = 1 ORDER BY bucket_start LIMIT ?", (limit,)).fetchall()
+    return [dict(zip(ROLLUP_COLUMNS, row)) for row in rows]
+
+def apply_rollup_clear(conn, buckets):
+    # A bucket changed by a concurrent fold keeps dirty = 1 only if its totals moved
+    conn.executemany("UPDATE parking_rollup SET dirty = 0 WHERE granularity = ? AND bucket_start = ? AND entries = ? AND exits = ? AND revenue = ?",
+                     [(b['granularity'], b['bucket_start'], b['entries'], b['exits'], b['revenue']) for b in buckets])
+
 def init_db(db_name=None):
+    if LANE_STATE_ADDR and not db_name: print(f"[DB_UTILS] Using lane state server at {LANE_STATE_ADDR}; schema is managed there."); return
     current_db_name = db_name if db_name else DATABASE_NAME
     db_dir = os.path.dirname(current_db_name)
     if db_dir and not os.path.exists(db_dir):
@@ -26,10 +232,40 @@ def init_db(db_name=None):
                 car_plate TEXT NOT NULL,
                 due_payment INTEGER,
                 payment_status INTEGER NOT NULL DEFAULT 0,
+                trace_id TEXT,
+                settle_seq INTEGER,
+                settle_request_id TEXT
             )
         ''')
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(parking_log)')]
+        if 'trace_id' not in columns: # Databases created before tracing
+            cursor.execute('ALTER TABLE parking_log ADD COLUMN trace_id TEXT')
+        if 'settle_seq' not in columns: # Paid rows the exit_time watermark had not reached yet get a sequence; older ones are already folded in
+            cursor.execute('ALTER TABLE parking_log ADD COLUMN settle_seq INTEGER')
+            cursor.execute('CREATE TABLE IF NOT EXISTS rollup_state (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            watermark = cursor.execute("SELECT value FROM rollup_state WHERE name = 'last_exit_time'").fetchone()
+            cursor.execute('UPDATE parking_log SET settle_seq = id WHERE payment_status = 1 AND COALESCE(exit_time, ?) >= ?', ('', watermark[0] if watermark else ''))
+        if 'settle_request_id' not in columns: # Databases created before idempotent settles
+            cursor.execute('ALTER TABLE parking_log ADD COLUMN settle_request_id TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_settle_seq ON parking_log (settle_seq)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_car_plate_status ON parking_log (car_plate, payment_status)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_entry_time ON parking_log (entry_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_exit_time ON parking_log (exit_time)')
+        # Pre-aggregated hourly/daily buckets maintained by rollup_export.py; dirty = not yet pushed to the backend
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS parking_rollup (
+                granularity TEXT NOT NULL,
+                bucket_start TEXT NOT NULL,
+                entries INTEGER NOT NULL DEFAULT 0,
+                exits INTEGER NOT NULL DEFAULT 0,
+                dwell_seconds INTEGER NOT NULL DEFAULT 0,
+                dwell_count INTEGER NOT NULL DEFAULT 0,
+                revenue INTEGER NOT NULL DEFAULT 0,
+                dirty INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (granularity, bucket_start)
+            )
+        ''')
+        cursor.execute('CREATE TABLE IF NOT EXISTS rollup_state (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
         conn.commit()
         print(f"[DB_UTILS] Database '{current_db_name}' initialized/verified successfully.")
     except sqlite3.Error as e:
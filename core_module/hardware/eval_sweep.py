@@ -0,0 +1,247 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import cv2
+import numpy as np
+import plate_utils
+import capture_utils
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+IOU_THRESHOLD = 0.5
+
+def otsu_plate(plate_img):
+    """The car_entry.py / car_exit.py pipeline: blur + Otsu."""
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY); blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    return cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+PREPROCESSORS = {
+    'adaptive': plate_utils.preprocess_plate, # main.py
+    'otsu': otsu_plate,
+    'gray': lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY),
+}
+
+def load_dataset(dataset_dir, plates_csv=None):
+    """[(image path, YOLO boxes [(cx, cy, w, h)], plate texts)] for an arrange_dataset.py split.
+
+    Plate texts come from plates_csv (image stem, plate; one row per plate) or
+    from <PLATE>_... file names (main.py --save-images); images without either
+    only count towards detection.
+    """
+    img_dir = os.path.join(dataset_dir, 'images'); lbl_dir = os.path.join(dataset_dir, 'labels')
+    texts = {}
+    if plates_csv:
+        with open(plates_csv) as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and not row[0].startswith('#'): texts.setdefault(os.path.splitext(row[0].strip())[0], []).append(row[1].strip().upper())
+    items = []
+    for name in sorted(os.listdir(img_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS): continue
+        stem = os.path.splitext(name)[0]; boxes = []
+        lbl_path = os.path.join(lbl_dir, stem + '.txt')
+        if os.path.exists(lbl_path):
+            with open(lbl_path) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 5: boxes.append(tuple(float(v) for v in parts[1:]))
+        prefix = stem.split('_')[0].upper()
+        plate_texts = texts.get(stem) or ([prefix] if plate_utils.validate_plate(prefix) == prefix else [])
+        items.append((os.path.join(img_dir, name), boxes, plate_texts))
+    return items
+
+def build_cache(items, cache_path):
+    """Decodes every image once into a flat uint8 memmap (<cache>.u8) indexed by <cache>.json.
+
+    The cache is keyed on the image paths, sizes and mtimes, so it is reused
+    across sweeps until the split changes. Workers map it read-only and share
+    the page cache instead of each decoding the JPEGs again.
+    """
+    manifest = [(path, os.path.getsize(path), os.path.getmtime(path)) for path, _, _ in items]
+    key = hashlib.sha1(json.dumps(manifest).encode()).hexdigest()
+    data_path = cache_path + '.u8'; index_path = cache_path + '.json'
+    if os.path.exists(index_path) and os.path.exists(data_path):
+        with open(index_path) as f: index = json.load(f)
+        if index['key'] == key: print(f"[CACHE] Reusing {data_path} ({len(index['images'])} images)"); return data_path, index['images']
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    images = []; offset = 0
+    with open(data_path, 'wb') as data: # Streamed one image at a time, then mapped
+        for path, _, _ in items:
+            frame = cv2.imread(path)
+            if frame is None: images.append(None); continue
+            data.write(np.ascontiguousarray(frame).tobytes())
+            images.append({'offset': offset, 'shape': list(frame.shape)}); offset += frame.size
+    with open(index_path, 'w') as f: json.dump({'key': key, 'images': images}, f)
+    print(f"[CACHE] Decoded {len(images)} images into {data_path} ({offset / 1e6:.1f} MB)")
+    return data_path, images
+
+_worker = {}
+
+def init_worker(data_path, images, threads):
+    import torch
+    torch.set_num_threads(threads); cv2.setNumThreads(threads)
+    _worker.update(data=np.memmap(data_path, dtype=np.uint8, mode='r'), images=images, threads=threads, models={}, recognizers={})
+
+def cached_frame(i):
+    entry = _worker['images'][i]
+    if entry is None: return None
+    size = int(np.prod(entry['shape']))
+    return np.asarray(_worker['data'][entry['offset']:entry['offset'] + size]).reshape(entry['shape'])
+
+def load_model(path):
+    if path not in _worker['models']:
+        from ultralytics import YOLO
+        _worker['models'][path] = YOLO(path)
+    return _worker['models'][path]
+
+def ocr_reader(engine, crnn_model):
+    """Callable processed image -> (text, confidence) for 'tesseract' or 'crnn'."""
+    if engine == 'tesseract': return plate_utils.read_plate_text
+    if crnn_model not in _worker['recognizers']:
+        from crnn_ocr import CrnnRecognizer
+        _worker['recognizers'][crnn_model] = CrnnRecognizer(crnn_model, threads=_worker['threads'])
+    return _worker['recognizers'][crnn_model].extract_plate_text
+
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0])); iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy; union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def match_boxes(predicted, truth):
+    """Greedy IoU >= 0.5 matching, most confident prediction first; returns true positives."""
+    unmatched = list(truth); tp = 0
+    for box in sorted(predicted, key=lambda b: b[4], reverse=True):
+        best = max(unmatched, key=lambda t: iou(box, t), default=None)
+        if best is not None and iou(box, best) >= IOU_THRESHOLD: unmatched.remove(best); tp += 1
+    return tp
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+def run_config(task, items):
+    """Evaluates one (model, detect width, OCR pipeline) over every conf threshold in one pass.
+
+    Detection runs once at the lowest threshold and higher thresholds just
+    filter its boxes; each box's OCR time is kept so a threshold is charged
+    only for the plates it would actually read.
+    """
+    model = load_model(task['model']); confs = sorted(task['confs'])
+    engine, _, prep = task['ocr'].partition(':')
+    read = ocr_reader(engine, task['crnn_model']) if engine != 'none' else None
+    preprocess = PREPROCESSORS[prep or 'adaptive']
+    warm = next((cached_frame(i) for i in range(len(items)) if cached_frame(i) is not None), None)
+    if warm is not None: capture_utils.detect_plates(model, warm, task['detect_width'] or None, conf=confs[0])
+    per_image = []
+    for i, (_, truth_yolo, texts) in enumerate(items):
+        frame = cached_frame(i)
+        if frame is None: continue
+        height, width = frame.shape[:2]
+        truth = [((cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height) for cx, cy, w, h in truth_yolo]
+        start = time.perf_counter()
+        _, boxes = capture_utils.detect_plates(model, frame, task['detect_width'] or None, conf=confs[0])
+        detect_ms = (time.perf_counter() - start) * 1000
+        reads = []
+        for x1, y1, x2, y2, conf in boxes:
+            if read is None: reads.append((conf, None, 0.0)); continue
+            start = time.perf_counter()
+            processed = preprocess(frame[y1:y2, x1:x2])
+            text, confidence = read(processed) if processed is not None else (None, 0.0)
+            plate = plate_utils.normalize_plate(text, confidence)[0] if text else None
+            reads.append((conf, plate, (time.perf_counter() - start) * 1000))
+        per_image.append((truth, texts, boxes, reads, detect_ms))
+    rows = []
+    for conf in confs:
+        tp = fp = fn = read_ok = text_total = 0; latencies = []
+        for truth, texts, boxes, reads, detect_ms in per_image:
+            kept = [box for box in boxes if box[4] >= conf]
+            matched = match_boxes(kept, truth); tp += matched; fp += len(kept) - matched; fn += len(truth) - matched
+            plates = [plate for c, plate, _ in reads if c >= conf and plate]
+            for text in texts:
+                text_total += 1
+                if text in plates: plates.remove(text); read_ok += 1
+            latencies.append(detect_ms + sum(ms for c, _, ms in reads if c >= conf))
+        precision = tp / (tp + fp) if tp + fp else 0.0; recall = tp / (tp + fn) if tp + fn else 0.0
+        rows.append({'model': task['model'], 'detect_width': task['detect_width'], 'conf': conf, 'ocr': task['ocr'],
+                     'precision': precision, 'recall': recall, 'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+                     'read_acc': read_ok / text_total if read is not None and text_total else None, 'plates': tp + fn, 'texts': text_total,
+                     'mean_ms': statistics.mean(latencies) if latencies else 0.0, 'p95_ms': percentile(latencies, 0.95)})
+    return rows
+
+def pareto(rows, key):
+    """Marks rows no other row beats on both accuracy (higher) and mean latency (lower)."""
+    best = -1.0
+    for row in sorted(rows, key=lambda r: (r['mean_ms'], -r[key])):
+        row['pareto'] = row[key] > best
+        best = max(best, row[key])
+
+def print_table(rows, key):
+    print(f"\n{'':1} {'model':<28} {'width':>5} {'conf':>5} {'ocr':<18} {'prec':>5} {'recall':>6} {'f1':>5} {'read':>5} {'mean':>8} {'p95':>8}")
+    for row in sorted(rows, key=lambda r: r['mean_ms']):
+        name = os.path.basename(os.path.dirname(os.path.dirname(row['model']))) + '/' + os.path.basename(row['model']) if '/weights/' in row['model'] else os.path.basename(row['model'])
+        read = f"{row['read_acc']:.2f}" if row['read_acc'] is not None else '-'
+        print(f"{'*' if row['pareto'] else ' '} {name:<28.28} {row['detect_width'] or 'full':>5} {row['conf']:>5.2f} {row['ocr']:<18} "
+              f"{row['precision']:>5.2f} {row['recall']:>6.2f} {row['f1']:>5.2f} {read:>5} {row['mean_ms']:>6.1f}ms {row['p95_ms']:>6.1f}ms")
+    print(f"\n* Pareto-optimal: no other configuration is both more accurate ({key}) and faster (mean CPU ms per image)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep detector/OCR configurations over a labeled split and report accuracy vs CPU latency')
+    parser.add_argument('--dataset', type=str, default='dataset/val', help='arrange_dataset.py split (images/ + YOLO labels/)')
+    parser.add_argument('--plates', type=str, default=None, help='Optional CSV of image,plate rows for end-to-end read accuracy')
+    parser.add_argument('--models', type=str, nargs='+', default=['../model_dev/runs/detect/train/weights/best.pt'])
+    parser.add_argument('--widths', type=int, nargs='+', default=[320, 480, 640], help='Detection widths, as main.py --detect-width (0 = full resolution)')
+    parser.add_argument('--confs', type=float, nargs='+', default=[0.25, 0.4, 0.5, 0.6])
+    parser.add_argument('--ocr', type=str, nargs='+', default=['none', 'tesseract:adaptive', 'tesseract:otsu', 'crnn:adaptive'],
+                        help=f"OCR pipelines as engine:preprocess (engines: none, tesseract, crnn; preprocess: {', '.join(PREPROCESSORS)})")
+    parser.add_argument('--crnn-model', type=str, default='../model_dev/ocr/plate_crnn.onnx')
+    parser.add_argument('--cache', type=str, default='logs/eval_cache', help='Memory-mapped decoded image cache (prefix)')
+    parser.add_argument('--threads', type=int, default=1, help='CPU threads per configuration')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='Parallel configurations; keep workers x threads under the core count or latencies inflate')
+    parser.add_argument('--output', type=str, default='logs/eval_sweep.csv')
+    args = parser.parse_args()
+
+    for pipeline in args.ocr:
+        engine, _, prep = pipeline.partition(':')
+        if engine not in ('none', 'tesseract', 'crnn') or (prep and prep not in PREPROCESSORS): parser.error(f"unknown OCR pipeline '{pipeline}'")
+    if any(p.startswith('crnn') for p in args.ocr) and not os.path.exists(args.crnn_model):
+        print(f"⚠️  CRNN model {args.crnn_model} not found, skipping crnn pipelines"); args.ocr = [p for p in args.ocr if not p.startswith('crnn')]
+    models = [m for m in args.models if os.path.exists(m) or print(f"⚠️  Model {m} not found, skipping")]
+    if not models: print("[ERROR] No detector weights to evaluate"); return
+    items = load_dataset(args.dataset, args.plates)
+    if not items: print(f"[ERROR] No images in {args.dataset}/images"); return
+    texts = sum(len(t) for _, _, t in items)
+    key = 'read_acc' if texts else 'f1'
+    if not texts: print("⚠️  No plate text labels (--plates or <PLATE>_ file names): accuracy is detection F1, OCR pipelines are timed only")
+    else: args.ocr = [p for p in args.ocr if p != 'none']
+    data_path, images = build_cache(items, args.cache)
+
+    tasks = [{'model': m, 'detect_width': w, 'ocr': o, 'confs': args.confs, 'crnn_model': args.crnn_model}
+             for m, w, o in itertools.product(models, args.widths, args.ocr)]
+    print(f"[SWEEP] {len(items)} images, {len(tasks)} configurations x {len(args.confs)} thresholds on {args.workers} worker(s) x {args.threads} thread(s)")
+    rows = []; start = time.perf_counter()
+    context = multiprocessing.get_context('spawn') # Fresh interpreters: torch thread pools do not survive fork
+    with ProcessPoolExecutor(args.workers, mp_context=context, initializer=init_worker, initargs=(data_path, images, args.threads)) as pool:
+        futures = {pool.submit(run_config, task, items): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try: rows.extend(future.result())
+            except Exception as e: print(f"[ERROR] {task['model']} @ {task['detect_width']} / {task['ocr']}: {e}"); continue
+            print(f"[SWEEP] done {os.path.basename(task['model'])} @ {task['detect_width'] or 'full'} / {task['ocr']}")
+    if not rows: print("[ERROR] Every configuration failed"); return
+    for row in rows:
+        if row[key] is None: row[key] = 0.0
+    pareto(rows, key)
+    print_table(rows, key)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0])); writer.writeheader(); writer.writerows(sorted(rows, key=lambda r: r['mean_ms']))
+    print(f"✅ {len(rows)} rows in {time.perf_counter() - start:.0f}s written to {args.output}")
+
+if __name__ == "__main__":
+    main()
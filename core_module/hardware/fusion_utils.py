@@ -0,0 +1,52 @@
+from collections import deque
+import cv2
+import numpy as np
+
+def sharpness(gray):
+    """Variance of the Laplacian; low for motion-blurred or defocused crops."""
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+class PlateCropFuser:
+    """Fuses a sliding window of the last K crops of one plate into a single OCR input.
+
+    Every frame adds a crop and yields a fused read (of fewer crops until the
+    window fills), so fusion does not slow the consensus down: a decision
+    still takes as many frames as it needs reads. Crops much blurrier than the
+    sharpest one are dropped, the rest are registered to the sharpest with ECC
+    (affine), averaged to suppress noise and glare flicker, and unsharp-masked.
+    """
+
+    def __init__(self, frames=3, min_relative_sharpness=0.5, ecc_iterations=50, ecc_eps=1e-4):
+        self.crops = deque(maxlen=max(1, frames)); self.min_relative_sharpness = min_relative_sharpness
+        self.criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, ecc_iterations, ecc_eps)
+
+    def reset(self): self.crops.clear()
+
+    def add(self, crop):
+        """Adds a BGR crop (the oldest one leaves the window); returns True once K crops are buffered."""
+        if crop is None or crop.size == 0: return self.ready()
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        self.crops.append((sharpness(gray), crop, gray))
+        return self.ready()
+
+    def ready(self): return len(self.crops) == self.crops.maxlen
+
+    def fuse(self):
+        """Returns the fused BGR crop of the current window (or None); the window is kept."""
+        if not self.crops: return None
+        ranked = sorted(self.crops, key=lambda item: item[0], reverse=True)
+        best_sharpness, reference, reference_gray = ranked[0]
+        height, width = reference_gray.shape
+        stack = [reference.astype(np.float32)]
+        for crop_sharpness, crop, gray in ranked[1:]:
+            if crop_sharpness < best_sharpness * self.min_relative_sharpness: break
+            crop = cv2.resize(crop, (width, height), interpolation=cv2.INTER_LINEAR)
+            gray = cv2.resize(gray, (width, height), interpolation=cv2.INTER_LINEAR)
+            warp = np.eye(2, 3, dtype=np.float32)
+            try: _, warp = cv2.findTransformECC(reference_gray, gray, warp, cv2.MOTION_AFFINE, self.criteria, None, 5)
+            except cv2.error: continue # Did not converge: a misregistered frame would smear the characters
+            stack.append(cv2.warpAffine(crop, warp, (width, height), flags=cv2.INTER_LINEAR + cv2.WARP_INVERSE_MAP,
+                                        borderMode=cv2.BORDER_REPLICATE).astype(np.float32))
+        fused = np.mean(stack, axis=0)
+        blurred = cv2.GaussianBlur(fused, (0, 0), 2)
+        return np.clip(cv2.addWeighted(fused, 1.5, blurred, -0.5, 0), 0, 255).astype(np.uint8)
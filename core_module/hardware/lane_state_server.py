@@ -0,0 +1,170 @@
+import argparse
+import json
+import queue
+import socketserver
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import db_utils
+
+DEFAULT_PORT = 7070
+WRITE_OPS = db_utils.WRITE_OPS
+
+def connect(db_name):
+    conn = sqlite3.connect(db_name, check_same_thread=False, isolation_level=None) # Transactions are explicit (BEGIN IMMEDIATE ... COMMIT)
+    conn.execute('PRAGMA journal_mode=WAL') # Readers (dirty_rollups, session_changes) don't block the writer
+    return conn
+
+class LaneState:
+    """Parking sessions held in memory, backed by a sqlite file only this process writes.
+
+    Unpaid checks, open-session lookups and the latest paid exit are answered
+    from in-memory indexes without touching sqlite. Writes go through a single
+    writer thread that group-commits: whatever arrived while the previous
+    commit was running (up to max_batch, optionally waiting commit_delay for
+    stragglers) is applied in one transaction, and only after COMMIT are the
+    indexes updated and the callers answered, so an acknowledged write is
+    durable and visible to every later read. A failing batch is retried one
+    write per transaction so a bad request only fails its own caller. Callers
+    wait at most write_timeout (under LaneStateClient's 5 s socket timeout) and
+    get an OperationalError instead of blocking on a stuck writer.
+    """
+
+    def __init__(self, db_name, max_batch=64, commit_delay=0.0, write_timeout=4.0):
+        self.db_name = db_name; self.max_batch = max_batch; self.commit_delay = commit_delay; self.write_timeout = write_timeout
+        self.lock = threading.Lock(); self.writes = queue.SimpleQueue(); self.stats = Counter()
+        self.open = defaultdict(list) # plate -> unpaid sessions [{'id', 'entry_time'}]
+        self.open_plates = {} # unpaid session id -> plate
+        self.paid_exits = {} # plate -> latest exit_time of a paid session
+        self.reader = connect(db_name); self.reader_lock = threading.Lock()
+        self.load()
+        self.writer = threading.Thread(target=self.write_loop, name='LaneStateWriter', daemon=True)
+        self.writer.start()
+
+    def load(self):
+        for row_id, plate, entry_time in self.reader.execute("SELECT id, car_plate, entry_time FROM parking_log WHERE payment_status = 0 ORDER BY entry_time"):
+            self.open[plate].append({'id': row_id, 'entry_time': entry_time}); self.open_plates[row_id] = plate
+        self.paid_exits = dict(self.reader.execute("SELECT car_plate, MAX(exit_time) FROM parking_log WHERE payment_status = 1 AND exit_time IS NOT NULL GROUP BY car_plate"))
+        print(f"[LANE_STATE] Loaded {len(self.open_plates)} open sessions, {len(self.paid_exits)} paid plates from {self.db_name}")
+
+    def call(self, op, **args):
+        self.stats[op] += 1
+        if op in WRITE_OPS:
+            future = Future(); self.writes.put((op, args, future))
+            try: return future.result(timeout=self.write_timeout)
+            except FutureTimeoutError: self.stats['write_timeouts'] += 1; raise sqlite3.OperationalError(f"{op} not committed within {self.write_timeout}s")
+        if op == 'has_unpaid':
+            with self.lock: return bool(self.open.get(args['plate']))
+        if op == 'get_open_session':
+            with self.lock: sessions = self.open.get(args['plate']); return dict(max(sessions, key=lambda s: s['entry_time'])) if sessions else None
+        if op == 'recent_paid_exit':
+            with self.lock: return self.paid_exits.get(args['plate'])
+        if op == 'session_changes': # Incremental row feed for match_utils.PlateIndex
+            with self.reader_lock: sessions, paid, max_seq = db_utils.query_session_changes(self.reader, args['last_id'], args['last_seq'], args.get('since', ''))
+            return {'sessions': sessions, 'paid': paid, 'max_seq': max_seq}
+        if op == 'dirty_rollups': # rollup_export.py
+            with self.reader_lock: return db_utils.query_dirty_rollups(self.reader, args['limit'])
+        if op == 'stats':
+            return {**self.stats, 'open_sessions': len(self.open_plates)}
+        raise ValueError(f"Unknown op '{op}'")
+
+    def apply(self, conn, op, args):
+        """Runs one write inside the batch transaction; returns (result for the caller, index update)."""
+        if op == 'open_session':
+            row_id = conn.execute("INSERT INTO parking_log (entry_time, car_plate, payment_status, trace_id) VALUES (?, ?, 0, ?)",
+                                  (args['entry_time'], args['plate'], args.get('trace_id'))).lastrowid
+            return row_id, ('open', args['plate'], {'id': row_id, 'entry_time': args['entry_time']})
+        if op == 'fold_rollups': return db_utils.apply_rollup_fold(conn), None
+        if op == 'clear_rollups': db_utils.apply_rollup_clear(conn, args['buckets']); return None, None
+        settled = db_utils.apply_settle(conn, args['session_id'], args['exit_time'], args.get('due_payment'), args.get('request_id'))
+        return settled, ('paid', args['session_id'], args['exit_time']) if settled else None
+
+    def index(self, update):
+        if update[0] == 'open':
+            _, plate, session = update; self.open[plate].append(session); self.open_plates[session['id']] = plate; return
+        _, session_id, exit_time = update; plate = self.open_plates.pop(session_id, None)
+        if plate is None: return
+        self.open[plate] = [s for s in self.open[plate] if s['id'] != session_id]
+        if not self.open[plate]: del self.open[plate]
+        if exit_time > self.paid_exits.get(plate, ''): self.paid_exits[plate] = exit_time
+
+    def write_loop(self):
+        conn = connect(self.db_name)
+        while True:
+            batch = [self.writes.get()]; deadline = time.monotonic() + self.commit_delay
+            while len(batch) < self.max_batch:
+                try: batch.append(self.writes.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty: break
+            try: self.commit(conn, batch)
+            except Exception as e: # Never let the writer die: every later caller would wait on it forever
+                print(f"[LANE_STATE] Writer error: {type(e).__name__}: {e}"); self.stats['writer_errors'] += 1
+                for _, _, future in batch:
+                    if not future.done(): future.set_exception(e)
+
+    def commit(self, conn, batch):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            applied = [self.apply(conn, op, args) for op, args, _ in batch]
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction: conn.execute('ROLLBACK')
+            if len(batch) == 1: batch[0][2].set_exception(e); return
+            for item in batch: self.commit(conn, [item])
+            return
+        with self.lock:
+            for _, update in applied:
+                if update: self.index(update)
+        self.stats['commits'] += 1; self.stats['committed_writes'] += len(batch)
+        for (_, _, future), (result, _) in zip(batch, applied): future.set_result(result)
+
+class LaneStateHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line: {"op": ..., "args": {...}} -> {"result": ...} or {"error": "..."}."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                reply = {'result': self.server.state.call(request['op'], **request.get('args', {}))}
+            except Exception as e: reply = {'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(reply) + '\n').encode()); self.wfile.flush()
+
+class LaneStateServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True; allow_reuse_address = True
+
+    def __init__(self, address, state):
+        super().__init__(address, LaneStateHandler); self.state = state
+
+def start_server(db_name, host='127.0.0.1', port=DEFAULT_PORT, **state_options):
+    """Serves in a background thread; returns the server (server_address has the bound port when port=0)."""
+    db_utils.init_db(db_name)
+    server = LaneStateServer((host, port), LaneState(db_name, **state_options))
+    threading.Thread(target=server.serve_forever, name='LaneStateServer', daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Lane-state server: owns parking_system.db for the entry, exit and payment scripts (set LANE_STATE_ADDR=host:port on their hosts)')
+    parser.add_argument('--db', type=str, default=db_utils.DATABASE_NAME)
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Bind address; 0.0.0.0 to serve lanes on other hosts (the protocol is unauthenticated, keep it on the lane network)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch', type=int, default=64, help='Most writes folded into one commit')
+    parser.add_argument('--commit-delay', type=float, default=0, help='Seconds to wait for more writes before committing a batch')
+    parser.add_argument('--write-timeout', type=float, default=4.0, help='Seconds a caller waits for its write to commit')
+    parser.add_argument('--stats-interval', type=float, default=60, help='Print request/commit counters every N seconds (0 = off)')
+    args = parser.parse_args()
+
+    server = start_server(args.db, args.host, args.port, max_batch=args.max_batch, commit_delay=args.commit_delay, write_timeout=args.write_timeout)
+    print(f"[LANE_STATE] Serving {args.db} on {args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(args.stats_interval or 3600)
+            if args.stats_interval:
+                stats = server.state.stats
+                print(f"[LANE_STATE] {', '.join(f'{k}={v}' for k, v in sorted(stats.items()))}"
+                      f" | {stats['committed_writes'] / max(1, stats['commits']):.1f} writes/commit")
+    except KeyboardInterrupt: print("[LANE_STATE] Stopping.")
+    finally: server.shutdown(); server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import contextlib
+import json
+import os
+import pty
+import queue
+import random
+import sqlite3
+import string
+import threading
+import time
+import tty
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+import serial
+import db_utils
+import lane_state_server
+
+EXIT_GRACE_PERIOD_MINUTES = 1 # Same as car_exit.py
+DEFAULT_DB = 'load_test.db'
+# Alerts process_payment raises when a transaction fails (INSUFFICIENT_BALANCE_RFID is an expected decline)
+FAILURE_ALERTS = {'PLATE_NOT_FOUND_DB', 'PAYMENT_REVIEW_FUZZY_SESSION', 'DOUBLE_SETTLE', 'ARDUINO_TIMEOUT_CONFIRM', 'PAYMENT_DATE_ERROR', 'PAYMENT_DB_ERROR', 'PAYMENT_PROCESSING_ERROR'}
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock(); self.latency = defaultdict(list); self.db_writes = []
+        self.failures = Counter(); self.backend = Counter(); self.arrivals = 0; self.completed = 0
+
+    def record(self, stage, seconds):
+        with self.lock: self.latency[stage].append(seconds)
+
+    def fail(self, reason):
+        with self.lock: self.failures[reason] += 1
+
+STATS = Stats()
+
+class TimedCursor(sqlite3.Cursor):
+    """Times write statements; with several lanes on one file most of that is waiting for the write lock."""
+    def execute(self, sql, parameters=()):
+        if sql.lstrip()[:6].upper() not in ('INSERT', 'UPDATE', 'DELETE'): return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try: return super().execute(sql, parameters)
+        finally: STATS.db_writes.append(time.perf_counter() - start)
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor): return super().cursor(factory)
+    def execute(self, sql, parameters=()): return self.cursor().execute(sql, parameters) # Connection.execute bypasses cursor()
+    def commit(self):
+        start = time.perf_counter()
+        try: return super().commit()
+        finally: STATS.db_writes.append(time.perf_counter() - start)
+
+def timed_rpc(rpc):
+    """db_utils.rpc with writes timed like TimedConnection: round trip incl. waiting for the server's group commit."""
+    def call(op, **args):
+        if op not in lane_state_server.WRITE_OPS: return rpc(op, **args)
+        start = time.perf_counter()
+        try: return rpc(op, **args)
+        finally: STATS.db_writes.append(time.perf_counter() - start)
+    return call
+
+class FakeArduino(threading.Thread):
+    """Payment terminal firmware on the master side of a pty.
+
+    tap() sends the card line and READY like the real reader; a new balance
+    written by process_payment is acknowledged with DONE after write_delay
+    (the RFID block write), and the insufficient-balance 'I' is ignored.
+    """
+
+    def __init__(self, write_delay=0.05):
+        super().__init__(daemon=True)
+        self.master, self.slave = pty.openpty(); tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave); self.write_delay = write_delay
+
+    def tap(self, plate, balance): os.write(self.master, f"{plate},{balance}\r\nREADY\r\n".encode())
+
+    def run(self):
+        buffer = b''
+        while True:
+            try: chunk = os.read(self.master, 1024)
+            except OSError: return # Closed
+            if not chunk: return
+            buffer += chunk
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1); line = line.strip()
+                if line.isdigit():
+                    time.sleep(self.write_delay); os.write(self.master, b"DONE\r\n")
+
+    def close(self):
+        for fd in (self.master, self.slave):
+            with contextlib.suppress(OSError): os.close(fd)
+
+def start_stub_backend(port, delay):
+    """Local stand-in for the dashboard's /api/events/* endpoints; counts calls by endpoint and alert type."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args): pass
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not self.path.startswith('/api/events/'): self.send_error(404); return
+            kind = self.path.rsplit('/', 1)[-1]
+            with STATS.lock: STATS.backend[kind if kind != 'alert' else f"alert:{body.get('type')}"] += 1
+            if delay: time.sleep(delay)
+            payload = b'{"ok":true}'
+            self.send_response(201); self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(payload)))
+            self.end_headers(); self.wfile.write(payload)
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler); server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='StubBackend', daemon=True).start()
+    return server
+
+def random_plate(): return 'RA' + random.choice(string.ascii_uppercase) + ''.join(random.choices(string.digits, k=3)) + random.choice(string.ascii_uppercase)
+
+def wait_until(deadline):
+    delay = deadline - time.perf_counter()
+    if delay > 0: time.sleep(delay)
+
+def arrivals(rate_per_sec, duration, cars, insufficient_ratio):
+    """Poisson arrivals for one entry lane."""
+    end = time.perf_counter() + duration
+    while True:
+        time.sleep(random.expovariate(rate_per_sec))
+        if time.perf_counter() >= end: return
+        paid = random.random() >= insufficient_ratio
+        cars.put({'plate': random_plate(), 'arrived': time.perf_counter(), 'balance': random.randint(500, 5000) if paid else random.randint(0, 499), 'paid': paid})
+        with STATS.lock: STATS.arrivals += 1
+
+def entry_lane(cars, payments, backend, dwell):
+    """car_entry.py's decision path: unpaid check, insert, backend event, gate."""
+    while (car := cars.get()) is not None:
+        try:
+            if db_utils.has_unpaid_record(car['plate']): STATS.fail('entry_duplicate_session'); continue
+            db_utils.insert_entry(car['plate'])
+            requests.post(f"{backend}/events/entry", json={"car_plate": car['plate']}, timeout=5)
+            STATS.record('entry', time.perf_counter() - car['arrived'])
+            car['ready'] = time.perf_counter() + random.uniform(0, 2 * dwell); payments.put(car)
+        except sqlite3.Error as e: STATS.fail(f'entry_db: {e}')
+        except requests.exceptions.RequestException: STATS.fail('entry_backend')
+
+def payment_lane(process_payment, arduino, payments, exits):
+    """Taps the card on a fake terminal and runs process_payment against the pty, like its main() loop."""
+    ser = serial.Serial(arduino.port, 9600, timeout=1)
+    try:
+        while (car := payments.get()) is not None:
+            wait_until(car['ready']); start = time.perf_counter()
+            arduino.tap(car['plate'], car['balance']); plate = balance = None
+            while plate is None:
+                line = ser.readline().decode('utf-8').strip()
+                if not line: break
+                plate, balance = process_payment.parse_arduino_data(line)
+            if plate is None: STATS.fail('payment_no_tap'); continue
+            process_payment.process_payment(plate, balance, ser)
+            STATS.record('payment', time.perf_counter() - start)
+            car['ready'] = time.perf_counter(); exits.put(car)
+    finally: ser.close()
+
+def exit_lane(exits, backend):
+    """car_exit.py's decision path: latest paid exit within the grace period, UNPAID_ATTEMPT otherwise."""
+    while (car := exits.get()) is not None:
+        wait_until(car['ready']); start = time.perf_counter()
+        try:
+            exit_time = db_utils.get_recent_paid_exit(car['plate'])
+            granted = bool(exit_time) and timedelta(0) <= datetime.now() - datetime.strptime(exit_time, '%Y-%m-%d %H:%M:%S') <= timedelta(minutes=EXIT_GRACE_PERIOD_MINUTES)
+            if not granted: requests.post(f"{backend}/events/exit", json={"car_plate": car['plate'], "payment_status": "UNPAID_ATTEMPT"}, timeout=5)
+            STATS.record('exit', time.perf_counter() - start)
+            if granted != car['paid']: STATS.fail('exit_granted_unpaid' if granted else 'exit_denied_paid')
+            else:
+                with STATS.lock: STATS.completed += 1
+        except sqlite3.Error as e: STATS.fail(f'exit_db: {e}')
+        except requests.exceptions.RequestException: STATS.fail('exit_backend')
+
+def percentile(values, pct):
+    if not values: return 0.0
+    ordered = sorted(values); return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def report(duration):
+    print(f"\n📊 {duration:.1f}s | arrivals: {STATS.arrivals} | completed: {STATS.completed} ({STATS.completed / duration * 60:.1f} cars/min)")
+    print(f"{'stage':<28}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    rows = [(f"{stage} decision" if stage != 'payment' else 'payment transaction', STATS.latency[stage]) for stage in ('entry', 'payment', 'exit')]
+    rows.append(('db write (incl. lock wait)', STATS.db_writes))
+    for name, values in rows:
+        print(f"{name:<28}{len(values):>8}{percentile(values, 50) * 1000:>10.1f}{percentile(values, 99) * 1000:>10.1f}{max(values, default=0) * 1000:>10.1f}")
+    print("Backend calls: " + (', '.join(f"{k}={v}" for k, v in sorted(STATS.backend.items())) or 'none (external backend)'))
+    failures = STATS.failures + Counter({k: v for k, v in STATS.backend.items() if k.split(':', 1)[-1] in FAILURE_ALERTS})
+    print("Failed transactions: " + (', '.join(f"{k}={v}" for k, v in failures.most_common()) or 'none'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic multi-lane load against db_utils, process_payment and the events API')
+    parser.add_argument('--rate', type=float, default=30, help='Arrivals per minute across all entry lanes')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of arrivals; queued cars are drained afterwards')
+    parser.add_argument('--entry-lanes', type=int, default=1)
+    parser.add_argument('--payment-lanes', type=int, default=1)
+    parser.add_argument('--exit-lanes', type=int, default=1)
+    parser.add_argument('--dwell', type=float, default=1.0, help='Mean seconds between entry and payment')
+    parser.add_argument('--insufficient', type=float, default=0.05, help='Share of cards with too little balance')
+    parser.add_argument('--arduino-delay', type=float, default=0.05, help='Fake terminal card write time before DONE (s)')
+    parser.add_argument('--backend', type=str, default=None, help='Real API base URL (e.g. http://localhost:3001/api); a local stub by default')
+    parser.add_argument('--backend-delay', type=float, default=0, help='Stub response delay (s)')
+    parser.add_argument('--db', type=str, default=DEFAULT_DB, help='SQLite file for the run (recreated unless --keep-db)')
+    parser.add_argument('--keep-db', action='store_true')
+    parser.add_argument('--lane-state', action='store_true', help='Route every lane through an in-process lane_state_server.py instead of opening the file')
+    parser.add_argument('--verbose', action='store_true', help="Keep process_payment's console output")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.db) == os.path.abspath(db_utils.DATABASE_NAME): print(f"❌ Refusing to load-test the live {db_utils.DATABASE_NAME}"); return
+    if not args.keep_db and os.path.exists(args.db): os.remove(args.db)
+    db_utils.DATABASE_NAME = args.db; db_utils.CONNECTION_FACTORY = TimedConnection
+    lane_state = lane_state_server.start_server(args.db, port=0) if args.lane_state else None
+    if lane_state: db_utils.LANE_STATE_ADDR = f"127.0.0.1:{lane_state.server_address[1]}"; db_utils.rpc = timed_rpc(db_utils.rpc)
+    else: db_utils.LANE_STATE_ADDR = None
+    stub = None if args.backend else start_stub_backend(0, args.backend_delay)
+    backend = args.backend or f"http://127.0.0.1:{stub.server_address[1]}/api"
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    arduinos = [FakeArduino(args.arduino_delay) for _ in range(args.payment_lanes)]
+    for arduino in arduinos: arduino.start()
+
+    cars, payments, exits = queue.Queue(), queue.Queue(), queue.Queue()
+    print(f"🚗 {args.rate:g} cars/min for {args.duration:g}s | lanes entry={args.entry_lanes} payment={args.payment_lanes} exit={args.exit_lanes} | backend {backend}"
+          + (f" | lane state {db_utils.LANE_STATE_ADDR}" if lane_state else ''))
+    start = time.perf_counter()
+    with quiet:
+        db_utils.init_db()
+        import process_payment # Imported after DATABASE_NAME is set: it initialises the DB at import
+        process_payment.BACKEND_API_URL = backend
+        def spawn(target, *a): thread = threading.Thread(target=target, args=a, daemon=True); thread.start(); return thread
+        sources = [spawn(arrivals, args.rate / 60 / args.entry_lanes, args.duration, cars, args.insufficient) for _ in range(args.entry_lanes)]
+        stages = [([spawn(entry_lane, cars, payments, backend, args.dwell) for _ in range(args.entry_lanes)], cars),
+                  ([spawn(payment_lane, process_payment, arduino, payments, exits) for arduino in arduinos], payments),
+                  ([spawn(exit_lane, exits, backend) for _ in range(args.exit_lanes)], exits)]
+        for thread in sources: thread.join()
+        for workers, inbox in stages: # Drain in order so every admitted car finishes
+            for _ in workers: inbox.put(None)
+            for thread in workers: thread.join()
+    elapsed = time.perf_counter() - start
+    for arduino in arduinos: arduino.close()
+    if stub: stub.shutdown()
+    report(elapsed)
+    if lane_state:
+        stats = lane_state.state.stats; lane_state.shutdown()
+        print(f"Lane state: {stats['committed_writes']} writes in {stats['commits']} commits ({stats['committed_writes'] / max(1, stats['commits']):.1f} per commit)")
+
+if __name__ == "__main__":
+    main()
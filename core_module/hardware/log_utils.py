@@ -0,0 +1,92 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+STRUCTURED_FIELDS = ('lane', 'plate', 'stage', 'duration_ms', 'trace_id', 'suppressed')
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the structured fields passed via `extra`."""
+    def format(self, record):
+        entry = {'ts': self.formatTime(record), 'level': record.levelname, 'logger': record.name, 'msg': record.getMessage()}
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None: entry[field] = value
+        if record.exc_info: entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text: entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class LaneFilter(logging.Filter):
+    """Stamps every record with the lane name unless the caller set one."""
+    def __init__(self, lane):
+        super().__init__(); self.lane = lane
+    def filter(self, record):
+        if getattr(record, 'lane', None) is None: record.lane = self.lane
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """Lets a repeated message through at most once per `interval` seconds, at every level.
+
+    Runs on the logger, before the queue, so a suppressed record costs one dict
+    lookup. Records are keyed by (logger, msg): the first one always passes, so
+    a new failure is logged at once, and the next one that passes carries the
+    number it stood in for. flush() logs the counts still pending (at exit).
+    """
+    def __init__(self, interval=5.0):
+        super().__init__(); self.interval = interval; self.seen = {}
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic(); last, suppressed, level = self.seen.get(key, (0.0, 0, record.levelno))
+        if now - last < self.interval:
+            self.seen[key] = (last, suppressed + 1, max(level, record.levelno)); return False
+        self.seen[key] = (now, 0, record.levelno)
+        if suppressed: record.suppressed = suppressed
+        if len(self.seen) > 1024: self.flush(logging.getLogger(record.name)) # Messages with plates/values inline never repeat exactly
+        return True
+    def flush(self, logger):
+        pending = [(msg, suppressed, level) for (_, msg), (_, suppressed, level) in self.seen.items() if suppressed]
+        self.seen.clear()
+        for msg, suppressed, level in pending: logger.log(level, msg, extra={'suppressed': suppressed}) # No args: msg is not %-formatted
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', None)
+        return f"{text} (+{suppressed} suppressed)" if suppressed else text
+
+def setup_logging(log_file, name, lane=None, level=logging.INFO, max_bytes=5 * 1024 * 1024, backup_count=5,
+                  rotate_when=None, rate_limit_interval=5.0, console=True):
+    """Returns a logger whose records are handed to a background QueueListener.
+
+    The calling thread only filters and enqueues; formatting, JSON encoding,
+    file rotation and console writes happen on the listener thread. Rotation is
+    size based unless rotate_when (e.g. 'midnight') selects time based rotation.
+    """
+    log_dir = os.path.dirname(log_file)
+    if log_dir: os.makedirs(log_dir, exist_ok=True)
+    if rotate_when: file_handler = logging.handlers.TimedRotatingFileHandler(log_file, when=rotate_when, backupCount=backup_count)
+    else: file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(ConsoleFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        handlers.append(stream_handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start(); atexit.register(listener.stop)
+
+    logger = logging.getLogger(name)
+    logger.setLevel(level); logger.propagate = False
+    for handler in list(logger.handlers): logger.removeHandler(handler)
+    for log_filter in list(logger.filters): logger.removeFilter(log_filter)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    rate_limit = RateLimitFilter(rate_limit_interval)
+    logger.addFilter(LaneFilter(lane)); logger.addFilter(rate_limit)
+    atexit.register(rate_limit.flush, logger) # Registered after listener.stop, so it runs first
+    logger.listener = listener
+    return logger
@@ -1,20 +1,27 @@
 import platform
 import cv2
-import numpy as np
 from ultralytics import YOLO
-import pytesseract
 import os
 import time
 import serial
 import serial.tools.list_ports
 import sqlite3
 import logging
-from collections import Counter
-from datetime import datetime
-import re
 import argparse
 import threading
+import signal
 import db_utils # Utility for database operations
+import log_utils
+from profile_utils import FrameProfiler
+import plate_utils
+import capture_utils
+from fusion_utils import PlateCropFuser
+from crnn_ocr import CrnnRecognizer
+from preview_utils import PreviewServer
+from qos_utils import QosController, build_levels
+import trace_utils
+from multicam_utils import CameraWorker, LaneConsensus, mosaic, parse_camera
+from presence_utils import PresenceDebouncer
 
 class PlateRecognitionSystem:
     def __init__(self, config):
@@ -23,17 +30,37 @@ class PlateRecognitionSystem:
         self.logger.info("Initializing Plate Recognition System")
         os.makedirs(config['save_dir'], exist_ok=True)
         db_utils.init_db() # Use utility to init DB
-        self.load_model(); self.connect_arduino(); self.init_camera()
-        self.plate_buffer = []; self.last_saved_plate = None
+        self.multi_camera = len(config['camera_devices']) > 1
+        self.load_model(); self.load_recognizer(); self.connect_arduino()
+        self.consensus = plate_utils.PlateConsensus(config['accept_posterior'], config['accept_evidence'],
+                                                    config['min_plate_detections'], config['min_consensus_ratio'])
+        if self.multi_camera: self.init_lane_cameras()
+        else: self.init_camera()
+        self.fuser = PlateCropFuser(config['fusion_frames']) if config['fusion_frames'] > 1 and not self.multi_camera else None
+        self.qos = QosController(build_levels(config['detect_width']), config['qos_target_ms'],
+                                 config['min_plate_detections'], self.logger) if config['qos_target_ms'] > 0 and not self.multi_camera else None
+        if self.multi_camera and (config['qos_target_ms'] > 0 or config['fusion_frames'] > 1):
+            self.logger.info("Multi-camera lane: QoS and crop fusion are off; cameras vote into one consensus instead")
+        self.presence = PresenceDebouncer(config['detection_distance'], leave_seconds=config['presence_leave_seconds'])
+        self.last_saved_plate = None
         self.last_entry_time = 0; self.running = False
+        self.tracer = trace_utils.Tracer('gate', config['trace_file']); self.trace = None; self.frame_ts = time.time()
+        self.setup_profiler()
+        self.preview = PreviewServer(config['preview_port'], config['preview_fps']).start() if config['preview_port'] else None
+        if self.preview: self.logger.info(f"MJPEG preview on http://127.0.0.1:{config['preview_port']}/")
         self.logger.info("System initialization complete")
 
     def setup_logging(self):
-        log_dir = os.path.dirname(self.config['log_file'])
-        os.makedirs(log_dir, exist_ok=True)
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                            handlers=[logging.FileHandler(self.config['log_file']), logging.StreamHandler()])
-        self.logger = logging.getLogger('PlateRecognition')
+        self.logger = log_utils.setup_logging(self.config['log_file'], 'PlateRecognition', lane=self.config['lane'],
+                                              level=logging.DEBUG if self.config['debug_mode'] else logging.INFO,
+                                              rotate_when=self.config['log_rotate_when'])
+
+    def setup_profiler(self):
+        self.profiler = FrameProfiler(os.path.dirname(self.config['log_file']), self.logger)
+        if hasattr(signal, 'SIGUSR1'): # Not available on Windows
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.profiler.request(self.config['profile_window']))
+            self.logger.info(f"Send SIGUSR1 to pid {os.getpid()} for a {self.config['profile_window']}s profile")
+        self.profiler.request(self.config['profile_seconds'])
 
     def load_model(self):
         try: self.model = YOLO(self.config['model_path']); self.logger.info("Model loaded")
@@ -62,21 +89,42 @@ class PlateRecognitionSystem:
 
     def init_camera(self):
         try:
-            self.cap = cv2.VideoCapture(self.config['camera_device'])
+            self.cap, settings = capture_utils.open_capture(self.config['camera_device'], self.config['camera_width'], self.config['camera_height'],
+                                                            self.config['camera_fourcc'], self.config['camera_buffer_size'])
             if not self.cap.isOpened(): raise IOError("Could not open camera")
-            if self.config['camera_width'] and self.config['camera_height']:
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config['camera_width'])
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config['camera_height'])
-            self.logger.info("Camera initialized")
+            self.logger.info(f"Camera initialized {settings}"); self.camera_fps = settings.get('fps') or 30
         except Exception as e: self.logger.error(f"Camera init error: {e}"); raise
 
+    def init_lane_cameras(self):
+        """One CameraWorker per --camera source, all voting into one LaneConsensus."""
+        self.cap = None; self.lane = LaneConsensus(self.consensus)
+        capture = {'width': self.config['camera_width'], 'height': self.config['camera_height'],
+                   'fourcc': self.config['camera_fourcc'], 'buffer_size': self.config['camera_buffer_size']}
+        self.workers = [CameraWorker(str(index), device, self.lane, lambda index=index: self.worker_model(index), self.read_plates, self.logger,
+                                     self.config['detect_width'], self.config['detect_conf'], capture_settings=capture,
+                                     on_span=lambda trace, *args, **kwargs: trace and trace.add(*args, **kwargs))
+                        for index, device in enumerate(self.config['camera_devices'])]
+        self.logger.info(f"Lane cameras: {', '.join(f'{w.camera}={w.device}' for w in self.workers)}")
+
+    def worker_model(self, index):
+        return self.model if index == 0 else YOLO(self.config['model_path']) # Ultralytics models are not thread-safe; one per camera
+
+    def read_plates(self, crops, trace=None):
+        """Preprocess + OCR + grammar for a list of crops; [(plate, char confidences)] for the valid reads.
+        Runs on camera threads: the OCR span goes to the trace the worker passed, never self.trace."""
+        processed = [self.process_plate_image(crop) for crop in crops]
+        if crops: self.current_plate_img = crops[0].copy() # For --save-images
+        reads = [self.validate_plate(text, confidence) for text, confidence in self.extract_plate_texts(processed, trace) if text]
+        return [read for read in reads if read[0]]
+
     def read_distance(self):
-        if self.arduino and self.arduino.is_open and self.arduino.in_waiting > 0:
+        """New ultrasonic reading in cm, or None when no line has arrived since the last call (PresenceDebouncer keeps the state).
+        Without an Arduino a vehicle is simulated permanently in range."""
+        if not self.arduino or not self.arduino.is_open: return self.config['detection_distance']
+        if self.arduino.in_waiting > 0:
             try: return float(self.arduino.readline().decode('utf-8').strip())
-            except: pass
-        return self.mock_ultrasonic_distance()
-
-    def mock_ultrasonic_distance(self): import random; return random.randint(10, 150)
+            except (ValueError, serial.SerialException): pass
+        return None
 
     def control_gate(self, open_gate=True):
         if not self.arduino or not self.arduino.is_open: self.logger.info(f"Gate {'open' if open_gate else 'close'} (SIM)"); return
@@ -86,97 +134,182 @@ class PlateRecognitionSystem:
             if open_gate: threading.Timer(self.config['gate_open_duration'], self.control_gate, [False]).start()
         except serial.SerialException as e: self.logger.error(f"Gate control error: {e}")
 
+    def load_recognizer(self):
+        self.recognizer = None
+        if self.config['ocr_backend'] != 'crnn': self.logger.info("OCR backend: Tesseract"); return
+        self.recognizer = CrnnRecognizer(self.config['crnn_model_path']); self.logger.info(f"OCR backend: CRNN ({self.config['crnn_model_path']})")
+
     def process_plate_image(self, plate_img):
-        if plate_img.size == 0: return None
-        gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
-        kernel = np.ones((1, 1), np.uint8); thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-        return cv2.medianBlur(thresh, 3)
+        return plate_utils.preprocess_plate(plate_img)
 
     def extract_plate_text(self, processed_img):
-        if processed_img is None: return None
-        try: return pytesseract.image_to_string(processed_img, config=self.config['tesseract_config']).strip().replace(" ", "")
-        except Exception as e: self.logger.error(f"OCR error: {e}"); return None
+        """Returns (text, confidence) where confidence is a float or a per-character list."""
+        return self.extract_plate_texts([processed_img])[0]
+
+    def extract_plate_texts(self, processed_imgs, trace=None):
+        """Batched form of extract_plate_text: one CRNN inference for all crops, or one Tesseract call per crop."""
+        reads = [(None, 0.0)] * len(processed_imgs)
+        valid = [i for i, img in enumerate(processed_imgs) if img is not None]
+        if not valid: return reads
+        try:
+            start = time.perf_counter()
+            if self.recognizer:
+                for i, read in zip(valid, self.recognizer.recognize_batch([processed_imgs[i] for i in valid])): reads[i] = read
+            else:
+                for i in valid: reads[i] = plate_utils.read_plate_text(processed_imgs[i], self.config['tesseract_config'])
+            ocr_ms = (time.perf_counter() - start) * 1000
+            if self.qos: self.qos.record('ocr', ocr_ms)
+            if trace: trace.add('ocr', time.time() - ocr_ms / 1000, ocr_ms, crops=len(valid))
+            self.logger.debug("OCR read", extra={'plate': ','.join(text or '' for text, _ in reads), 'stage': 'ocr', 'duration_ms': round(ocr_ms, 2)})
+        except Exception as e: self.logger.error(f"OCR error: {e}", extra={'stage': 'ocr'})
+        return reads
 
-    def validate_plate(self, plate_text):
-        if not plate_text: return None
-        matches = re.findall(self.config['plate_regex'], plate_text)
-        return matches[0] if matches else None
+    def validate_plate(self, plate_text, confidence=1.0):
+        """Returns (plate, per-character confidences) after grammar correction, or (None, None)."""
+        return plate_utils.normalize_plate(plate_text, confidence)
+
+    def ensure_trace(self):
+        """The current vehicle pass, started at the capture of the first frame that saw it in range."""
+        if self.trace is None: self.trace = self.tracer.start(self.config['lane'], self.frame_ts)
+        return self.trace
+
+    def end_trace(self, outcome, **attrs):
+        if self.trace: self.trace.end(outcome, **attrs); self.trace = None
 
     def has_unpaid_record_db(self, plate_number):
-        conn = db_utils.get_db_connection()
-        cursor = conn.cursor()
-        record = None
-        try:
-            cursor.execute("SELECT 1 FROM parking_log WHERE car_plate = ? AND payment_status = 0 LIMIT 1", (plate_number,))
-            record = cursor.fetchone()
-        except sqlite3.Error as e: self.logger.error(f"[DB_ERROR] Checking unpaid in main: {e}")
-        finally:
-            if conn: conn.close()
-        return record is not None
+        try: return db_utils.has_unpaid_record(plate_number)
+        except sqlite3.Error as e: self.logger.error(f"[DB_ERROR] Checking unpaid in main: {e}", extra={'plate': plate_number, 'stage': 'db_check'}); return False
 
     def save_plate_entry(self, plate_number):
-        conn = db_utils.get_db_connection()
-        cursor = conn.cursor()
         try:
-            current_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute("INSERT INTO parking_log (entry_time, car_plate, payment_status) VALUES (?, ?, 0)", (current_time_str, plate_number))
-            conn.commit()
-            self.logger.info(f"DB entry for {plate_number}")
+            trace = self.ensure_trace(); start = time.perf_counter()
+            with trace.span('db_insert') as span: span['row_id'] = db_utils.insert_entry(plate_number, trace_id=trace.trace_id)
+            self.logger.info(f"DB entry for {plate_number}", extra={'plate': plate_number, 'stage': 'db_insert', 'trace_id': trace.trace_id,
+                                                                    'duration_ms': round((time.perf_counter() - start) * 1000, 2)})
             if self.config['save_plate_images'] and hasattr(self, 'current_plate_img'):
                 fname = f"{plate_number}_{time.strftime('%Y%m%d_%H%M%S')}.jpg"
                 cv2.imwrite(os.path.join(self.config['save_dir'], fname), self.current_plate_img)
             return True
-        except sqlite3.Error as e: self.logger.error(f"DB save error: {e}"); return False
-        finally:
-            if conn: conn.close()
+        except sqlite3.Error as e: self.logger.error(f"DB save error: {e}", extra={'plate': plate_number, 'stage': 'db_insert'}); return False
+
+    def wants_render(self):
+        """Annotated frames are only drawn for a local window or a connected preview client."""
+        preview_allowed = self.preview is not None and (self.qos is None or self.qos.level['preview'])
+        return not self.config['headless'] or (preview_allowed and self.preview.wants_frame())
 
-    def process_frame(self, frame):
+    def process_frame(self, frame, render=True):
         if frame is None or frame.size == 0: return frame
         try:
-            distance = self.read_distance()
-            if distance <= self.config['detection_distance']:
-                results = self.model(frame)
-                for result in results:
-                    for box in result.boxes:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0]); plate_img = frame[y1:y2, x1:x2]
-                        self.current_plate_img = plate_img.copy()
-                        processed_img = self.process_plate_image(plate_img)
-                        if not processed_img: continue
-                        plate_text = self.extract_plate_text(processed_img)
-                        if not plate_text: continue
-                        valid_plate = self.validate_plate(plate_text)
-                        if valid_plate:
-                            self.handle_valid_plate(valid_plate)
-                            if self.config['debug_mode']: cv2.imshow("Plate", plate_img); cv2.imshow("Processed", processed_img)
-                return results[0].plot()
+            if self.presence.update(self.read_distance()) == 'left':
+                if self.fuser: self.fuser.reset() # Vehicle left; never fuse crops of two different cars
+                self.end_trace('left')
+            if self.presence.present:
+                if self.trace is None: self.ensure_trace().add('capture', self.frame_ts, self.capture_ms)
+                if self.qos and not self.qos.should_detect(): return frame # Degraded: detector runs on every Nth frame
+                level = self.qos.level if self.qos else {'detect_width': self.config['detect_width'], 'ocr_plates': None}
+                start = time.perf_counter()
+                results, boxes = capture_utils.detect_plates(self.model, frame, level['detect_width'], conf=self.config['detect_conf'])
+                detect_ms = (time.perf_counter() - start) * 1000
+                if self.qos: self.qos.record('detect', detect_ms)
+                self.trace.add('detect', time.time() - detect_ms / 1000, detect_ms, boxes=len(boxes))
+                self.logger.debug("Detection", extra={'stage': 'detect', 'duration_ms': round(detect_ms, 2)})
+                if self.fuser: boxes = sorted(boxes, key=lambda b: b[4], reverse=True)[:1] # One plate per lane is fused
+                elif level['ocr_plates']: boxes = sorted(boxes, key=lambda b: b[4], reverse=True)[:level['ocr_plates']]
+                plate_imgs = []
+                for x1, y1, x2, y2, _ in boxes:
+                    plate_img = frame[y1:y2, x1:x2] # Cut from the full-resolution frame
+                    if self.fuser:
+                        self.fuser.add(plate_img.copy()); plate_img = self.fuser.fuse() # Last K crops -> one OCR call, every frame
+                    plate_imgs.append(plate_img)
+                processed_imgs = [self.process_plate_image(plate_img) for plate_img in plate_imgs]
+                for plate_img, processed_img, (plate_text, confidence) in zip(plate_imgs, processed_imgs, self.extract_plate_texts(processed_imgs, self.trace)):
+                    if not plate_text: continue
+                    self.current_plate_img = plate_img.copy()
+                    valid_plate, char_confidences = self.validate_plate(plate_text, confidence)
+                    if valid_plate:
+                        self.handle_valid_plate(valid_plate, char_confidences)
+                        if self.config['debug_mode'] and not self.config['headless']: cv2.imshow("Plate", plate_img); cv2.imshow("Processed", processed_img)
+                return results[0].plot() if render else frame
             return frame
-        except Exception as e: self.logger.error(f"Frame process error: {e}"); return frame
-
-    def handle_valid_plate(self, plate_number):
-        self.plate_buffer.append(plate_number)
-        if len(self.plate_buffer) >= self.config['min_plate_detections']:
-            counts = Counter(self.plate_buffer); common_plate = counts.most_common(1)[0][0]
-            consensus = counts.most_common(1)[0][1] / len(self.plate_buffer)
-            if consensus >= self.config['min_consensus_ratio']:
-                current_time_ts = time.time()
-                if not self.has_unpaid_record_db(common_plate):
-                    if (common_plate != self.last_saved_plate or (current_time_ts - self.last_entry_time) > self.config['entry_cooldown']):
-                        if self.save_plate_entry(common_plate):
-                            self.control_gate(open_gate=True)
-                            self.last_saved_plate = common_plate; self.last_entry_time = current_time_ts
-                    else: self.logger.info(f"Skipped {common_plate} cooldown/duplicate.")
-                else: self.logger.info(f"Skipped {common_plate}, unpaid DB record.")
-            else: self.logger.warning(f"Weak consensus for {common_plate}.")
-            self.plate_buffer.clear()
+        except Exception as e: self.logger.error(f"Frame process error: {e}", extra={'stage': 'frame'}); return frame
+
+    def handle_valid_plate(self, plate_number, char_confidences):
+        decision = self.consensus.add(plate_number, char_confidences)
+        if decision: self.handle_decision(*decision)
+
+    def handle_decision(self, common_plate, accepted, posterior):
+        trace = self.ensure_trace(); trace.plate = common_plate; trace_id = trace.trace_id
+        if accepted:
+            current_time_ts = time.time()
+            with trace.span('db_check') as span: span['unpaid'] = self.has_unpaid_record_db(common_plate)
+            if not span['unpaid']:
+                if (common_plate != self.last_saved_plate or (current_time_ts - self.last_entry_time) > self.config['entry_cooldown']):
+                    if self.save_plate_entry(common_plate):
+                        with trace.span('gate'): self.control_gate(open_gate=True)
+                        self.last_saved_plate = common_plate; self.last_entry_time = current_time_ts
+                        self.end_trace('entered', posterior=round(posterior, 3))
+                    else: self.end_trace('db_error')
+                else:
+                    self.logger.info(f"Skipped {common_plate} cooldown/duplicate.", extra={'plate': common_plate, 'stage': 'decision', 'trace_id': trace_id})
+                    self.end_trace('cooldown')
+            else:
+                self.logger.info(f"Skipped {common_plate}, unpaid DB record.", extra={'plate': common_plate, 'stage': 'decision', 'trace_id': trace_id})
+                self.end_trace('unpaid_record')
+        else:
+            self.logger.warning(f"Weak consensus for {common_plate} ({posterior:.2f}).", extra={'plate': common_plate, 'stage': 'consensus', 'trace_id': trace_id})
+            self.end_trace('weak_consensus', posterior=round(posterior, 3))
+
+    def run_lane(self):
+        """Multi-camera loop: cameras detect and read on their own threads; this thread feeds
+        presence from the distance sensor, acts on decisions and owns the windows."""
+        self.logger.info(f"Starting system with {len(self.workers)} cameras"); self.running = True
+        for worker in self.workers: worker.start()
+        try:
+            while self.running:
+                self.profiler.poll()
+                if self.presence.update(self.read_distance()) == 'left': self.end_trace('left')
+                present = self.presence.present
+                if present and self.trace is None and not self.lane.held: self.frame_ts = time.time(); self.ensure_trace()
+                self.lane.set_trace(self.trace)
+                self.lane.vehicle_present(present)
+                if self.lane.held and time.monotonic() - self.lane.decided_at > self.config['gate_open_duration']: self.lane.resume() # Same car still in range
+                decided = self.lane.next_decision(timeout=0.02)
+                if decided:
+                    (common_plate, accepted, posterior), camera = decided
+                    self.logger.info(f"Consensus {common_plate} ({posterior:.2f}) completed by camera {camera}", extra={'plate': common_plate, 'stage': 'consensus'})
+                    self.handle_decision(common_plate, accepted, posterior)
+                render = self.wants_render()
+                for worker in self.workers: worker.render = render
+                if not render: continue
+                frame = mosaic([worker.latest for worker in self.workers])
+                if frame is None: continue
+                if self.preview and self.preview.wants_frame(): self.preview.publish(frame)
+                if self.config['headless']: continue
+                cv2.imshow('Plate Recognition System', frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'): self.logger.info("Exit by user"); break
+        except KeyboardInterrupt: self.logger.info("Interrupted by user")
+        except Exception as e: self.logger.error(f"Runtime error: {e}")
+        finally:
+            for worker in self.workers: worker.stop()
+            for worker in self.workers: worker.join(timeout=2)
+            self.cleanup()
 
     def run(self):
+        if self.multi_camera: return self.run_lane()
         self.logger.info("Starting system"); self.running = True
         try:
             while self.running:
+                self.profiler.poll()
+                self.frame_ts = time.time(); start = time.perf_counter()
                 ret, frame = self.cap.read()
-                if not ret: self.logger.warning("Frame capture fail"); time.sleep(0.1); continue
-                processed_frame = self.process_frame(frame)
+                self.capture_ms = (time.perf_counter() - start) * 1000
+                if not ret: self.logger.warning("Frame capture fail", extra={'stage': 'capture'}); time.sleep(0.1); continue
+                render = self.wants_render(); start = time.perf_counter()
+                processed_frame = self.process_frame(frame, render)
+                if self.qos: self.qos.frame_done((time.perf_counter() - start) * 1000, self.camera_fps)
+                if not render: continue
+                if self.preview and self.preview.wants_frame(): self.preview.publish(processed_frame)
+                if self.config['headless']: continue
                 cv2.imshow('Plate Recognition System', processed_frame)
                 if cv2.waitKey(1) & 0xFF == ord('q'): self.logger.info("Exit by user"); break
         except KeyboardInterrupt: self.logger.info("Interrupted by user")
@@ -185,31 +318,56 @@ class PlateRecognitionSystem:
 
     def cleanup(self):
         self.logger.info("Cleaning up")
+        self.end_trace('shutdown')
+        self.profiler.finish()
         if self.cap and self.cap.isOpened(): self.cap.release()
+        if self.preview: self.preview.stop()
         if self.arduino and self.arduino.is_open:
             try: self.arduino.write(b'0'); time.sleep(0.5); self.arduino.close()
             except serial.SerialException: pass
-        cv2.destroyAllWindows(); self.logger.info("Shutdown complete")
+        if not self.config['headless']: cv2.destroyAllWindows()
+        self.logger.info("Shutdown complete")
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='License Plate Recognition System')
     parser.add_argument('--model', type=str, default='../model_dev/runs/detect/train/weights/best.pt')
-    parser.add_argument('--camera', type=int, default=0)
+    parser.add_argument('--camera', type=str, nargs='+', default=['0'], help='Camera index, file or URL; several sources watch one lane together')
     parser.add_argument('--arduino', action='store_true', default=True)
     parser.add_argument('--debug', action='store_true')
     parser.add_argument('--save-images', action='store_true')
+    parser.add_argument('--accept-posterior', type=float, default=0.9, help='Per-plate posterior needed to confirm before min detections')
+    parser.add_argument('--accept-evidence', type=float, default=1.3, help='Summed OCR confidence (<= 1 per read) each character needs for early confirmation; above 1 requires two agreeing reads')
+    parser.add_argument('--detect-width', type=int, default=480, help='Run detection on frames downscaled to this width, at this inference size (0 = full resolution; 640 is the YOLO default and saves little)')
+    parser.add_argument('--conf', type=float, default=0.25, help='Detector confidence threshold (pick with eval_sweep.py)')
+    parser.add_argument('--camera-fourcc', type=str, default='MJPG', help="Capture pixel format, '' to keep the driver default")
+    parser.add_argument('--camera-buffer', type=int, default=1, help='Driver frame buffer size (0 = driver default)')
+    parser.add_argument('--fusion-frames', type=int, default=3, help='OCR a fusion of the last K plate crops, one read per frame (<=1 = OCR the raw crop)')
+    parser.add_argument('--ocr', type=str, choices=['tesseract', 'crnn'], default='tesseract')
+    parser.add_argument('--crnn-model', type=str, default='../model_dev/ocr/plate_crnn.onnx')
+    parser.add_argument('--qos-target-ms', type=float, default=0, help='Adapt detection size/rate, OCR fan-out and preview to hold this gate decision latency (0 = off)')
+    parser.add_argument('--headless', action='store_true', help='No GUI windows; frames are only annotated for the preview server')
+    parser.add_argument('--preview-port', type=int, default=0, help='Serve an MJPEG preview on this local port (0 = off)')
+    parser.add_argument('--preview-fps', type=float, default=5)
+    parser.add_argument('--lane', type=str, default='entry', help='Lane name stamped on every log record')
+    parser.add_argument('--log-rotate', type=str, default=None, help="Time based log rotation (e.g. 'midnight'); size based if omitted")
+    parser.add_argument('--profile', type=float, default=0, help='Profile the frame loop for N seconds at startup')
+    parser.add_argument('--profile-window', type=float, default=30, help='Profiling window (s) started by SIGUSR1')
     return parser.parse_args()
 
 def main():
     args = parse_arguments()
     config = {
-        'model_path': args.model, 'camera_device': args.camera, 'camera_width': 1280, 'camera_height': 720,
+        'model_path': args.model, 'camera_device': parse_camera(args.camera[0]), 'camera_devices': [parse_camera(c) for c in args.camera], 'camera_width': 1280, 'camera_height': 720,
+        'camera_fourcc': args.camera_fourcc, 'camera_buffer_size': args.camera_buffer, 'detect_width': args.detect_width,
+        'detect_conf': args.conf, 'fusion_frames': args.fusion_frames, 'ocr_backend': args.ocr, 'crnn_model_path': args.crnn_model,
         'use_arduino': args.arduino, 'debug_mode': args.debug, 'save_plate_images': args.save_images,
-        'save_dir': 'plates', 'log_file': 'logs/plate_recognition.log',
-        'detection_distance': 50, 'entry_cooldown': 300, 'gate_open_duration': 15,
+        'save_dir': 'plates', 'log_file': 'logs/plate_recognition.log', 'trace_file': trace_utils.TRACE_FILE, 'lane': args.lane, 'log_rotate_when': args.log_rotate,
+        'detection_distance': 50, 'presence_leave_seconds': 1.0, 'entry_cooldown': 300, 'gate_open_duration': 15,
         'min_plate_detections': 3, 'min_consensus_ratio': 0.7,
-        'plate_regex': r'(RA[A-Z]\d{3}[A-Z])',
-        'tesseract_config': '--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        'qos_target_ms': args.qos_target_ms, 'headless': args.headless, 'preview_port': args.preview_port, 'preview_fps': args.preview_fps,
+        'profile_seconds': args.profile, 'profile_window': args.profile_window,
+        'accept_posterior': args.accept_posterior, 'accept_evidence': args.accept_evidence,
+        'tesseract_config': plate_utils.TESSERACT_CONFIG
     }
     system = PlateRecognitionSystem(config)
     system.run()
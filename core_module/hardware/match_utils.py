@@ -0,0 +1,141 @@
+import logging
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import db_utils
+
+WATCHLIST_FILE = 'watchlist.txt'
+
+def edit_distance(a, b):
+    """Levenshtein distance; plates are ~7 characters so the table is tiny."""
+    if a == b: return 0
+    if len(a) < len(b): a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def deletions(key, k):
+    """key plus every variant with up to k characters deleted."""
+    variants = {key}; frontier = {key}
+    for _ in range(k):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+class DeleteIndex:
+    """Symmetric-delete index for edit distance <= max_distance.
+
+    Every key is filed under all of its up-to-k-deletion variants; two strings
+    within Levenshtein distance k always share one, so a query only looks up
+    its own variants (8 for a 7-character plate at k=1) and verifies that
+    handful of candidates. Unlike a BK-tree this does not degrade on dense
+    fixed-length plates, where nearly every distance falls in 4..6 and the
+    triangle inequality prunes almost nothing.
+    """
+
+    def __init__(self, max_distance=1):
+        self.max_distance = max_distance; self.keys = set(); self.buckets = defaultdict(set)
+
+    def __len__(self): return len(self.keys)
+
+    def __contains__(self, key): return key in self.keys
+
+    def add(self, key):
+        if key in self.keys: return
+        self.keys.add(key)
+        for variant in deletions(key, self.max_distance): self.buckets[variant].add(key)
+
+    def remove(self, key):
+        if key not in self.keys: return
+        self.keys.discard(key)
+        for variant in deletions(key, self.max_distance):
+            bucket = self.buckets[variant]; bucket.discard(key)
+            if not bucket: del self.buckets[variant]
+
+    def search(self, query, k=None):
+        """Returns [(distance, key)] within k (<= max_distance) of query, closest first."""
+        k = self.max_distance if k is None else min(k, self.max_distance)
+        candidates = set()
+        for variant in deletions(query, k): candidates |= self.buckets.get(variant, set())
+        return sorted((d, key) for key in candidates if (d := edit_distance(query, key)) <= k)
+
+class PlateIndex:
+    """Fuzzy plate lookup over open sessions, recently paid exits and a watchlist.
+
+    The indexes follow parking_log incrementally (new rows by id, payments by
+    settle_seq, which unlike exit_time is assigned in commit order), so
+    refresh() costs a few indexed queries and lookups never scan the table. The watchlist file (one plate per line, '#' comments) is
+    reloaded when it changes on disk. Lookups refresh at most every refresh_interval; even a forced
+    refresh waits force_interval, so a stream of unknown plates cannot turn into a query per frame.
+    """
+
+    def __init__(self, max_distance=1, paid_window_minutes=1, watchlist_path=WATCHLIST_FILE, refresh_interval=1.0, alert_cooldown=60,
+                 force_interval=0.25, logger=None):
+        self.max_distance = max_distance; self.paid_window = timedelta(minutes=paid_window_minutes)
+        self.watchlist_path = watchlist_path; self.refresh_interval = refresh_interval; self.alert_cooldown = alert_cooldown
+        self.force_interval = force_interval; self.logger = logger or logging.getLogger('PlateIndex')
+        self.active = DeleteIndex(max_distance); self.active_ids = {}; self.paid = DeleteIndex(max_distance); self.paid_times = {}
+        self.watchlist = DeleteIndex(max_distance); self.watchlist_mtime = None; self.alerted = {}
+        self.last_id = 0; self.last_seq = None; self.last_refresh = float('-inf')
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if now - self.last_refresh < (self.force_interval if force else self.refresh_interval): return
+        self.last_refresh = now
+        self.load_watchlist()
+        cutoff = (datetime.now() - self.paid_window).strftime('%Y-%m-%d %H:%M:%S')
+        try: sessions, paid, self.last_seq = db_utils.session_changes(self.last_id, self.last_seq, cutoff)
+        except sqlite3.Error as e: self.logger.error(f"[PLATE_INDEX][ERROR] Refresh: {e}", extra={'stage': 'plate_index'}); sessions, paid = [], []
+        for row_id, plate, payment_status in sessions:
+            self.last_id = max(self.last_id, row_id)
+            if payment_status == 0: self.open_session(row_id, plate)
+        for row_id, plate, exit_time in paid: self.close_session(row_id, plate, exit_time)
+        for plate in [p for p, t in self.paid_times.items() if t < cutoff]:
+            del self.paid_times[plate]; self.paid.remove(plate)
+
+    def open_session(self, row_id, plate):
+        self.active_ids[row_id] = plate; self.active.add(plate)
+
+    def close_session(self, row_id, plate, exit_time):
+        if self.active_ids.pop(row_id, None) is not None and plate not in self.active_ids.values(): self.active.remove(plate)
+        if exit_time > self.paid_times.get(plate, ''): self.paid_times[plate] = exit_time; self.paid.add(plate)
+
+    def load_watchlist(self):
+        try: mtime = os.stat(self.watchlist_path).st_mtime
+        except OSError: mtime = None
+        if mtime == self.watchlist_mtime: return
+        self.watchlist_mtime = mtime; self.watchlist = DeleteIndex(self.max_distance)
+        if mtime is None: return
+        with open(self.watchlist_path) as f:
+            for line in f:
+                plate = line.split('#')[0].strip().upper()
+                if plate: self.watchlist.add(plate)
+
+    def resolve(self, index, plate):
+        """(distance, plate) for an exact or single closest match; None when absent or ambiguous."""
+        matches = index.search(plate)
+        if not matches or (len(matches) > 1 and matches[0][0] == matches[1][0]): return None
+        return matches[0]
+
+    def match_active(self, plate):
+        self.refresh(); return self.resolve(self.active, plate)
+
+    def match_paid(self, plate):
+        self.refresh()
+        if plate in self.active and plate not in self.paid: return None # An exact open session never borrows a neighbour's payment
+        return self.resolve(self.paid, plate)
+
+    def match_watchlist(self, plate):
+        """Watchlisted plates within max_distance that have not been alerted on within the cooldown."""
+        self.refresh(); now = time.monotonic(); hits = []
+        for distance, listed in self.watchlist.search(plate):
+            if now - self.alerted.get((plate, listed), -self.alert_cooldown) >= self.alert_cooldown:
+                self.alerted[(plate, listed)] = now; hits.append((distance, listed))
+        return hits
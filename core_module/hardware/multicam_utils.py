@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+import capture_utils
+
+def parse_camera(value):
+    """'0' -> 0 (device index); anything else (a path, an RTSP URL) is passed to OpenCV as is."""
+    return int(value) if str(value).isdigit() else value
+
+class LaneConsensus:
+    """One plate vote per lane, fed concurrently by every camera watching it.
+
+    Cameras submit reads tagged with the generation they started under. The
+    first read that makes the shared PlateConsensus confident bumps the
+    generation and puts the lane on hold: reads still in flight on other
+    cameras carry the old generation and are dropped, and workers stop
+    detecting until the vehicle leaves or resume() is called. Decisions
+    (confident or weak) are queued for the main thread, which owns the DB and
+    the gate. The main thread also publishes the current vehicle-pass trace
+    here; workers take it together with the generation, so a pass ending
+    under them never leaves them holding None halfway through.
+    """
+
+    def __init__(self, consensus):
+        self.consensus = consensus; self.lock = threading.Lock(); self.generation = 0
+        self.decisions = queue.SimpleQueue(); self.present = False; self.held = False; self.decided_at = 0.0; self.trace = None
+
+    def active(self, generation):
+        return self.present and not self.held and generation == self.generation
+
+    def snapshot(self):
+        """(generation, trace) read together; the trace is None when no pass is open."""
+        with self.lock: return self.generation, self.trace
+
+    def set_trace(self, trace):
+        with self.lock: self.trace = trace
+
+    def submit(self, generation, plate, confidences, source):
+        """Adds one read; False once the read's generation is stale (the caller should drop its remaining work)."""
+        with self.lock:
+            if not self.active(generation): return False
+            decision = self.consensus.add(plate, confidences)
+            if decision is None: return True
+            if decision[1]: self.generation += 1; self.held = True; self.decided_at = time.monotonic()
+            self.decisions.put((decision, source))
+            return not decision[1]
+
+    def vehicle_present(self, present):
+        """Fed from the distance sensor; a departure clears the vote and releases the hold."""
+        if present == self.present: return
+        with self.lock:
+            self.present = present
+            if not present: self.consensus.reset(); self.generation += 1; self.held = False
+
+    def resume(self):
+        with self.lock: self.consensus.reset(); self.generation += 1; self.held = False
+
+    def next_decision(self, timeout):
+        try: return self.decisions.get(timeout=timeout)
+        except queue.Empty: return None
+
+class CameraWorker(threading.Thread):
+    """Capture + detection + OCR for one camera of a lane.
+
+    Frames are always drained so the next detection sees a fresh frame;
+    detection only runs while the lane is active. YOLO models are not safe to
+    share between threads, so each worker builds its own via load_model.
+    read_plates(crops, trace) -> [(plate, char confidences)] does preprocessing,
+    OCR and grammar normalization; on_span(trace, name, start, duration_ms,
+    **attrs) records a span on the pass the frame was taken under.
+    """
+
+    def __init__(self, name, device, lane, load_model, read_plates, logger, detect_width=None, conf=0.25, max_plates=1,
+                 capture_settings=None, on_span=None):
+        super().__init__(name=f'camera-{name}', daemon=True)
+        self.camera = name; self.device = device; self.lane = lane; self.load_model = load_model; self.read_plates = read_plates
+        self.logger = logger; self.detect_width = detect_width; self.conf = conf; self.max_plates = max_plates
+        self.capture_settings = capture_settings or {}; self.on_span = on_span or (lambda *args, **kwargs: None)
+        self.stop_event = threading.Event(); self.render = False; self.latest = None; self.cap = None
+
+    def stop(self): self.stop_event.set()
+
+    def run(self):
+        try:
+            model = self.load_model()
+            self.cap, settings = capture_utils.open_capture(self.device, **self.capture_settings)
+            if not self.cap.isOpened(): raise IOError(f"Could not open camera {self.device}")
+            self.logger.info(f"Camera {self.camera} ({self.device}) initialized {settings}")
+        except Exception as e: self.logger.error(f"Camera {self.camera} init error: {e}"); return
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret: self.logger.warning(f"Frame capture fail on camera {self.camera}", extra={'stage': 'capture'}); time.sleep(0.1); continue
+                generation, trace = self.lane.snapshot()
+                if not self.lane.active(generation): self.latest = frame if self.render else None; continue
+                self.process(model, frame, generation, trace)
+        except Exception as e: self.logger.error(f"Camera {self.camera} error: {e}")
+        finally: self.cap.release()
+
+    def process(self, model, frame, generation, trace=None):
+        start_ts = time.time(); start = time.perf_counter()
+        results, boxes = capture_utils.detect_plates(model, frame, self.detect_width, conf=self.conf)
+        self.on_span(trace, 'detect', start_ts, (time.perf_counter() - start) * 1000, camera=self.camera, boxes=len(boxes))
+        if self.render: self.latest = results[0].plot()
+        if not boxes or not self.lane.active(generation): return # Another camera decided while this one was detecting
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2, _ in sorted(boxes, key=lambda b: b[4], reverse=True)[:self.max_plates]]
+        for plate, confidences in self.read_plates(crops, trace):
+            if not self.lane.submit(generation, plate, confidences, self.camera): break
+
+def mosaic(frames, height=360):
+    """Side-by-side preview of the cameras that have a frame, scaled to a common height."""
+    frames = [cv2.resize(f, (max(1, round(f.shape[1] * height / f.shape[0])), height)) for f in frames if f is not None]
+    return np.hstack(frames) if frames else None
@@ -0,0 +1,113 @@
+import re
+from collections import defaultdict
+import cv2
+import numpy as np
+import pytesseract
+
+# Rwandan plates: RA + letter, three digits, letter (e.g. RAB123C)
+PLATE_REGEX = r'RA[A-Z]\d{3}[A-Z]'
+PLATE_LENGTH = 7
+LETTER_POSITIONS = (0, 1, 2, 6)
+DIGIT_POSITIONS = (3, 4, 5)
+LITERAL_POSITIONS = (6,) # Never substituted: a digit here means the read ran on (RAB1234) or was cut from a longer digit run
+TESSERACT_CONFIG = '--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+# Common OCR confusions, applied only where the grammar says the other class is expected
+TO_LETTER = {'0': 'O', '1': 'I', '2': 'Z', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B'}
+TO_DIGIT = {'O': '0', 'Q': '0', 'D': '0', 'U': '0', 'I': '1', 'L': '1', 'J': '1', 'Z': '2', 'A': '4', 'S': '5', 'G': '6', 'T': '7', 'B': '8'}
+SUBSTITUTION_PENALTY = 0.7 # Corrected characters count for less in the vote
+
+def preprocess_plate(plate_img):
+    """Grayscale + adaptive threshold + denoise; the OCR input for both Tesseract and the CRNN."""
+    if plate_img is None or plate_img.size == 0: return None
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if plate_img.ndim == 3 else plate_img
+    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
+    kernel = np.ones((1, 1), np.uint8); thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+    return cv2.medianBlur(thresh, 3)
+
+def read_plate_text(processed_img, config=TESSERACT_CONFIG):
+    """Runs Tesseract once and returns (text, confidence 0..1) or (None, 0.0)."""
+    data = pytesseract.image_to_data(processed_img, config=config, output_type=pytesseract.Output.DICT)
+    words = [(text.strip(), float(conf)) for text, conf in zip(data['text'], data['conf']) if text.strip() and float(conf) >= 0]
+    if not words: return None, 0.0
+    return ''.join(text for text, _ in words), sum(conf for _, conf in words) / len(words) / 100.0
+
+def _correct_window(window, confidences):
+    plate = []; char_conf = []; substitutions = 0
+    for pos, (char, conf) in enumerate(zip(window, confidences)):
+        if pos in DIGIT_POSITIONS and not char.isdigit():
+            if char not in TO_DIGIT: return None
+            char = TO_DIGIT[char]; conf *= SUBSTITUTION_PENALTY; substitutions += 1
+        elif pos in LETTER_POSITIONS and not char.isalpha():
+            if char not in TO_LETTER or pos in LITERAL_POSITIONS: return None
+            char = TO_LETTER[char]; conf *= SUBSTITUTION_PENALTY; substitutions += 1
+        plate.append(char); char_conf.append(conf)
+    plate = ''.join(plate)
+    return (plate, char_conf, substitutions) if re.fullmatch(PLATE_REGEX, plate) else None
+
+def normalize_plate(text, confidence=1.0):
+    """Maps raw OCR text onto the plate grammar.
+
+    confidence is either one value for the whole read or one per character of
+    text (CRNN output). Every 7-character window is tried with position-aware
+    substitutions (letters at 0-2, digits at 3-5); the final letter must be
+    read as a letter, so a truncated or overlong digit run is rejected rather
+    than completed. The valid window with the fewest substitutions wins. Returns (plate, per-character confidences)
+    or (None, None).
+    """
+    if not text: return None, None
+    raw = text.upper()
+    if isinstance(confidence, (int, float)): per_char = [float(confidence)] * len(raw)
+    else: per_char = list(confidence)[:len(raw)] + [0.0] * max(0, len(raw) - len(confidence))
+    kept = [(c, p) for c, p in zip(raw, per_char) if c.isalnum()]
+    best = None
+    for start in range(len(kept) - PLATE_LENGTH + 1):
+        window = kept[start:start + PLATE_LENGTH]
+        corrected = _correct_window([c for c, _ in window], [p for _, p in window])
+        if corrected and (best is None or corrected[2] < best[2]): best = corrected
+    return (best[0], best[1]) if best else (None, None)
+
+def validate_plate(text):
+    return normalize_plate(text)[0]
+
+class PlateConsensus:
+    """Per-character, confidence-weighted vote over successive reads of one vehicle.
+
+    Each position keeps a weight per candidate character. The posterior of the
+    leading plate is the product over positions of (leading weight / total
+    weight); evidence is the smallest leading weight, i.e. the summed
+    confidence (at most 1 per read) behind the weakest character. A plate is
+    accepted as soon as both clear their thresholds; with the default
+    accept_evidence of 1.3 that takes at least two agreeing reads, never one.
+    After max_reads reads the leader is decided anyway and accepted only if its
+    posterior reaches min_ratio.
+    """
+
+    def __init__(self, accept_posterior=0.9, accept_evidence=1.3, max_reads=3, min_ratio=0.7):
+        self.accept_posterior = accept_posterior; self.accept_evidence = accept_evidence
+        self.max_reads = max_reads; self.min_ratio = min_ratio
+        self.reset()
+
+    def reset(self):
+        self.votes = [defaultdict(float) for _ in range(PLATE_LENGTH)]; self.reads = 0
+
+    def leader(self):
+        plate = []; posterior = 1.0; evidence = float('inf')
+        for position in self.votes:
+            if not position: return None, 0.0, 0.0
+            char, weight = max(position.items(), key=lambda item: item[1])
+            total = sum(position.values())
+            plate.append(char); posterior *= weight / total if total else 0.0; evidence = min(evidence, weight)
+        return ''.join(plate), posterior, evidence
+
+    def add(self, plate, confidences):
+        """Adds a normalized read; returns (plate, accepted, posterior) once decided, else None."""
+        for position, (char, conf) in enumerate(zip(plate, confidences)):
+            self.votes[position][char] += max(conf, 1e-3)
+        self.reads += 1
+        leader, posterior, evidence = self.leader()
+        if posterior >= self.accept_posterior and evidence >= self.accept_evidence:
+            self.reset(); return leader, True, posterior
+        if self.reads >= self.max_reads:
+            self.reset(); return leader, posterior >= self.min_ratio, posterior
+        return None
@@ -0,0 +1,30 @@
+import time
+
+class PresenceDebouncer:
+    """Vehicle presence from the ultrasonic sensor, debounced.
+
+    The Arduino prints a distance every ~50 ms while the camera delivers a
+    frame every ~33 ms, so many frames have no new reading: update(None)
+    changes nothing. One in-range reading marks the vehicle present; it only
+    counts as gone after leave_readings consecutive out-of-range readings
+    spanning at least leave_seconds since the last in-range one, so a single
+    bad echo does not split one vehicle pass in two.
+    """
+
+    def __init__(self, max_distance, min_distance=0, leave_readings=3, leave_seconds=1.0):
+        self.max_distance = max_distance; self.min_distance = min_distance
+        self.leave_readings = leave_readings; self.leave_seconds = leave_seconds
+        self.present = False; self.misses = 0; self.last_seen = 0.0
+
+    def update(self, distance, now=None):
+        """Feeds one reading (None = no new reading); returns 'arrived', 'left' or None."""
+        if distance is None: return None
+        now = time.monotonic() if now is None else now
+        if self.min_distance <= distance <= self.max_distance:
+            self.misses = 0; self.last_seen = now
+            if not self.present: self.present = True; return 'arrived'
+            return None
+        self.misses += 1
+        if self.present and self.misses >= self.leave_readings and now - self.last_seen >= self.leave_seconds:
+            self.present = False; return 'left'
+        return None
@@ -0,0 +1,68 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+
+BOUNDARY = 'frame'
+INDEX_HTML = b"<html><body style='margin:0;background:#000'><img src='/stream' style='width:100%'></body></html>"
+
+class PreviewServer:
+    """Local MJPEG preview for headless gate boxes.
+
+    The frame loop asks wants_frame() before drawing anything: it is only True
+    while at least one browser is connected and the preview FPS cap allows a
+    new frame, so annotation and JPEG encoding cost nothing otherwise.
+    """
+
+    def __init__(self, port, max_fps=5, host='127.0.0.1', jpeg_quality=70):
+        self.address = (host, port); self.min_interval = 1.0 / max_fps if max_fps > 0 else 0
+        self.jpeg_quality = jpeg_quality
+        self.clients = 0; self.frame = None; self.frame_id = 0; self.last_publish = 0
+        self.condition = threading.Condition(); self.server = None
+
+    def start(self):
+        preview = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass # Keep request logging off the console
+            def do_GET(self):
+                if self.path == '/': self.send_response(200); self.send_header('Content-Type', 'text/html'); self.end_headers(); self.wfile.write(INDEX_HTML); return
+                if self.path != '/stream': self.send_error(404); return
+                self.send_response(200)
+                self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+                self.send_header('Cache-Control', 'no-cache'); self.end_headers()
+                preview.stream_to(self.wfile)
+        self.server = ThreadingHTTPServer(self.address, Handler); self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='PreviewServer', daemon=True).start()
+        return self
+
+    def stream_to(self, wfile):
+        with self.condition: self.clients += 1
+        seen = self.frame_id
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.frame_id != seen or self.server is None, timeout=5)
+                    if self.server is None: return
+                    if self.frame_id == seen: continue
+                    seen, jpeg = self.frame_id, self.frame
+                wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+        except (BrokenPipeError, ConnectionResetError): pass
+        finally:
+            with self.condition: self.clients -= 1
+
+    def wants_frame(self):
+        return self.clients > 0 and time.monotonic() - self.last_publish >= self.min_interval
+
+    def publish(self, frame):
+        if frame is None: return
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok: return
+        with self.condition:
+            self.frame = jpeg.tobytes(); self.frame_id += 1; self.last_publish = time.monotonic()
+            self.condition.notify_all()
+
+    def stop(self):
+        if not self.server: return
+        server = self.server
+        with self.condition: self.server = None; self.condition.notify_all()
+        server.shutdown(); server.server_close()
@@ -7,11 +7,15 @@ import math
 import requests
 import sqlite3
 import db_utils # Utility for database operations
+import match_utils
+import trace_utils
 
 HOURLY_RATE = 500
 BACKEND_API_URL = "http://localhost:3001/api"
 
 db_utils.init_db() # Initialize database using utility
+plate_index = match_utils.PlateIndex() # Flags a card plate close to an open session (entry-camera misread) for review
+tracer = trace_utils.Tracer('payment')
 
 def detect_arduino_port(): # (Identical to car_entry.py)
     ports = list(serial.tools.list_ports.comports())
@@ -31,32 +35,38 @@ def parse_arduino_data(line):
         return (plate, int(balance_str)) if balance_str else (None, None)
     except ValueError: return None, None
 
-def send_alert_to_backend(plate, msg, alert_type):
+def send_alert_to_backend(plate, msg, alert_type, trace=None):
     try:
         payload = {"plate_number": plate, "message": msg, "type": alert_type}
-        resp = requests.post(f"{BACKEND_API_URL}/events/alert", json=payload, timeout=5)
+        resp = requests.post(f"{BACKEND_API_URL}/events/alert", json=payload, headers=trace_utils.trace_headers(trace), timeout=5)
         print(f"[BACKEND_ALERT] Sent '{alert_type}' for {plate if plate else 'Sys'}. Status: {resp.status_code}")
     except requests.exceptions.RequestException as e: print(f"[BACKEND_ALERT_ERROR] {e}")
 
 def process_payment(plate, balance, ser):
-    conn = db_utils.get_db_connection()
-    cursor = conn.cursor()
-    record = None
+    """One card scan is one traced pass: the trace ends with the outcome _process_payment returns."""
+    trace = tracer.start('payment'); trace.plate = plate; outcome = 'error'
+    try: outcome = _process_payment(plate, balance, ser, trace) or 'error'
+    finally: trace.end(outcome)
+
+def _process_payment(plate, balance, ser, trace):
     try:
-        cursor.execute("SELECT id, entry_time FROM parking_log WHERE car_plate = ? AND payment_status = 0 ORDER BY entry_time DESC LIMIT 1", (plate,))
-        record = cursor.fetchone()
+        with trace.span('db_lookup'):
+            session = db_utils.get_open_session(plate); match = None
+            if not session: match = plate_index.match_active(plate)
     except sqlite3.Error as e_sql:
         print(f"[DB_ERROR] Fetching unpaid for {plate}: {e_sql}")
-        if conn: conn.close()
-        return
+        return 'db_error'
 
-    if not record:
+    if not session and match: # Likely an entry-camera misread, but it may be another car's stay: never charge it without an operator
+        print(f"[PAYMENT] Card plate {plate} has no open session; closest is {match[1]} (distance {match[0]}). Not charged.")
+        send_alert_to_backend(plate, f"Card {plate} has no open session; {match[1]} is {match[0]} character(s) away. Check and settle manually.", "PAYMENT_REVIEW_FUZZY_SESSION", trace)
+        return 'review'
+    if not session:
         print(f"[PAYMENT] Plate {plate} not found/paid in DB.")
-        send_alert_to_backend(plate, f"No active entry for {plate}.", "PLATE_NOT_FOUND_DB")
-        if conn: conn.close()
-        return
+        send_alert_to_backend(plate, f"No active entry for {plate}.", "PLATE_NOT_FOUND_DB", trace)
+        return 'no_session'
 
-    entry_id, entry_time_str = record["id"], record["entry_time"]
+    entry_id, entry_time_str = session["id"], session["entry_time"]
     try:
         entry_dt = datetime.strptime(entry_time_str, '%Y-%m-%d %H:%M:%S')
         exit_dt = datetime.now(); exit_str = exit_dt.strftime('%Y-%m-%d %H:%M:%S')
@@ -65,38 +75,46 @@ def process_payment(plate, balance, ser):
 
         if balance < due:
             print(f"[PAYMENT] Insufficient balance {plate}. Req: {due}, Has: {balance}")
-            ser.write(b'I\n'); send_alert_to_backend(plate, f"Insufficient RFID balance {plate}. Req: {due}", "INSUFFICIENT_BALANCE_RFID")
-            return
+            ser.write(b'I\n'); send_alert_to_backend(plate, f"Insufficient RFID balance {plate}. Req: {due}", "INSUFFICIENT_BALANCE_RFID", trace)
+            return 'insufficient'
         
         new_bal = balance - due
         print("[WAIT] Arduino READY..."); start_t = time.time(); ready_ok = False
-        while time.time() - start_t < 5:
-            if ser.in_waiting and ser.readline().decode().strip() == "READY": ready_ok = True; break
-            time.sleep(0.01)
-        if not ready_ok: print("[ERROR] Arduino READY timeout"); return
+        with trace.span('arduino_ready'):
+            while time.time() - start_t < 5:
+                if ser.in_waiting and ser.readline().decode().strip() == "READY": ready_ok = True; break
+                time.sleep(0.01)
+        if not ready_ok: print("[ERROR] Arduino READY timeout"); return 'ready_timeout'
+
+        with trace.span('db_update') as span: # Claim the session before the card is debited: a second terminal gets False and charges nothing
+            try: span['settled'] = db_utils.settle_payment(entry_id, exit_str, due)
+            except sqlite3.Error: ser.write(f"{balance}\r\n".encode()); raise # Unchanged balance releases the waiting Arduino
+        if not span['settled']:
+            ser.write(f"{balance}\r\n".encode()); print(f"[DB_UPDATE] Session {entry_id} for {plate} was already settled by another terminal. Card not charged.")
+            send_alert_to_backend(plate, f"Session {entry_id} for {plate} was already settled by another terminal; card not charged.", "DOUBLE_SETTLE", trace)
+            return 'already_settled'
+        print(f"[DB_UPDATE] Session {entry_id} settled for {plate}.")
 
         ser.write(f"{new_bal}\r\n".encode()); print(f"[PAYMENT] Sent new balance {new_bal}")
         print("[WAIT] Arduino confirm..."); start_t = time.time(); confirm_ok = False
-        while time.time() - start_t < 10:
-            if ser.in_waiting and "DONE" in ser.readline().decode().strip(): confirm_ok = True; break
-            time.sleep(0.1)
+        with trace.span('arduino_confirm'):
+            while time.time() - start_t < 10:
+                if ser.in_waiting and "DONE" in ser.readline().decode().strip(): confirm_ok = True; break
+                time.sleep(0.1)
         
         if not confirm_ok:
-            print("[ERROR] Arduino confirm timeout."); send_alert_to_backend(plate, f"Timeout 'DONE' for {plate}.", "ARDUINO_TIMEOUT_CONFIRM"); return
+            print("[ERROR] Arduino confirm timeout."); send_alert_to_backend(plate, f"Timeout 'DONE' for {plate}; session {entry_id} is settled, check the card was debited.", "ARDUINO_TIMEOUT_CONFIRM", trace); return 'confirm_timeout'
 
-        cursor.execute("UPDATE parking_log SET exit_time = ?, due_payment = ?, payment_status = 1 WHERE id = ?", (exit_str, due, entry_id))
-        conn.commit()
-        print(f"[DB_UPDATE] Payment success for {plate}.")
         payload = {"car_plate": plate, "payment_status": "PAID"}
         try:
-            resp = requests.post(f"{BACKEND_API_URL}/events/exit", json=payload, timeout=5)
+            with trace.span('backend_post') as span:
+                resp = requests.post(f"{BACKEND_API_URL}/events/exit", json=payload, headers=trace.headers(), timeout=5); span['status'] = resp.status_code
             print(f"[BACKEND_EVENT] PAID exit {plate}. Status: {resp.status_code}")
         except requests.exceptions.RequestException as e_req: print(f"[BACKEND_ERROR] PAID event: {e_req}")
-    except ValueError as ve: print(f"[ERROR] Date parse {plate}: {ve}"); send_alert_to_backend(plate, f"Date error {plate}: {ve}", "PAYMENT_DATE_ERROR")
-    except sqlite3.Error as e_sql: print(f"[ERROR] SQLite payment {plate}: {e_sql}"); send_alert_to_backend(plate, f"DB error payment {plate}: {e_sql}", "PAYMENT_DB_ERROR")
-    except Exception as e: print(f"[ERROR] Payment failed {plate}: {e}"); send_alert_to_backend(plate, f"Payment error {plate}: {e}", "PAYMENT_PROCESSING_ERROR")
-    finally:
-        if conn: conn.close()
+        return 'paid'
+    except ValueError as ve: print(f"[ERROR] Date parse {plate}: {ve}"); send_alert_to_backend(plate, f"Date error {plate}: {ve}", "PAYMENT_DATE_ERROR", trace)
+    except sqlite3.Error as e_sql: print(f"[ERROR] SQLite payment {plate}: {e_sql}"); send_alert_to_backend(plate, f"DB error payment {plate}: {e_sql}", "PAYMENT_DB_ERROR", trace)
+    except Exception as e: print(f"[ERROR] Payment failed {plate}: {e}"); send_alert_to_backend(plate, f"Payment error {plate}: {e}", "PAYMENT_PROCESSING_ERROR", trace)
 
 def main():
     port = detect_arduino_port()
@@ -0,0 +1,71 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+class FrameProfiler:
+    """Time-boxed profiling window for a frame loop.
+
+    request() only stores the duration, so it is safe to call from a signal
+    handler. poll() must be called from the thread being profiled (the frame
+    loop); it starts cProfile plus a stack sampler and, once the window has
+    elapsed, writes a folded-stack file (flamegraph.pl / speedscope input) and
+    a per-function summary into out_dir before returning to normal operation.
+    """
+
+    def __init__(self, out_dir, logger, sample_interval=0.005, top_n=40):
+        self.out_dir = out_dir; self.logger = logger
+        self.sample_interval = sample_interval; self.top_n = top_n
+        self.pending = None; self.active = False; self.deadline = 0
+        self.profile = None; self.stacks = None; self.sampler = None
+        self.stop_sampling = threading.Event()
+
+    def request(self, seconds):
+        if seconds and seconds > 0: self.pending = float(seconds)
+
+    def poll(self):
+        if self.active:
+            if time.time() >= self.deadline: self.finish()
+        elif self.pending:
+            self.start(self.pending); self.pending = None
+
+    def start(self, seconds):
+        self.stacks = Counter(); self.stop_sampling.clear()
+        target = threading.get_ident()
+        self.sampler = threading.Thread(target=self._sample, args=(target,), name='FrameProfilerSampler', daemon=True)
+        self.sampler.start()
+        self.profile = cProfile.Profile(); self.profile.enable()
+        self.active = True; self.deadline = time.time() + seconds
+        self.logger.info(f"Profiling started for {seconds:g}s")
+
+    def _sample(self, target):
+        while not self.stop_sampling.wait(self.sample_interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack: self.stacks[';'.join(reversed(stack))] += 1
+
+    def finish(self):
+        if not self.active: return
+        self.profile.disable(); self.stop_sampling.set(); self.sampler.join(timeout=1)
+        self.active = False
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            base = os.path.join(self.out_dir, f"profile_{time.strftime('%Y%m%d_%H%M%S')}")
+            with open(base + '.folded', 'w') as f:
+                for stack, count in self.stacks.most_common(): f.write(f"{stack} {count}\n")
+            summary = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=summary)
+            stats.sort_stats('cumulative').print_stats(self.top_n)
+            stats.sort_stats('tottime').print_stats(self.top_n)
+            with open(base + '.txt', 'w') as f: f.write(summary.getvalue())
+            self.logger.info(f"Profiling finished ({sum(self.stacks.values())} samples), wrote {base}.folded and {base}.txt")
+        except OSError as e: self.logger.error(f"Profile dump error: {e}")
+        finally: self.profile = None; self.stacks = None
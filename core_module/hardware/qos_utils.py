@@ -0,0 +1,104 @@
+import time
+
+YOLO_IMGSZ = 640 # Inference size when detect_plates gets no detect_width
+
+def build_levels(detect_width, ocr_plates=None):
+    """Degradation ladder from full quality (level 0) down to the cheapest mode.
+
+    Each step gives up a little: smaller detector input first, then preview
+    rendering and OCR fan-out, then running the detector on every Nth frame.
+    Widths step down from the size inference actually runs at: detect_width,
+    or YOLO's 640 for detect_width 0 (full resolution is letterboxed to 640),
+    so every step is cheaper than the one before. ocr_plates None means every
+    detected plate is read.
+    """
+    base = detect_width or YOLO_IMGSZ
+    width = lambda scale: max(320, int(base * scale) // 32 * 32)
+    return [
+        {'detect_width': detect_width, 'detect_every': 1, 'ocr_plates': ocr_plates, 'preview': True},
+        {'detect_width': width(0.8), 'detect_every': 1, 'ocr_plates': ocr_plates, 'preview': True},
+        {'detect_width': width(0.8), 'detect_every': 1, 'ocr_plates': 1, 'preview': False},
+        {'detect_width': width(0.65), 'detect_every': 2, 'ocr_plates': 1, 'preview': False},
+        {'detect_width': width(0.5), 'detect_every': 3, 'ocr_plates': 1, 'preview': False},
+    ]
+
+def describe(level):
+    return (f"detect {level['detect_width'] or 'full'}px every {level['detect_every']} frame(s), "
+            f"OCR {level['ocr_plates'] or 'all'} plate(s)/frame, preview {'on' if level['preview'] else 'off'}")
+
+class QosController:
+    """Feedback controller holding the gate decision latency near a target.
+
+    A decision needs frames_per_decision detector passes (one consensus read
+    per pass, fused or not), and with detection on every Nth frame each pass
+    also waits N-1 camera intervals, so the estimate is
+    frames_per_decision x (busy time of a detecting frame + (N-1) x interval).
+    Over target, the controller steps down through cheaper detector input,
+    OCR fan-out and preview; it only lowers the inference rate when frames
+    pile up behind the camera (backlog), i.e. the box is CPU bound, since
+    skipping frames adds latency on an idle box. It steps back up once the
+    better level's estimate is well under target with no backlog; that
+    estimate uses the frame time measured while that level was active, not
+    the cheaper current one, so the ladder does not bounce between two levels.
+    A level's measurement older than probe_after seconds is no longer trusted
+    (the load may have changed) and the current frame time stands in for it.
+    A cooldown after each change lets the new mode settle before it is judged.
+    """
+
+    def __init__(self, levels, target_ms, frames_per_decision, logger, alpha=0.1, up_ratio=0.6, cooldown=3.0, probe_after=60.0):
+        self.levels = levels; self.target_ms = target_ms; self.frames_per_decision = max(1, frames_per_decision)
+        self.logger = logger; self.alpha = alpha; self.up_ratio = up_ratio; self.cooldown = cooldown; self.probe_after = probe_after
+        self.index = 0; self.frame_count = 0; self.last_change = time.monotonic()
+        self.stage_ms = {}; self.detected = False; self.busy_ms = None; self.interval_ms = 0.0; self.backlog = 0.0
+        self.level_ms = {} # level index -> (busy ms of a detecting frame at that level, monotonic time measured)
+
+    @property
+    def level(self): return self.levels[self.index]
+
+    def should_detect(self):
+        """Counts a frame; True when the detector should run on it at the current level."""
+        self.frame_count += 1
+        return self.frame_count % self.level['detect_every'] == 0
+
+    def record(self, stage, ms):
+        if stage == 'detect': self.detected = True
+        previous = self.stage_ms.get(stage)
+        self.stage_ms[stage] = ms if previous is None else previous + self.alpha * (ms - previous)
+
+    def frame_done(self, busy_ms, camera_fps):
+        """Feeds one frame's processing time; backlog = camera frames that arrived meanwhile.
+
+        Only frames that ran the detector (a 'detect' record) update the decision estimate.
+        """
+        self.interval_ms = 1000.0 / camera_fps if camera_fps else 0.0
+        backlog = max(0.0, busy_ms / self.interval_ms - 1) if self.interval_ms else 0.0
+        self.backlog += self.alpha * (backlog - self.backlog)
+        detected, self.detected = self.detected, False
+        if detected:
+            previous = self.level_ms.get(self.index)
+            self.busy_ms = busy_ms if previous is None else previous[0] + self.alpha * (busy_ms - previous[0])
+            self.level_ms[self.index] = (self.busy_ms, time.monotonic())
+            self.adjust()
+
+    def estimate_ms(self, index, now=None):
+        busy_ms, measured = self.level_ms.get(index, (self.busy_ms, 0.0))
+        if index != self.index and (now or time.monotonic()) - measured > self.probe_after: busy_ms = self.busy_ms
+        return self.frames_per_decision * (max(busy_ms, self.interval_ms) + (self.levels[index]['detect_every'] - 1) * self.interval_ms)
+
+    def adjust(self):
+        now = time.monotonic()
+        if now - self.last_change < self.cooldown: return
+        estimate = self.estimate_ms(self.index, now)
+        if self.index < len(self.levels) - 1:
+            same_rate = self.levels[self.index + 1]['detect_every'] == self.level['detect_every']
+            if self.backlog > 1.0 or (estimate > self.target_ms and same_rate): self.change(self.index + 1, estimate, now); return
+        if self.index > 0 and self.backlog < 0.5 and self.estimate_ms(self.index - 1, now) < self.target_ms * self.up_ratio:
+            self.change(self.index - 1, estimate, now)
+
+    def change(self, index, estimate, now):
+        stages = ', '.join(f"{stage} {ms:.0f}ms" for stage, ms in sorted(self.stage_ms.items()))
+        direction = 'degrade' if index > self.index else 'restore'
+        self.logger.warning(f"[QOS] {direction} level {self.index} -> {index}: {describe(self.levels[index])} "
+                            f"(decision ~{estimate:.0f}ms vs target {self.target_ms:.0f}ms, frame {self.busy_ms:.0f}ms, backlog {self.backlog:.1f}, {stages})",
+                            extra={'stage': 'qos', 'duration_ms': round(estimate, 2)})
+        self.index = index; self.last_change = now
@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import time
+import cv2
+from ultralytics import YOLO
+import capture_utils
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def load_frames(source, limit):
+    """Frames from an image directory or a recorded video file."""
+    frames = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(source, name))
+                if frame is not None: frames.append(frame)
+            if len(frames) >= limit: break
+    else:
+        cap = cv2.VideoCapture(source)
+        while len(frames) < limit:
+            ret, frame = cap.read()
+            if not ret: break
+            frames.append(frame)
+        cap.release()
+    return frames
+
+def benchmark(model, frames, detect_width, repeat, upscale_to):
+    timings = []; crops = []
+    for _ in range(repeat):
+        for frame in frames:
+            if upscale_to and frame.shape[1] < upscale_to: # Emulate the 1280x720 gate camera with low-res dataset images
+                frame = cv2.resize(frame, (upscale_to, round(frame.shape[0] * upscale_to / frame.shape[1])))
+            start = time.perf_counter()
+            _, boxes = capture_utils.detect_plates(model, frame, detect_width)
+            timings.append((time.perf_counter() - start) * 1000)
+            crops.extend((x2 - x1) * (y2 - y1) for x1, y1, x2, y2, _ in boxes)
+    timings.sort()
+    return {'mean_ms': statistics.mean(timings), 'p95_ms': timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+            'boxes': len(crops), 'mean_crop_px': statistics.mean(crops) if crops else 0}
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay frames through plate detection at several detection widths')
+    parser.add_argument('--model', type=str, default='../model_dev/runs/detect/train/weights/best.pt')
+    parser.add_argument('--source', type=str, default='dataset/val/images', help='Image directory or video file')
+    parser.add_argument('--widths', type=int, nargs='+', default=[0, 640, 480, 320], help='Detection widths (0 = full resolution)')
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--upscale-to', type=int, default=1280, help='Resize narrower frames to this width before replay (0 = off)')
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.limit)
+    if not frames: print(f"[ERROR] No frames found in {args.source}"); return
+    model = YOLO(args.model)
+    capture_utils.detect_plates(model, frames[0], None) # Warm-up
+    print(f"[BENCH] {len(frames)} frames x {args.repeat} from {args.source}")
+    baseline = None
+    for width in args.widths:
+        stats = benchmark(model, frames, width or None, args.repeat, args.upscale_to)
+        baseline = baseline or stats['mean_ms']
+        label = 'full' if not width else f"{width}px"
+        print(f"[BENCH] detect={label:>5}  mean={stats['mean_ms']:7.1f}ms  p95={stats['p95_ms']:7.1f}ms  "
+              f"speedup={baseline / stats['mean_ms']:4.2f}x  boxes={stats['boxes']}  mean_crop={stats['mean_crop_px']:.0f}px")
+
+if __name__ == "__main__":
+    main()
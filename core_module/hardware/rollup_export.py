@@ -0,0 +1,47 @@
+import argparse
+import sqlite3
+import time
+from datetime import datetime
+import requests
+import db_utils # Utility for database operations
+
+BACKEND_API_URL = "http://localhost:3001/api"
+
+def push_dirty_rollups(backend_url, batch_size=500):
+    """Sends absolute totals of changed buckets to the backend; retries are idempotent."""
+    pushed = 0
+    while True:
+        rows = db_utils.dirty_rollups(batch_size)
+        if not rows: return pushed
+        buckets = [{"granularity": r["granularity"],
+                    "bucketStart": datetime.strptime(r["bucket_start"], '%Y-%m-%d %H:%M:%S').astimezone().isoformat(),
+                    "entries": r["entries"], "exits": r["exits"], "dwellSeconds": r["dwell_seconds"],
+                    "dwellCount": r["dwell_count"], "revenue": r["revenue"]} for r in rows]
+        resp = requests.post(f"{backend_url}/analytics/rollups", json={"source": "GATE", "buckets": buckets}, timeout=10)
+        resp.raise_for_status()
+        db_utils.clear_rollups(rows); pushed += len(rows)
+
+def run_once(backend_url, push=True):
+    """One fold + push. Both go through db_utils, so with LANE_STATE_ADDR set they run on the lane-state server."""
+    try:
+        entries, exits = db_utils.fold_rollups()
+        print(f"[ROLLUP] Folded {entries} entries, {exits} paid exits")
+        if push:
+            try: print(f"[ROLLUP] Pushed {push_dirty_rollups(backend_url)} buckets")
+            except requests.exceptions.RequestException as e_req: print(f"[BACKEND_ERROR] Rollup push: {e_req}")
+    except sqlite3.Error as e_sql: print(f"[DB_ERROR] Rollup update: {e_sql}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental occupancy/revenue rollup export from parking_log')
+    parser.add_argument('--backend', type=str, default=BACKEND_API_URL)
+    parser.add_argument('--interval', type=float, default=0, help='Repeat every N seconds (0 = run once)')
+    parser.add_argument('--no-push', action='store_true', help='Only update the local parking_rollup table')
+    args = parser.parse_args()
+    db_utils.init_db()
+    while True:
+        run_once(args.backend, push=not args.no_push)
+        if args.interval <= 0: break
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+from collections import defaultdict
+
+DEFAULT_FILES = ['logs/traces-*.jsonl', '../../analytics_dashboard/backend/logs/traces.jsonl'] # Gate scripts (one file per process) + backend TRACE_FILE
+
+def load_spans(paths):
+    """trace_id -> spans from every JSONL file or glob (rotated backups included), gate and backend alike."""
+    traces = defaultdict(list)
+    for path in sorted({match for pattern in paths for match in glob.glob(pattern)}):
+        for candidate in [path] + [f"{path}.{i}" for i in range(1, 10)]:
+            if not os.path.exists(candidate): continue
+            with open(candidate) as f:
+                for line in f:
+                    try: span = json.loads(line)
+                    except ValueError: continue
+                    if span.get('trace_id'): traces[span['trace_id']].append(span)
+    return traces
+
+def root_of(spans):
+    return next((s for s in spans if s['name'] == 'vehicle_pass'), None)
+
+def trace_bounds(spans):
+    start = min(s['start'] for s in spans)
+    return start, max(s['start'] + s['duration_ms'] / 1000 for s in spans) - start
+
+def waterfall(trace_id, spans, width=50):
+    """One row per (service, span name): per-frame spans (detect, ocr) collapse into count + summed time."""
+    t0, total_s = trace_bounds(spans); root = root_of(spans) or {}
+    print(f"\n🚗 {trace_id}  plate={root.get('plate') or next((s.get('plate') for s in spans if s.get('plate')), '-')}  "
+          f"lane={root.get('lane', '-')}  outcome={root.get('outcome', 'open')}  total={total_s * 1000:.0f}ms")
+    rows = {}
+    for span in sorted(spans, key=lambda s: s['start']):
+        if span['name'] == 'vehicle_pass': continue
+        key = (span.get('service', '?'), span['name']); end = span['start'] + span['duration_ms'] / 1000
+        row = rows.setdefault(key, {'first': span['start'], 'last': end, 'count': 0, 'ms': 0.0})
+        row['last'] = max(row['last'], end); row['count'] += 1; row['ms'] += span['duration_ms']
+    scale = width / total_s if total_s > 0 else 0
+    for (service, name), row in rows.items():
+        left = int((row['first'] - t0) * scale); bar = max(1, int((row['last'] - row['first']) * scale))
+        count = f" x{row['count']}" if row['count'] > 1 else ''
+        print(f"  {service:<8} {name + count:<32} {'·' * left}{'█' * min(bar, width - left)}{' ' * max(0, width - left - bar)} "
+              f"+{(row['first'] - t0) * 1000:7.0f}ms {row['ms']:8.1f}ms")
+
+def summary(traces):
+    """p50/p95/max per span name across all traces: where time goes on average."""
+    durations = defaultdict(list)
+    for spans in traces.values():
+        for span in spans: durations[(span.get('service', '?'), span['name'])].append(span['duration_ms'])
+    print(f"\n{'service':<8} {'span':<24} {'count':>6} {'p50':>9} {'p95':>9} {'max':>9}")
+    for (service, name), values in sorted(durations.items(), key=lambda kv: -statistics.median(kv[1])):
+        values.sort()
+        print(f"{service:<8} {name:<24} {len(values):>6} {statistics.median(values):>7.1f}ms {values[int(len(values) * 0.95) - 1] if len(values) > 1 else values[0]:>7.1f}ms {values[-1]:>7.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-vehicle latency waterfall from gate and backend trace spans')
+    parser.add_argument('--files', type=str, nargs='+', default=DEFAULT_FILES)
+    parser.add_argument('--trace', type=str, default=None, help='Show one trace id')
+    parser.add_argument('--plate', type=str, default=None, help='Show the traces of one plate')
+    parser.add_argument('--slowest', type=int, default=5, help='Show the N slowest vehicle passes')
+    parser.add_argument('--outcome', type=str, default=None, help="Only passes with this outcome (e.g. 'entered')")
+    parser.add_argument('--summary', action='store_true', help='Per-span percentiles across all traces')
+    args = parser.parse_args()
+
+    traces = load_spans(args.files)
+    if not traces: print(f"[ERROR] No spans in {', '.join(args.files)}"); return
+    if args.summary: summary(traces)
+    if args.trace: selected = [args.trace] if args.trace in traces else []
+    else:
+        selected = [tid for tid, spans in traces.items() if root_of(spans)
+                    and (not args.plate or any(s.get('plate') == args.plate.upper() for s in spans))
+                    and (not args.outcome or root_of(spans).get('outcome') == args.outcome)]
+        selected = sorted(selected, key=lambda tid: -trace_bounds(traces[tid])[1])[:args.slowest]
+    if not selected and not args.summary: print("[TRACE] No matching traces"); return
+    for trace_id in selected: waterfall(trace_id, traces[trace_id])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+
+TRACE_FILE = 'logs/traces-{service}-{pid}.jsonl' # One file per process: RotatingFileHandler is not safe across processes
+TRACE_HEADER = 'X-Trace-Id' # Read by the backend trace middleware; echoed on its response
+
+class SpanFormatter(logging.Formatter):
+    def format(self, record): return json.dumps(record.span, default=str)
+
+class Tracer:
+    """Exports spans as JSON lines through a background QueueListener, like log_utils.
+
+    Every line is one span: trace_id, service, lane, name, start (epoch
+    seconds, comparable across processes on one host) and duration_ms plus
+    any attributes. trace_report.py joins these with the backend's spans.
+    path may contain {service} and {pid}; each process must write its own file.
+    """
+
+    def __init__(self, service, path=TRACE_FILE, max_bytes=10 * 1024 * 1024, backup_count=3):
+        self.service = service; path = path.format(service=service, pid=os.getpid())
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(SpanFormatter())
+        span_queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(span_queue, handler)
+        self.listener.start(); atexit.register(self.listener.stop)
+        self.logger = logging.getLogger(f'Trace.{service}')
+        self.logger.setLevel(logging.INFO); self.logger.propagate = False
+        for old in list(self.logger.handlers): self.logger.removeHandler(old)
+        self.logger.addHandler(logging.handlers.QueueHandler(span_queue))
+
+    def start(self, lane=None, start=None):
+        return Trace(self, lane, start)
+
+    def export(self, span):
+        self.logger.info(span['name'], extra={'span': span})
+
+class Trace:
+    """One vehicle pass, from the first frame captured in range to the gate decision.
+
+    Spans are exported as they close, so a pass that hangs (or a process that
+    dies) still leaves its timings on disk; end() adds the root 'vehicle_pass'
+    span carrying the plate and the outcome.
+    """
+
+    def __init__(self, tracer, lane=None, start=None):
+        self.tracer = tracer; self.lane = lane; self.trace_id = uuid.uuid4().hex
+        self.start = start or time.time(); self.plate = None; self.ended = False
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Times the block; the yielded dict takes attributes known only at the end."""
+        start = time.time(); t0 = time.perf_counter()
+        try: yield attrs
+        finally: self.add(name, start, (time.perf_counter() - t0) * 1000, **attrs)
+
+    def add(self, name, start, duration_ms, **attrs):
+        self.tracer.export({'trace_id': self.trace_id, 'service': self.tracer.service, 'lane': self.lane, 'plate': self.plate,
+                            'name': name, 'start': round(start, 6), 'duration_ms': round(duration_ms, 3), **attrs})
+
+    def headers(self):
+        return {TRACE_HEADER: self.trace_id}
+
+    def end(self, outcome, **attrs):
+        if self.ended: return
+        self.ended = True
+        self.add('vehicle_pass', self.start, (time.time() - self.start) * 1000, outcome=outcome, **attrs)
+
+def trace_headers(trace):
+    return trace.headers() if trace else None
+
+def trace_id(trace):
+    return trace.trace_id if trace else None
@@ -0,0 +1,156 @@
+import argparse
+import csv
+import os
+import random
+import re
+import shutil
+import cv2
+import numpy as np
+import torch
+from torch import nn
+from torch.utils.data import DataLoader, Dataset
+import plate_utils
+from crnn_ocr import ALPHABET, INPUT_WIDTH, PLATE_LENGTH, prepare_input
+
+# Crops saved by main.py --save-images are named <PLATE>_<YYYYmmdd>_<HHMMSS>.jpg
+SOURCE_DIR = 'plates'
+DATASET_DIR = 'ocr_dataset'
+OUTPUT_PATH = '../model_dev/ocr/plate_crnn.onnx'
+
+def load_labels(labels_csv):
+    """Hand-checked image,plate rows ('#' comments); keys are file names."""
+    labels = {}
+    with open(labels_csv) as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and not row[0].startswith('#'): labels[row[0].strip()] = row[1].strip().upper()
+    return labels
+
+def split_dataset(source_dir, dataset_dir, val_ratio=0.2, labels_csv=None, seed=42):
+    """Copies labeled crops into <dataset_dir>/{train,val}/{images,labels}, the arrange_dataset.py layout.
+
+    Without labels_csv the label is the plate in the file name, i.e. what the
+    gate's OCR read when --save-images wrote the crop: a pseudo-label, so OCR
+    mistakes are trained in as truth. With labels_csv only the listed crops
+    are used, with the checked plate. Both split directories are emptied
+    first so a rerun (or another seed) never leaves val crops in train.
+    """
+    labels = load_labels(labels_csv) if labels_csv else None
+    dirs = {split: (os.path.join(dataset_dir, split, 'images'), os.path.join(dataset_dir, split, 'labels')) for split in ('train', 'val')}
+    for split in dirs: shutil.rmtree(os.path.join(dataset_dir, split), ignore_errors=True)
+    for img_dir, lbl_dir in dirs.values():
+        os.makedirs(img_dir); os.makedirs(lbl_dir)
+    image_files = sorted(f for f in os.listdir(source_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+    labeled = [(f, labels[f] if labels is not None else f.split('_')[0].upper()) for f in image_files if labels is None or f in labels]
+    labeled = [(f, plate) for f, plate in labeled if re.fullmatch(plate_utils.PLATE_REGEX, plate)]
+    random.seed(seed); random.shuffle(labeled)
+    split_idx = int((1 - val_ratio) * len(labeled))
+    for split, items in (('train', labeled[:split_idx]), ('val', labeled[split_idx:])):
+        img_dir, lbl_dir = dirs[split]
+        for img_file, plate in items:
+            shutil.copy2(os.path.join(source_dir, img_file), os.path.join(img_dir, img_file))
+            with open(os.path.join(lbl_dir, os.path.splitext(img_file)[0] + '.txt'), 'w') as f: f.write(plate)
+    print(f"📊 Total: {len(labeled)} ({'checked labels' if labels is not None else 'OCR pseudo-labels from file names'}) | Train: {split_idx} | Val: {len(labeled) - split_idx}")
+
+class PlateDataset(Dataset):
+    def __init__(self, split_dir, augment=False):
+        self.img_dir = os.path.join(split_dir, 'images'); self.lbl_dir = os.path.join(split_dir, 'labels'); self.augment = augment
+        self.items = []
+        for img_file in sorted(os.listdir(self.img_dir)):
+            lbl_path = os.path.join(self.lbl_dir, os.path.splitext(img_file)[0] + '.txt')
+            if os.path.exists(lbl_path):
+                with open(lbl_path) as f: label = f.read().strip().upper()
+                if len(label) == PLATE_LENGTH and all(c in ALPHABET for c in label): self.items.append((img_file, label))
+
+    def __len__(self): return len(self.items)
+
+    def jitter(self, img):
+        height, width = img.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), random.uniform(-4, 4), random.uniform(0.92, 1.05))
+        matrix[:, 2] += (random.uniform(-0.04, 0.04) * width, random.uniform(-0.06, 0.06) * height)
+        img = cv2.warpAffine(img, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+        img = cv2.convertScaleAbs(img, alpha=random.uniform(0.7, 1.3), beta=random.uniform(-30, 30))
+        if random.random() < 0.3: img = cv2.GaussianBlur(img, (3, 3), 0)
+        return img
+
+    def __getitem__(self, idx):
+        img_file, label = self.items[idx]
+        img = cv2.imread(os.path.join(self.img_dir, img_file))
+        if self.augment: img = self.jitter(img)
+        x = torch.from_numpy(prepare_input(plate_utils.preprocess_plate(img))) # Same input as the gate at inference
+        y = torch.tensor([ALPHABET.index(c) for c in label], dtype=torch.long)
+        return x, y
+
+class PlateCRNN(nn.Module):
+    """Conv feature extractor -> BiGRU over the width -> one classifier per plate position."""
+    def __init__(self, num_classes=len(ALPHABET), hidden=128):
+        super().__init__()
+        def block(c_in, c_out, pool): return [nn.Conv2d(c_in, c_out, 3, padding=1, bias=False), nn.BatchNorm2d(c_out), nn.ReLU(inplace=True), nn.MaxPool2d(pool)]
+        self.features = nn.Sequential(*block(1, 32, (2, 2)), *block(32, 64, (2, 2)), *block(64, 128, (2, 1)), *block(128, 192, (2, 1)))
+        self.rnn = nn.GRU(192, hidden, batch_first=True, bidirectional=True)
+        self.positions = nn.AvgPool1d(INPUT_WIDTH // 4 // PLATE_LENGTH) # Fixed pooling (not adaptive) keeps the graph ONNX-exportable
+        self.classifier = nn.Linear(hidden * 2, num_classes)
+
+    def forward(self, x):
+        seq = self.features(x).mean(dim=2).permute(0, 2, 1) # (B, W/4, C)
+        seq, _ = self.rnn(seq)
+        seq = self.positions(seq.permute(0, 2, 1)).permute(0, 2, 1) # (B, 7, 2*hidden)
+        return self.classifier(seq) # (B, 7, classes) logits
+
+class ExportWrapper(nn.Module):
+    def __init__(self, model): super().__init__(); self.model = model
+    def forward(self, x): return torch.softmax(self.model(x), dim=-1)
+
+def evaluate(model, loader, device):
+    model.eval(); chars = plates = char_total = plate_total = 0
+    with torch.no_grad():
+        for x, y in loader:
+            pred = model(x.to(device)).argmax(-1).cpu()
+            chars += (pred == y).sum().item(); char_total += y.numel()
+            plates += (pred == y).all(dim=1).sum().item(); plate_total += y.size(0)
+    return chars / max(1, char_total), plates / max(1, plate_total)
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the plate CRNN on crops saved in plates/ and export it to ONNX')
+    parser.add_argument('--source', type=str, default=SOURCE_DIR)
+    parser.add_argument('--dataset', type=str, default=DATASET_DIR)
+    parser.add_argument('--output', type=str, default=OUTPUT_PATH)
+    parser.add_argument('--labels', type=str, default=None, help='CSV of hand-checked image,plate rows; without it file-name OCR reads are used as pseudo-labels')
+    parser.add_argument('--seed', type=int, default=42, help='Train/val shuffle seed')
+    parser.add_argument('--skip-split', action='store_true', help='Reuse an existing train/val split')
+    parser.add_argument('--epochs', type=int, default=60)
+    parser.add_argument('--batch', type=int, default=64)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    args = parser.parse_args()
+
+    if not args.skip_split: split_dataset(args.source, args.dataset, labels_csv=args.labels, seed=args.seed)
+    train_set = PlateDataset(os.path.join(args.dataset, 'train'), augment=True); val_set = PlateDataset(os.path.join(args.dataset, 'val'))
+    if not train_set.items: print(f"❌ No labeled crops in {args.dataset}/train"); return
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    train_loader = DataLoader(train_set, batch_size=args.batch, shuffle=True, num_workers=2)
+    val_loader = DataLoader(val_set, batch_size=args.batch)
+
+    model = PlateCRNN().to(device)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=1e-4)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(optimizer, max_lr=args.lr, total_steps=args.epochs * len(train_loader))
+    criterion = nn.CrossEntropyLoss(label_smoothing=0.05)
+    best_acc = -1.0; best_state = None
+    for epoch in range(args.epochs):
+        model.train(); total_loss = 0.0
+        for x, y in train_loader:
+            x, y = x.to(device), y.to(device)
+            loss = criterion(model(x).reshape(-1, len(ALPHABET)), y.reshape(-1))
+            optimizer.zero_grad(); loss.backward(); optimizer.step(); scheduler.step()
+            total_loss += loss.item() * x.size(0)
+        char_acc, plate_acc = evaluate(model, val_loader, device) if val_set.items else (0.0, 0.0)
+        print(f"Epoch {epoch + 1}/{args.epochs} loss={total_loss / len(train_set):.4f} val_char={char_acc:.3f} val_plate={plate_acc:.3f}")
+        if plate_acc + char_acc > best_acc: best_acc = plate_acc + char_acc; best_state = {k: v.detach().cpu().clone() for k, v in model.state_dict().items()}
+
+    model.load_state_dict(best_state); model.cpu().eval()
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    dummy = torch.zeros(1, 1, *prepare_input(np.zeros((8, 8), np.uint8)).shape[1:])
+    torch.onnx.export(ExportWrapper(model), dummy, args.output, input_names=['image'], output_names=['probs'],
+                      dynamic_axes={'image': {0: 'batch'}, 'probs': {0: 'batch'}}, opset_version=17)
+    print(f"✅ Exported {args.output}")
+
+if __name__ == "__main__":
+    main()